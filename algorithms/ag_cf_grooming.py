@@ -6,12 +6,14 @@ from typing import Any
 import networkx as nx
 
 from models.flow import Flow
-from topology import Lightpath
+from observability.trace import TraceCode, get_trace
+from topology import Lightpath, PathCache
 from .ag_jdr_grooming import AuxGJointDataRecipGrooming
 from .auxiliary_graph import AuxiliaryGraph
 from .base import AlgOutput, AlgInput
 
 logger = logging.getLogger(__name__)
+_trace = get_trace("algorithm")
 
 
 class AuxGCostFirstGrooming(AuxGJointDataRecipGrooming):
@@ -26,8 +28,15 @@ class AuxGCostFirstGrooming(AuxGJointDataRecipGrooming):
       5. 在 K 条候选数据路径中选择协商路径成本最低的可行方案。
     """
 
-    def __init__(self, k: int = 8, c_p: int = 0, c_h: int = 0):
-        super().__init__()
+    def __init__(
+            self,
+            k: int = 8,
+            c_p: int = 0,
+            c_h: int = 0,
+            engine: str = "networkx",
+            path_cache: PathCache | None = None,
+    ):
+        super().__init__(engine=engine, path_cache=path_cache)
         self.k = k
 
         self.c_p = c_p
@@ -35,27 +44,18 @@ class AuxGCostFirstGrooming(AuxGJointDataRecipGrooming):
 
         self.max_key_rate: float | None = None
 
-        logger.info(f"Auxiliary-Graph-Based Cost First Grooming Algorithm initialized with k={self.k}")
+        logger.info("Auxiliary-Graph-Based Cost First Grooming Algorithm initialized with k=%s", self.k)
 
     def flow_arrival(self, alg_input: AlgInput) -> AlgOutput:
-        pt = alg_input.pt
-        vt = alg_input.vt
         flow = alg_input.flow
-        logger.info(f"Algorithm handling flow {flow}")
+        logger.info("Algorithm handling flow %s", flow)
 
-        # 1. 构建当前时刻的辅助图。
-        ag = AuxiliaryGraph()
-        G_aux = ag.get_aux_graph(pt.graph, vt.graph)
+        # 1. 使用控制平面增量维护的当前时刻辅助图。
+        ag = alg_input.ag
+        G_aux = ag.aux_graph
 
-        # 数据路径不能走协商光路，并且必须满足带宽约束。
-        G_sub = ag.get_sub_aux_graph(
-            blocked_edges_attr={
-                "usage": "recip",
-                "avl_bandwidth": flow.rate
-            }
-        )
-
-        paths = self._get_kpaths(G_sub, flow.src, flow.dst, self.k)
+        # 候选数据路径。
+        paths = self._get_candidate_paths(alg_input)
         if not paths:
             return AlgOutput()
 
@@ -64,9 +64,10 @@ class AuxGCostFirstGrooming(AuxGJointDataRecipGrooming):
         best_recip_segments: list[Lightpath] = []
 
         for path in paths:
-            logger.debug("Candidate data path: %s", path)
+            if _trace.enabled:
+                _trace.emit(TraceCode.ALG_CANDIDATE_PATH, flow.id, path)
 
-            lightpaths_data = self._find_lightpaths(path, G_aux, "data")
+            lightpaths_data = self._find_lightpaths(path, ag, "data")
 
             # 普通业务不需要协商路径，直接接受第一条可行数据路径。
             if flow.attrs["sec"] == 0:
@@ -79,13 +80,10 @@ class AuxGCostFirstGrooming(AuxGJointDataRecipGrooming):
             )
             if not recip_segments:
                 continue
-            logger.debug(f"Candidate recip path is {recip_segments}")
-
             current_cost = self._calculate_recip_path_cost(G_aux, recip_segments, flow)
-            logger.debug(
-                "Candidate CF solution cost=%s",
-                current_cost
-            )
+            if _trace.enabled:
+                _trace.emit(TraceCode.ALG_RECIP_PATH, flow.id, recip_segments)
+                _trace.emit(TraceCode.ALG_SOLUTION_COST, flow.id, current_cost)
 
             if best_cost is None or current_cost < best_cost:
                 best_cost = current_cost
@@ -108,32 +106,34 @@ class AuxGCostFirstGrooming(AuxGJointDataRecipGrooming):
         blocked_edges = []
         for lightpath in lightpaths:
             blocked_edges.append((lightpath.src, lightpath.dst))
-            for u, v in self._get_node_pairs(lightpath.route):
-                blocked_edges.append((u, v))
+            blocked_edges.extend(self._wavelength_edges(lightpath))
 
         selected_recip_segments: list[Lightpath] = []
         for lightpath in lightpaths:
             src = lightpath.src
             dst = lightpath.dst
 
-            sub_graph = ag.get_sub_aux_graph(
+            sub_graph = self._get_sub_graph(
+                ag,
                 blocked_edges=list(blocked_edges),
                 blocked_edges_attr={"usage": "data", "avl_key_rate": flow.attrs["kgr"], "dedicate": "True"},
             )
 
             try:
-                sp_node_path = nx.shortest_path(
+                sp_node_path = self._get_shortest_path(
                     sub_graph,
                     src,
                     dst,
                     weight=lambda u, v, data: self._recip_edge_cost_weight(data),
                 )
             except (nx.NetworkXNoPath, nx.NodeNotFound):
-                logger.debug("No cost-first recip path for data hop %s -> %s", src, dst)
+                if _trace.enabled:
+                    _trace.emit(TraceCode.ALG_NO_RECIP_PATH, flow.id, src, dst)
                 return []
 
-            sp_segments = self._find_lightpaths(sp_node_path, sub_graph, "recip")
-            logger.debug("Cost-first recip path for hop %s -> %s: %s", src, dst, sp_segments)
+            sp_segments = self._find_lightpaths(sp_node_path, ag, "recip")
+            if _trace.enabled:
+                _trace.emit(TraceCode.ALG_RECIP_PATH, flow.id, sp_segments)
 
             # 协商路径必须是一跳，即不能由多段 lightpath 经中间业务节点拼接。
             if len(sp_segments) != 1:
@@ -156,7 +156,7 @@ class AuxGCostFirstGrooming(AuxGJointDataRecipGrooming):
         total_dedicated_cost = 0.0
         max_key_rate = []
         for seg in recip_segments:
-            physical_hops = len(self._segment_physical_edges(seg))
+            physical_hops = len(seg.route.links)
             # 对应一条协商 lightpath 的专有成本：2*c_p + c_h * 物理波长链路数。
             total_dedicated_cost += 2.0 * self.c_p + self.c_h * physical_hops
             max_key_rate.append(seg.max_key_rate)
@@ -173,33 +173,13 @@ class AuxGCostFirstGrooming(AuxGJointDataRecipGrooming):
         """协商路径 SPF 权重：优先选择物理波长链路成本更低的路径。"""
         if edge_data.get("layer") == "mapping":
             return 0.0
-        return max(1.0, self.c_h * len(self._route_physical_edges(edge_data.get("route", []))))
-
-    @staticmethod
-    def _route_physical_edges(route: list[Any]) -> set[tuple[int, int]]:
-        """兼容 [(u, v)] 形式和 [WavelengthNode(...), ...] 形式的 route。"""
-        if not route:
-            return set()
-
-        # AuxiliaryGraph 中 wavelength edge 的 route 是 [(u, v)]。
-        if all(isinstance(item, tuple) and len(item) == 2 for item in route):
-            return {(int(u), int(v)) for u, v in route}
-
-        # VirtualTopology 中 lightpath 的 route 是 WavelengthNode 列表。
-        physical_edges: set[tuple[int, int]] = set()
-        for u, v in zip(route[:-1], route[1:]):
-            if hasattr(u, "node") and hasattr(v, "node"):
-                physical_edges.add((u.node, v.node))
-        return physical_edges
+        return max(1.0, self.c_h * len(edge_data["route"].links))
 
     def _resource_edges_from_segments(self, segments: list[Lightpath]) -> list[tuple[Any, Any]]:
         resource_edges: list[tuple[Any, Any]] = []
         for seg in segments:
             if seg.kind == "new":
-                resource_edges.extend(zip(seg.route[:-1], seg.route[1:]))
+                resource_edges.extend(self._wavelength_edges(seg))
             elif seg.kind == "exist":
                 resource_edges.append((seg.src, seg.dst))
         return resource_edges
-
-    def _segment_physical_edges(self, seg: Lightpath) -> set[tuple[int, int]]:
-        return self._route_physical_edges(seg.route)
@@ -1,52 +1,47 @@
 from __future__ import annotations
 
 import logging
-import networkx as nx
 
 from models.flow import Flow
-from topology import Lightpath
+from topology import Lightpath, PathCache
+
+from observability.trace import TraceCode, get_trace
 
 from .auxiliary_graph import AuxiliaryGraph
 from .base import HeuristicAlgorithm, AlgInput, AlgOutput
 
 logger = logging.getLogger(__name__)
+_trace = get_trace("algorithm")
 
 
 class AuxGJointDataRecipGrooming(HeuristicAlgorithm):
 
-    def __init__(self, k: int = 8):
+    def __init__(self, k: int = 8, engine: str = "networkx", path_cache: PathCache | None = None):
         super().__init__()
         self.k = k
+        self.engine = engine
+        self.path_cache = path_cache
 
-        logger.info(f"Auxiliary-Graph-Based Joint Data-and-Key Path Grooming Algorithm initialized with k={self.k}")
+        logger.info("Auxiliary-Graph-Based Joint Data-and-Key Path Grooming Algorithm initialized with k=%s", self.k)
 
     def flow_arrival(self, alg_input: AlgInput) -> AlgOutput:
-        pt = alg_input.pt
-        vt = alg_input.vt
         flow = alg_input.flow
-        logger.info(f"Algorithm handling flow {flow}")
-
-        # 1. 构建当前时刻的辅助图。
-        ag = AuxiliaryGraph()
-        G_aux = ag.get_aux_graph(pt.graph, vt.graph)
+        logger.info("Algorithm handling flow %s", flow)
 
-        # 2. 数据路径不能走协商光路，并且必须满足带宽约束。
-        G_sub = ag.get_sub_aux_graph(
-            blocked_edges_attr={
-                "usage": "recip",
-                "avl_bandwidth": flow.rate
-            }
-        )
+        # 1. 使用控制平面增量维护的当前时刻辅助图。
+        ag = alg_input.ag
 
-        paths = self._get_kpaths(G_sub, flow.src, flow.dst, self.k)
+        # 2. 候选数据路径。
+        paths = self._get_candidate_paths(alg_input)
         if not paths:
             return AlgOutput()
 
         # 3. 对每条候选数据路径，找协商路径。
         for path in paths:
-            logger.debug("Candidate data path: %s", path)
+            if _trace.enabled:
+                _trace.emit(TraceCode.ALG_CANDIDATE_PATH, flow.id, path)
 
-            lightpaths_data = self._find_lightpaths(path, G_aux, "data")
+            lightpaths_data = self._find_lightpaths(path, ag, "data")
 
             # 普通业务：数据路径可行即可接受。
             if flow.attrs["sec"] == 0:
@@ -55,7 +50,8 @@ class AuxGJointDataRecipGrooming(HeuristicAlgorithm):
             # 如果 flow 需要安全
             # 寻找协商路径，要求协商路径与数据路径同端点
             lightpaths_recip = self._find_reciprocal_lightpath(ag, lightpaths_data, flow)
-            logger.debug(f"Candidate recip path: {lightpaths_recip}")
+            if _trace.enabled:
+                _trace.emit(TraceCode.ALG_RECIP_PATH, flow.id, lightpaths_recip)
 
             # 如果所有数据跳都有密钥路径，则接受该数据路径
             if lightpaths_recip and lightpaths_data:
@@ -65,7 +61,8 @@ class AuxGJointDataRecipGrooming(HeuristicAlgorithm):
 
         return AlgOutput()
 
-    def _find_lightpaths(self, path: list, aux_graph: nx.DiGraph, usage: str) -> list[Lightpath]:
+    def _find_lightpaths(self, path: list, ag: AuxiliaryGraph, usage: str) -> list[Lightpath]:
+        aux_graph = ag.aux_graph
         lightpaths: list[Lightpath] = []
         route: list = []
         bandwidths = []
@@ -92,7 +89,7 @@ class AuxGJointDataRecipGrooming(HeuristicAlgorithm):
                             max_key_rate=max_key_rate if usage == "recip" else 0,
                             avl_bandwidth=max_bandwidth if usage == "data" else 0,
                             avl_key_rate=max_key_rate if usage == "recip" else 0,
-                            route=route,
+                            route=ag.routes.get(node.node for node in route),
                             usage=usage,
                             kind="new",
                             layer="lightpath",
@@ -118,7 +115,8 @@ class AuxGJointDataRecipGrooming(HeuristicAlgorithm):
                         usage=edge_data["usage"],
                         kind="exist",
                         layer="lightpath",
-                        dedicate=edge_data["dedicate"]
+                        dedicate=edge_data["dedicate"],
+                        key=edge_data["key"],
                     )
                 )
             else:
@@ -135,23 +133,24 @@ class AuxGJointDataRecipGrooming(HeuristicAlgorithm):
         blocked_edges = []
         for lightpath in lightpaths:
             blocked_edges.append((lightpath.src, lightpath.dst))
-            for u, v in self._get_node_pairs(lightpath.route):
-                blocked_edges.append((u, v))
+            blocked_edges.extend(self._wavelength_edges(lightpath))
 
         lightpaths_recip = []
         for lightpath in lightpaths:
             # 约束：扣除所有数据路径, 满足密钥速率要求
-            sub_graph = aux_graph.get_sub_aux_graph(
+            sub_graph = self._get_sub_graph(
+                aux_graph,
                 blocked_edges=blocked_edges,
                 blocked_edges_attr={"usage": "data", "avl_key_rate": flow.attrs["kgr"]}
             )
             try:
-                path = nx.shortest_path(sub_graph, lightpath.src, lightpath.dst)
+                path = self._get_shortest_path(sub_graph, lightpath.src, lightpath.dst)
             except:
                 path = []
 
-            lp = self._find_lightpaths(path, sub_graph, usage="recip")
-            logger.debug(f"{lp}")
+            lp = self._find_lightpaths(path, aux_graph, usage="recip")
+            if _trace.enabled:
+                _trace.emit(TraceCode.ALG_RECIP_PATH, flow.id, lp)
             if len(lp) != 1:
                 # 若协商信道不是一跳联通的
                 return []
@@ -160,6 +159,5 @@ class AuxGJointDataRecipGrooming(HeuristicAlgorithm):
 
             for lightpath in lp:
                 blocked_edges.append((lightpath.src, lightpath.dst))
-                for u, v in self._get_node_pairs(lightpath.route):
-                    blocked_edges.append((u, v))
+                blocked_edges.extend(self._wavelength_edges(lightpath))
         return lightpaths_recip
@@ -8,13 +8,15 @@ from typing import Any
 import networkx as nx
 
 from models.flow import Flow
-from topology import Lightpath
+from observability.trace import TraceCode, get_trace
+from topology import Lightpath, PathCache, Route, VirtualTopology
 
-from .auxiliary_graph import AuxiliaryGraph
+from .auxiliary_graph import AuxiliaryGraph, WavelengthNode
 from .ag_jdr_grooming import AuxGJointDataRecipGrooming
 from .base import AlgInput, AlgOutput
 
 logger = logging.getLogger(__name__)
+_trace = get_trace("algorithm")
 
 
 @dataclass(frozen=True, slots=True)
@@ -25,7 +27,7 @@ class Segment:
     dst: Any
     kind: str  # "new" or "exist"
     wavelength: int
-    route: list[Any]
+    route: Route
 
 
 class AuxGSecurityFirstGrooming(AuxGJointDataRecipGrooming):
@@ -38,39 +40,30 @@ class AuxGSecurityFirstGrooming(AuxGJointDataRecipGrooming):
            若失败，则退化为 s-d 端到端协商路径，并按 NSe 权重选择较少占用的协商资源；
       - 2 及以上：高安全业务，只接受每个数据 hop 都有隔离协商光路的方案。
     """
-    def __init__(self, k: int = 8):
-        super().__init__(k)
+    def __init__(self, k: int = 8, engine: str = "networkx", path_cache: PathCache | None = None):
+        super().__init__(k, engine, path_cache)
         self.k = k
 
-        logger.info(f"Auxiliary-Graph-Based Security First Grooming Algorithm initialized with k=%s", self.k)
+        logger.info("Auxiliary-Graph-Based Security First Grooming Algorithm initialized with k=%s", self.k)
 
     def flow_arrival(self, alg_input: AlgInput) -> AlgOutput:
-        pt = alg_input.pt
-        vt = alg_input.vt
         flow = alg_input.flow
-        logger.info(f"Algorithm handling flow {flow}")
+        logger.info("Algorithm handling flow %s", flow)
 
-        # 1. 构建当前时刻的辅助图。
-        ag = AuxiliaryGraph()
-        G_aux = ag.get_aux_graph(pt.graph, vt.graph)
+        # 1. 使用控制平面增量维护的当前时刻辅助图。
+        ag = alg_input.ag
 
-        # 2. 数据路径不能走协商光路，并且必须满足带宽约束。
-        G_sub = ag.get_sub_aux_graph(
-            blocked_edges_attr={
-                "usage": "recip",
-                "avl_bandwidth": flow.rate
-            }
-        )
-
-        paths = self._get_kpaths(G_sub, flow.src, flow.dst, self.k)
+        # 2. 候选数据路径。
+        paths = self._get_candidate_paths(alg_input)
         if not paths:
             return AlgOutput()
 
         # 3. Security-first：对每条候选数据路径，优先寻找满足安全约束的协商路径。
         for path in paths:
-            logger.debug("Candidate data node path: %s", path)
+            if _trace.enabled:
+                _trace.emit(TraceCode.ALG_CANDIDATE_PATH, flow.id, path)
 
-            lightpaths_data = self._find_lightpaths(path, G_aux, "data")
+            lightpaths_data = self._find_lightpaths(path, ag, "data")
 
             # 普通业务：数据路径可行即可接受。
             if flow.attrs["sec"] == 0:
@@ -79,6 +72,7 @@ class AuxGSecurityFirstGrooming(AuxGJointDataRecipGrooming):
             # 高/中安全业务：先找逐 hop 隔离协商路径。
             lightpaths_recip = self._find_reciprocal_lightpath_for_secure(
                 ag=ag,
+                vt=alg_input.vt,
                 lightpaths=lightpaths_data,
                 flow=flow,
                 is_loose=False
@@ -88,6 +82,7 @@ class AuxGSecurityFirstGrooming(AuxGJointDataRecipGrooming):
             if (not lightpaths_recip) and (flow.attrs["sec"] == 1):
                 lightpaths_recip = self._find_reciprocal_lightpath_for_secure(
                     ag=ag,
+                    vt=alg_input.vt,
                     lightpaths=lightpaths_data,
                     flow=flow,
                     is_loose=True
@@ -103,6 +98,7 @@ class AuxGSecurityFirstGrooming(AuxGJointDataRecipGrooming):
     def _find_reciprocal_lightpath_for_secure(
         self,
         ag: AuxiliaryGraph,
+        vt: VirtualTopology,
         lightpaths: [Lightpath],
         flow: Flow,
         is_loose: False
@@ -117,42 +113,45 @@ class AuxGSecurityFirstGrooming(AuxGJointDataRecipGrooming):
         blocked_edges = []
         for lightpath in lightpaths:
             blocked_edges.append((lightpath.src, lightpath.dst))
-            for u, v in self._get_node_pairs(lightpath.route):
-                blocked_edges.append((u, v))
+            blocked_edges.extend(self._wavelength_edges(lightpath))
 
         if not is_loose:
-            logger.debug(f"Disable In-band Transmission with req {flow.attrs["sec"]}.")
+            if _trace.enabled:
+                _trace.emit(TraceCode.ALG_INBAND_DISABLED, flow.id, flow.attrs["sec"])
             # 协商路径不能经过本业务数据路径占用的任何波长链路，即异路传输。
-            forbidden_data_phy_edges = self._data_occupied_physical_edges(ag.aux_graph)
+            forbidden_link_mask = vt.data_link_mask
             for seg in lightpaths:
-                forbidden_data_phy_edges.update(self._segment_physical_edges(seg))
-            blocked_edges += self._aux_edges_intersecting_physical_edges(ag.aux_graph, forbidden_data_phy_edges)
+                forbidden_link_mask |= seg.route.link_mask
+            blocked_edges += ag.edges_on_links(forbidden_link_mask)
 
-        ns_by_phy_edge = self._recip_channel_count_by_physical_edge(ag.aux_graph)
+        ns_by_link = vt.recip_channels_per_link
         selected_recip_segments: list[Lightpath] = []
 
         for data_hop in lightpaths:
             src = self._physical_endpoint(data_hop.src)
             dst = self._physical_endpoint(data_hop.dst)
 
-            sub_graph = ag.get_sub_aux_graph(
+            sub_graph = self._get_sub_graph(
+                ag,
                 blocked_edges=list(blocked_edges),
                 blocked_edges_attr={"usage": "data", "avl_key_rate": flow.attrs["kgr"]},
             )
 
             try:
-                sp_node_path = nx.shortest_path(
+                sp_node_path = self._get_shortest_path(
                     sub_graph,
                     src,
                     dst,
-                    weight=lambda u, v, data: self._security_edge_weight(data, ns_by_phy_edge),
+                    weight=lambda u, v, data: self._security_edge_weight(data, ns_by_link),
                 )
             except (nx.NetworkXNoPath, nx.NodeNotFound):
-                logger.debug("No isolated recip path for data hop %s -> %s", src, dst)
+                if _trace.enabled:
+                    _trace.emit(TraceCode.ALG_NO_RECIP_PATH, flow.id, src, dst)
                 return []
 
-            sp_segments = self._find_lightpaths(sp_node_path, ag.aux_graph, "recip")
-            logger.debug("Isolated recip path for hop %s -> %s: %s", src, dst, sp_segments)
+            sp_segments = self._find_lightpaths(sp_node_path, ag, "recip")
+            if _trace.enabled:
+                _trace.emit(TraceCode.ALG_RECIP_PATH, flow.id, sp_segments)
 
             # 协商路径必须是一跳，即不经过中间 OEO/业务汇聚节点。
             if len(sp_segments) != 1:
@@ -165,11 +164,12 @@ class AuxGSecurityFirstGrooming(AuxGJointDataRecipGrooming):
 
         return selected_recip_segments
 
-    def _turn_path_to_hops(self, path: list[Any], aux_graph: nx.DiGraph) -> list[Segment]:
+    def _turn_path_to_hops(self, path: list[Any], ag: AuxiliaryGraph) -> list[Segment]:
         """将辅助图节点路径转换成 accept_flow 可消费的 Segment 列表。"""
         if not path:
             return []
 
+        aux_graph = ag.aux_graph
         hops: list[Segment] = []
         route: list[Any] = []
 
@@ -188,7 +188,7 @@ class AuxGSecurityFirstGrooming(AuxGJointDataRecipGrooming):
                             src=route[0],
                             dst=u,
                             kind="new",
-                            route=route,
+                            route=ag.routes.get(node.node for node in route),
                             wavelength=u.wavelength,
                         )
                     )
@@ -230,11 +230,15 @@ class AuxGSecurityFirstGrooming(AuxGJointDataRecipGrooming):
                         usage=edge_data["usage"],
                         kind="exist",
                         layer="lightpath",
-                        dedicate=edge_data["dedicate"]
+                        dedicate=edge_data["dedicate"],
+                        key=edge_data["key"],
                     )
                 )
             elif seg.kind == "new":
-                first_edge_data = aux_graph.edges[seg.route[0], seg.route[1]]
+                first_edge_data = aux_graph.edges[
+                    WavelengthNode(seg.route.nodes[0], seg.wavelength),
+                    WavelengthNode(seg.route.nodes[1], seg.wavelength),
+                ]
                 lightpaths.append(
                     Lightpath(
                         src=self._physical_endpoint(seg.src),
@@ -263,71 +267,20 @@ class AuxGSecurityFirstGrooming(AuxGJointDataRecipGrooming):
         resource_edges: list[tuple[Any, Any]] = []
         for seg in segments:
             if seg.kind == "new":
-                resource_edges.extend(zip(seg.route[:-1], seg.route[1:]))
+                resource_edges.extend(self._wavelength_edges(seg))
             elif seg.kind == "exist":
                 resource_edges.append((seg.src, seg.dst))
         return resource_edges
 
-    def _data_occupied_physical_edges(self, aux_graph: nx.DiGraph) -> set[tuple[int, int]]:
-        occupied: set[tuple[int, int]] = set()
-        for _u, _v, data in aux_graph.edges(data=True):
-            if data.get("layer") == "lightpath" and data.get("usage") == "data":
-                occupied.update(self._route_physical_edges(data.get("route", [])))
-        return occupied
-
-    def _recip_channel_count_by_physical_edge(self, aux_graph: nx.DiGraph) -> dict[tuple[int, int], int]:
-        counts: dict[tuple[int, int], int] = {}
-        for _u, _v, data in aux_graph.edges(data=True):
-            if data.get("layer") == "lightpath" and data.get("usage") == "recip":
-                for phy_edge in self._route_physical_edges(data.get("route", [])):
-                    counts[phy_edge] = counts.get(phy_edge, 0) + 1
-        return counts
-
-    def _aux_edges_intersecting_physical_edges(
-        self,
-        aux_graph: nx.DiGraph,
-        forbidden_phy_edges: set[tuple[int, int]],
-    ) -> list[tuple[Any, Any]]:
-        blocked: list[tuple[Any, Any]] = []
-        if not forbidden_phy_edges:
-            return blocked
-
-        for u, v, data in aux_graph.edges(data=True):
-            if data.get("layer") not in {"wavelength", "lightpath"}:
-                continue
-            if self._route_physical_edges(data.get("route", [])) & forbidden_phy_edges:
-                blocked.append((u, v))
-        return blocked
-
-    def _segment_physical_edges(self, seg: Segment) -> set[tuple[int, int]]:
-        return self._route_physical_edges(seg.route)
-
-    @staticmethod
-    def _route_physical_edges(route: list[Any]) -> set[tuple[int, int]]:
-        """兼容 [(u, v)] 形式和 [WavelengthNode(...), ...] 形式的 route。"""
-        if not route:
-            return set()
-
-        # AuxiliaryGraph 中 wavelength edge 的 route 是 [(u, v)]。
-        if all(isinstance(item, tuple) and len(item) == 2 for item in route):
-            return {(int(u), int(v)) for u, v in route}
-
-        # VirtualTopology 中 lightpath 的 route 是 WavelengthNode 列表。
-        physical_edges: set[tuple[int, int]] = set()
-        for u, v in zip(route[:-1], route[1:]):
-            if hasattr(u, "node") and hasattr(v, "node"):
-                physical_edges.add((u.node, v.node))
-        return physical_edges
-
-    def _security_edge_weight(self, edge_data: dict[str, Any], ns_by_phy_edge: dict[tuple[int, int], int]) -> float:
+    def _security_edge_weight(self, edge_data: dict[str, Any], ns_by_link: list[int]) -> float:
         """SPF 的 NSe 权重：优先选择已有协商信道数量更少的物理链路。"""
         if edge_data.get("layer") == "mapping":
             return 0.0
 
-        phy_edges = self._route_physical_edges(edge_data.get("route", []))
-        if not phy_edges:
+        links = edge_data["route"].links
+        if not links:
             return 1.0
 
         # +1 是物理跳数项，避免所有无协商占用链路权重都为 0；
         # sum(NSe) 是安全优先项。
-        return float(len(phy_edges) + sum(ns_by_phy_edge.get(edge, 0) for edge in phy_edges))
+        return float(len(links) + sum(ns_by_link[link] for link in links))
@@ -4,7 +4,14 @@ import networkx as nx
 from collections import defaultdict
 from dataclasses import dataclass
 
+from models.exceptions import TopologyError
+from observability.trace import TraceCode, get_trace
+from topology import schema
+from topology.route import RouteTable
+from topology.wavelength import WavelengthBitmap
+
 logger = logging.getLogger(__name__)
+_trace = get_trace("auxgraph")
 
 
 @dataclass(slots=True, frozen=True)
@@ -32,6 +39,7 @@ class AuxiliaryGraph:
      - id
      - Latitude, Longitude
      - layer: {physical, wavelength, lightpath}
+     - available: bool（仅 wavelength 节点，至少一条关联 wavelength 边可用）
     链路属性应包括：
      - layer: {mapping, physical, wavelength, lightpath}
      - wavelength_used: [index] | int
@@ -39,36 +47,16 @@ class AuxiliaryGraph:
      - avl_bandwidth: int
      - max_key_rate: int
      - avl_key_rate: int
-     - route: []
+     - route: Route（mapping 边为 []）
+     - available: bool（仅 wavelength 边，波长是否空闲）
+
+    wavelength 节点和边按物理链路的全部波长建立且不再删除，波长占用/释放只切换 available，
+    过滤视图据此剔除不可用的部分，使视图的邻接顺序与按当前空闲波长重新构建的辅助图一致。
     """
 
-    REQUIRED_NODE_ATTRS = (
-        "id",
-        "Latitude",
-        "Longitude",
-        "layer"
-    )
-
-    REQUIRED_EDGE_ATTRS_PHY = (
-        "layer",
-        "wavelength_used",
-        "wavelength_available",
-        "max_bandwidth",
-        "max_key_rate",
-        "route",
-    )
-
-    REQUIRED_EDGE_ATTRS_VIR = (
-        "layer",
-        "wavelength_used",
-        "max_bandwidth",
-        "max_key_rate",
-        "avl_bandwidth",
-        "avl_key_rate",
-        "route",
-        "usage",
-        "dedicate"
-    )
+    REQUIRED_NODE_ATTRS = schema.REQUIRED_NODE_ATTRS
+    REQUIRED_EDGE_ATTRS_PHY = schema.REQUIRED_EDGE_ATTRS_PHY
+    REQUIRED_EDGE_ATTRS_VIR = schema.REQUIRED_EDGE_ATTRS_VIR
 
     REQUIRED_EDGE_ATTRS_AUX = (
         "layer",
@@ -85,58 +73,81 @@ class AuxiliaryGraph:
     def __init__(self):
         self.aux_graph = nx.DiGraph()
         self._counter = itertools.count(0)
+        # 虚拟拓扑中 (src, dst, key) 对应的 lightpath 层节点，供控制平面增量维护辅助图。
+        self._lightpath_nodes: dict[tuple[int, int, int], tuple[VirtualNode, VirtualNode]] = {}
+        # CSR 编译快照，首次以 csr 引擎查询时编译，此后随辅助图增量维护，只在完整构建时丢弃。
+        self._csr = None
+        # 物理拓扑的路由驻留表，算法由辅助图路径生成光路时用它获得 Route。
+        self.routes: RouteTable | None = None
+        # 虚拟拓扑多重图（只读），增量加入 lightpath 时按其边顺序排列 mapping 边。
+        self._vir_graph: nx.MultiDiGraph | None = None
+        self._vir_node_order: dict[int, int] = {}
+        # 波长位图（只读）和链路编号 -> (u, v)，用于按物理链路列出 wavelength 边。
+        self._wavelengths: WavelengthBitmap | None = None
+        self._link_ends: dict[int, tuple[int, int]] = {}
+        # 物理链路编号 -> 经过该链路的 lightpath 层边
+        self._lightpath_edges_by_link: defaultdict[int, set[tuple[VirtualNode, VirtualNode]]] = defaultdict(set)
+        # wavelength 节点 -> 关联的可用 wavelength 边数，为 0 时节点不可用
+        self._available_degree: defaultdict[WavelengthNode, int] = defaultdict(int)
 
     def get_aux_graph(
             self,
             phy_graph: nx.DiGraph,
             vir_graph: nx.MultiDiGraph,
+            wavelengths: WavelengthBitmap,
+            routes: RouteTable,
+            validate: bool = True,
     ) -> nx.DiGraph:
-        self._validate_graph_with_attrs(phy_graph)
-        self._validate_graph_with_attrs(vir_graph)
+        """
+        从物理拓扑、波长位图和虚拟拓扑完整构建辅助图。
+
+        辅助图由控制平面持有，构建一次后通过 take_wavelength / release_wavelength /
+        add_lightpath / update_lightpath / remove_lightpath 增量维护。
+        validate 为 True 时先对两张图做一次完整的属性校验。
+        """
+        if validate:
+            schema.validate_graph(phy_graph)
+            schema.validate_graph(vir_graph)
+        self.routes = routes
+        self._vir_graph = vir_graph
+        self._vir_node_order = {node: i for i, node in enumerate(vir_graph)}
+        self._wavelengths = wavelengths
+        self._link_ends = {data["link"]: (u, v) for u, v, data in phy_graph.edges(data=True)}
 
         # 1. Add access / physical nodes
         for v, data in phy_graph.nodes(data=True):
             filter_attrs = {key: data[key] for key in self.REQUIRED_NODE_ATTRS}
             self.aux_graph.add_node(v, **filter_attrs)
-            logger.debug(f"AuxG adds {v} node with {filter_attrs}.")
+            if _trace.enabled:
+                _trace.emit(TraceCode.AUXG_NODE_ADDED, v, filter_attrs)
 
-        # 2. Build wavelength layer from available wavelengths
-        aws_by_node = defaultdict(set)
+        # 2. Build wavelength layer. Wavelength nodes and edges exist for every wavelength of a link,
+        #    take/release only toggles the "available" attribute of one edge.
+        wavelengths_by_node = defaultdict(set)
         for u, v, data in phy_graph.edges(data=True):
-            for w in data.get("wavelength_available", []):
+            for w in range(wavelengths.num_wavelengths):
                 self.aux_graph.add_node(
                     WavelengthNode(u, w),
                     layer="wavelength",
                 )
-                logger.debug(f"AuxG adds {WavelengthNode(u, w)} node in wavelength layer.")
+                if _trace.enabled:
+                    _trace.emit(TraceCode.AUXG_NODE_ADDED, WavelengthNode(u, w), "wavelength")
 
                 self.aux_graph.add_node(
                     WavelengthNode(v, w),
                     layer="wavelength",
                 )
-                logger.debug(f"AuxG adds {WavelengthNode(v, w)} node in wavelength layer.")
+                if _trace.enabled:
+                    _trace.emit(TraceCode.AUXG_NODE_ADDED, WavelengthNode(v, w), "wavelength")
 
-                aws_by_node[u].add(w)
-                aws_by_node[v].add(w)
+                wavelengths_by_node[u].add(w)
+                wavelengths_by_node[v].add(w)
 
-                self.aux_graph.add_edge(
-                    WavelengthNode(u, w),
-                    WavelengthNode(v, w),
-                    layer="wavelength",
-                    wavelength=w,
-                    max_bandwidth=data["max_bandwidth"],
-                    max_key_rate=data["max_key_rate"],
-                    avl_bandwidth=data["max_bandwidth"],
-                    avl_key_rate=data["max_key_rate"],
-                    route=[(u, v)],
-                    usage=None,
-                    dedicate=None
-                )
-                logger.debug(f"AuxG adds edge {WavelengthNode(u, w)} - {WavelengthNode(v, w)} with {self.aux_graph.edges[WavelengthNode(u, w), WavelengthNode(v, w)]}.")
+                self._add_wavelength_edge(u, v, w, data, wavelengths.is_available(data["link"], w))
 
         # 3. Mapping edges between access layer and wavelength layer
-        for node, wavelengths in aws_by_node.items():
-            for w in wavelengths:
+        for node, wavelengths in wavelengths_by_node.items():
+            for w in sorted(wavelengths):
                 self.aux_graph.add_edge(
                     node,
                     WavelengthNode(node, w),
@@ -150,7 +161,8 @@ class AuxiliaryGraph:
                     usage=None,
                     dedicate=None
                 )
-                logger.debug(f"AuxG adds edge {node} - {WavelengthNode(node, w)} with {self.aux_graph.edges[node, WavelengthNode(node, w)]}.")
+                if _trace.enabled:
+                    _trace.emit(TraceCode.AUXG_EDGE_ADDED, node, WavelengthNode(node, w), "mapping")
 
                 self.aux_graph.add_edge(
                     WavelengthNode(node, w),
@@ -165,75 +177,249 @@ class AuxiliaryGraph:
                     usage=None,
                     dedicate=None
                 )
-                logger.debug(f"AuxG adds edge {WavelengthNode(node, w)} - {node} with {self.aux_graph.edges[WavelengthNode(node, w), node]}.")
+                if _trace.enabled:
+                    _trace.emit(TraceCode.AUXG_EDGE_ADDED, WavelengthNode(node, w), node, "mapping")
 
         # 5. Build lightpath layer from existing lightpaths
         for u, v, key, data in vir_graph.edges(keys=True, data=True):
-            w = data.get("wavelength_used")
-            u_id = self._get_node_id()
-            v_id = self._get_node_id()
+            self._add_lightpath_edge(u, v, key, data)
 
-            self.aux_graph.add_node(
-                VirtualNode(u, w, u_id),
-                layer="lightpath"
-            )
-            logger.debug(f"AuxG adds {VirtualNode(u, w, u_id)} node in lightpath layer.")
+        self._csr = None
+        return self.aux_graph
 
-            self.aux_graph.add_node(
-                VirtualNode(v, w, v_id),
-                layer="lightpath"
-            )
-            logger.debug(f"AuxG adds {VirtualNode(v, w, v_id)} node in lightpath layer.")
-
-            self.aux_graph.add_edge(
-                u,
-                VirtualNode(u, w, u_id),
-                layer="mapping",
-                wavelength=None,
-                max_bandwidth=None,
-                max_key_rate=None,
-                avl_bandwidth=None,
-                avl_key_rate=None,
-                route=[],
-                usage=None,
-                dedicate=None
-            )
-            logger.debug(
-                f"AuxG adds edge {u} - {VirtualNode(u, w, u_id)} with {self.aux_graph.edges[u, VirtualNode(u, w, u_id)]}.")
-
-            self.aux_graph.add_edge(
-                VirtualNode(v, w, v_id),
-                v,
-                layer="mapping",
-                wavelength=None,
-                max_bandwidth=None,
-                max_key_rate=None,
-                avl_bandwidth=None,
-                avl_key_rate=None,
-                route=[],
-                usage=None,
-                dedicate=None
+    def take_wavelength(self, u: int, v: int, w: int) -> None:
+        """物理链路 u->v 上的波长 w 被占用：将对应的 wavelength 边标记为不可用。"""
+        self._set_wavelength_available(u, v, w, False)
+        if _trace.enabled:
+            _trace.emit(TraceCode.AUXG_WAVELENGTH_TAKEN, u, v, w)
+
+    def release_wavelength(self, u: int, v: int, w: int) -> None:
+        """物理链路 u->v 上的波长 w 被释放：将对应的 wavelength 边恢复为可用。"""
+        self._set_wavelength_available(u, v, w, True)
+        if _trace.enabled:
+            _trace.emit(TraceCode.AUXG_WAVELENGTH_RELEASED, u, v, w)
+
+    def add_lightpath(self, u: int, v: int, key: int, vir_edge_data: dict) -> None:
+        """虚拟拓扑新增 lightpath (u, v, key)：在 lightpath 层加入对应节点和边。"""
+        self._add_lightpath_edge(u, v, key, vir_edge_data)
+        self._order_lightpath_mapping_edges(u, v, key)
+        if self._csr is not None:
+            self._csr.add_nodes(self._lightpath_nodes[(u, v, key)])
+
+    def update_lightpath(self, u: int, v: int, key: int, vir_edge_data: dict) -> None:
+        """同步 lightpath (u, v, key) 的剩余带宽和剩余密钥速率。"""
+        u_node, v_node = self._lightpath_nodes[(u, v, key)]
+        edge_data = self.aux_graph.edges[u_node, v_node]
+        edge_data["avl_bandwidth"] = vir_edge_data["avl_bandwidth"]
+        edge_data["avl_key_rate"] = vir_edge_data["avl_key_rate"]
+        if self._csr is not None:
+            self._csr.update_capacity(u_node, v_node)
+
+    def remove_lightpath(self, u: int, v: int, key: int) -> None:
+        """lightpath (u, v, key) 被拆除：删除其 lightpath 层节点及所有关联边。"""
+        u_node, v_node = self._lightpath_nodes.pop((u, v, key))
+        for link in self.aux_graph.edges[u_node, v_node]["route"].links:
+            self._lightpath_edges_by_link[link].discard((u_node, v_node))
+        self.aux_graph.remove_nodes_from((u_node, v_node))
+        if self._csr is not None:
+            self._csr.remove_nodes((u_node, v_node))
+        if _trace.enabled:
+            _trace.emit(TraceCode.AUXG_LIGHTPATH_REMOVED, u, v, key)
+
+    def verify_against_rebuild(self, phy_graph: nx.DiGraph) -> None:
+        """
+        调试用（paranoid 模式）：与从当前拓扑完整构建的辅助图比较每个节点出边、入边的顺序，
+        以及边的可用性和剩余容量，不一致时抛出 TopologyError；CSR 快照存在时也核对它与辅助图一致。
+        增量维护必须保持这些一致，路径搜索在等长路径之间的选择才与完整构建相同。
+        """
+        rebuilt = AuxiliaryGraph()
+        rebuilt.get_aux_graph(phy_graph, self._vir_graph, self._wavelengths, self.routes, validate=False)
+
+        # lightpath 层节点的编号取决于建立顺序，按 (src, dst, key, 端点) 比较
+        def labeler(ag: AuxiliaryGraph):
+            ends = {}
+            for (u, v, key), (u_node, v_node) in ag._lightpath_nodes.items():
+                ends[u_node] = (u, v, key, "src")
+                ends[v_node] = (u, v, key, "dst")
+            return lambda node: ends.get(node, node)
+
+        label, rebuilt_label = labeler(self), labeler(rebuilt)
+        rebuilt_nodes = {rebuilt_label(node): node for node in rebuilt.aux_graph}
+        if len(rebuilt_nodes) != self.aux_graph.number_of_nodes():
+            raise TopologyError(
+                f"auxiliary graph has {self.aux_graph.number_of_nodes()} nodes, a rebuild has {len(rebuilt_nodes)}"
             )
-            logger.debug(
-                f"AuxG adds edge {VirtualNode(v, w, v_id)} - {v} with {self.aux_graph.edges[VirtualNode(v, w, v_id), v]}.")
-
-            self.aux_graph.add_edge(
-                VirtualNode(u, w, u_id),
-                VirtualNode(v, w, v_id),
-                layer="lightpath",
-                wavelength=w,
-                max_bandwidth=data["max_bandwidth"],
-                max_key_rate=data["max_key_rate"],
-                avl_bandwidth=data["avl_bandwidth"],
-                avl_key_rate=data["avl_key_rate"],
-                route=data["route"],
-                usage=data["usage"],
-                dedicate=data["dedicate"]
+
+        for node in self.aux_graph:
+            other = rebuilt_nodes.get(label(node))
+            if other is None:
+                raise TopologyError(f"auxiliary graph node {label(node)} is missing from a rebuild")
+            if self.aux_graph.nodes[node].get("available") != rebuilt.aux_graph.nodes[other].get("available"):
+                raise TopologyError(f"availability of auxiliary graph node {label(node)} differs from a rebuild")
+            for adjacency, rebuilt_adjacency in (
+                    (self.aux_graph.succ, rebuilt.aux_graph.succ),
+                    (self.aux_graph.pred, rebuilt.aux_graph.pred),
+            ):
+                if [label(n) for n in adjacency[node]] != [rebuilt_label(n) for n in rebuilt_adjacency[other]]:
+                    raise TopologyError(f"adjacency order of auxiliary graph node {label(node)} differs from a rebuild")
+
+        for u, v, data in self.aux_graph.edges(data=True):
+            rebuilt_data = rebuilt.aux_graph.edges[rebuilt_nodes[label(u)], rebuilt_nodes[label(v)]]
+            for attr in ("available", "avl_bandwidth", "avl_key_rate"):
+                if data.get(attr) != rebuilt_data.get(attr):
+                    raise TopologyError(
+                        f"{attr} of auxiliary graph edge {label(u)} -> {label(v)} differs from a rebuild"
+                    )
+
+        if self._csr is not None:
+            self._csr.verify()
+
+    def get_lightpath_nodes(self, u: int, v: int, key: int) -> tuple[VirtualNode, VirtualNode]:
+        """虚拟拓扑 lightpath (u, v, key) 在辅助图 lightpath 层中的两个端点。"""
+        return self._lightpath_nodes[(u, v, key)]
+
+    def edges_on_links(self, link_mask: int) -> list[tuple]:
+        """经过 link_mask 中任一物理链路的 wavelength 边和 lightpath 边，按索引查找而非扫描全图。"""
+        edges: set[tuple] = set()
+        while link_mask:
+            low = link_mask & -link_mask
+            link = low.bit_length() - 1
+            link_mask ^= low
+
+            u, v = self._link_ends[link]
+            edges.update(
+                (WavelengthNode(u, w), WavelengthNode(v, w)) for w in self._wavelengths.available(link)
             )
-            logger.debug(
-                f"AuxG adds edge {VirtualNode(u, w, u_id)} - {VirtualNode(v, w, v_id)} with {self.aux_graph.edges[VirtualNode(u, w, u_id), VirtualNode(v, w, v_id)]}.")
+            edges.update(self._lightpath_edges_by_link[link])
+        return list(edges)
+
+    def _add_wavelength_edge(self, u: int, v: int, w: int, data: dict, available: bool) -> None:
+        self.aux_graph.add_edge(
+            WavelengthNode(u, w),
+            WavelengthNode(v, w),
+            layer="wavelength",
+            wavelength=w,
+            max_bandwidth=data["max_bandwidth"],
+            max_key_rate=data["max_key_rate"],
+            avl_bandwidth=data["max_bandwidth"],
+            avl_key_rate=data["max_key_rate"],
+            route=data["route"],
+            usage=None,
+            dedicate=None,
+            available=available,
+        )
+        for node in (WavelengthNode(u, w), WavelengthNode(v, w)):
+            self._available_degree[node] += available
+            self.aux_graph.nodes[node]["available"] = self._available_degree[node] > 0
+        if _trace.enabled:
+            _trace.emit(TraceCode.AUXG_EDGE_ADDED, WavelengthNode(u, w), WavelengthNode(v, w), "wavelength")
+
+    def _set_wavelength_available(self, u: int, v: int, w: int, available: bool) -> None:
+        self.aux_graph.edges[WavelengthNode(u, w), WavelengthNode(v, w)]["available"] = available
+        for node in (WavelengthNode(u, w), WavelengthNode(v, w)):
+            self._available_degree[node] += 1 if available else -1
+            self.aux_graph.nodes[node]["available"] = self._available_degree[node] > 0
+        if self._csr is not None:
+            self._csr.update_available(WavelengthNode(u, w), WavelengthNode(v, w))
+
+    def _order_lightpath_mapping_edges(self, u: int, v: int, key: int) -> None:
+        """
+        完整构建时 lightpath 层按虚拟拓扑多重图的边顺序加入，增量加入的 mapping 边则排在邻接表末尾。
+        把按该顺序排在新 lightpath 之后的 mapping 边删除后重新加入，u 的出边、v 的入边顺序
+        即与完整构建一致，等长路径的选择也就相同。只涉及 u、v 上的 lightpath。
+        """
+        u_node, v_node = self._lightpath_nodes[(u, v, key)]
+
+        out_nodes = [self._lightpath_nodes[(u, dst, k)][0] for _, dst, k in self._vir_graph.out_edges(u, keys=True)]
+        for node in out_nodes[out_nodes.index(u_node) + 1:]:
+            self._reinsert_edge(u, node)
+
+        # vir_graph.edges() 按源节点在多重图中的顺序、再按边键顺序列出终止于 v 的 lightpath
+        in_nodes = [
+            self._lightpath_nodes[(src, v, k)][1]
+            for src in sorted(self._vir_graph.pred[v], key=self._vir_node_order.__getitem__)
+            for k in self._vir_graph.succ[src][v]
+        ]
+        for node in in_nodes[in_nodes.index(v_node) + 1:]:
+            self._reinsert_edge(node, v)
+
+    def _reinsert_edge(self, a, b) -> None:
+        """删除并重新加入边 (a, b)，使其排到 a 的出边和 b 的入边末尾。"""
+        data = self.aux_graph.edges[a, b]
+        self.aux_graph.remove_edge(a, b)
+        self.aux_graph.add_edge(a, b, **data)
+
+    def _add_lightpath_edge(self, u: int, v: int, key: int, data: dict) -> None:
+        w = data.get("wavelength_used")
+        u_id = self._get_node_id()
+        v_id = self._get_node_id()
+
+        self.aux_graph.add_node(
+            VirtualNode(u, w, u_id),
+            layer="lightpath"
+        )
+        if _trace.enabled:
+            _trace.emit(TraceCode.AUXG_NODE_ADDED, VirtualNode(u, w, u_id), "lightpath")
 
-        return self.aux_graph
+        self.aux_graph.add_node(
+            VirtualNode(v, w, v_id),
+            layer="lightpath"
+        )
+        if _trace.enabled:
+            _trace.emit(TraceCode.AUXG_NODE_ADDED, VirtualNode(v, w, v_id), "lightpath")
+
+        self.aux_graph.add_edge(
+            u,
+            VirtualNode(u, w, u_id),
+            layer="mapping",
+            wavelength=None,
+            max_bandwidth=None,
+            max_key_rate=None,
+            avl_bandwidth=None,
+            avl_key_rate=None,
+            route=[],
+            usage=None,
+            dedicate=None
+        )
+        if _trace.enabled:
+            _trace.emit(TraceCode.AUXG_EDGE_ADDED, u, VirtualNode(u, w, u_id), "mapping")
+
+        self.aux_graph.add_edge(
+            VirtualNode(v, w, v_id),
+            v,
+            layer="mapping",
+            wavelength=None,
+            max_bandwidth=None,
+            max_key_rate=None,
+            avl_bandwidth=None,
+            avl_key_rate=None,
+            route=[],
+            usage=None,
+            dedicate=None
+        )
+        if _trace.enabled:
+            _trace.emit(TraceCode.AUXG_EDGE_ADDED, VirtualNode(v, w, v_id), v, "mapping")
+
+        self.aux_graph.add_edge(
+            VirtualNode(u, w, u_id),
+            VirtualNode(v, w, v_id),
+            layer="lightpath",
+            wavelength=w,
+            max_bandwidth=data["max_bandwidth"],
+            max_key_rate=data["max_key_rate"],
+            avl_bandwidth=data["avl_bandwidth"],
+            avl_key_rate=data["avl_key_rate"],
+            route=data["route"],
+            usage=data["usage"],
+            dedicate=data["dedicate"],
+            key=key,
+        )
+        if _trace.enabled:
+            _trace.emit(TraceCode.AUXG_EDGE_ADDED, VirtualNode(u, w, u_id), VirtualNode(v, w, v_id), "lightpath", key)
+
+        self._lightpath_nodes[(u, v, key)] = (VirtualNode(u, w, u_id), VirtualNode(v, w, v_id))
+        for link in data["route"].links:
+            self._lightpath_edges_by_link[link].add((VirtualNode(u, w, u_id), VirtualNode(v, w, v_id)))
 
     def get_sub_aux_graph(
             self,
@@ -250,6 +436,8 @@ class AuxiliaryGraph:
                 return False
 
             node_data = self.aux_graph.nodes[n]
+            if not node_data.get("available", True):
+                return False
             for key, value in blocked_nodes_attr.items():
                 if node_data.get(key) == value:
                     return False
@@ -259,20 +447,25 @@ class AuxiliaryGraph:
         def filter_edge(u, v):
             # 依赖两种方式，其一是指定节点，其二是指定属性
             if (u, v) in blocked_edges:
-                logging.debug(f"Filter {u, v} by node: {self.aux_graph.edges[u, v]}")
+                if _trace.enabled:
+                    _trace.emit(TraceCode.AUXG_EDGE_FILTERED, u, v, "edge")
                 return False
 
             edge_data = self.aux_graph.edges[u, v]
+            if not edge_data.get("available", True):
+                return False
             for key, value in blocked_edges_attr.items():
                 actual = edge_data.get(key)
 
                 if key in {"avl_key_rate", "avl_bandwidth"}:
                     if actual is not None and actual < value:
-                        logging.debug(f"Filter {u, v} by rate: {self.aux_graph.edges[u, v]}")
+                        if _trace.enabled:
+                            _trace.emit(TraceCode.AUXG_EDGE_FILTERED, u, v, key, actual)
                         return False
                 else:
                     if actual == value:
-                        logging.debug(f"Filter {u, v} by attr: {self.aux_graph.edges[u, v]}")
+                        if _trace.enabled:
+                            _trace.emit(TraceCode.AUXG_EDGE_FILTERED, u, v, key, actual)
                         return False
             return True
 
@@ -284,27 +477,27 @@ class AuxiliaryGraph:
 
         return sub_graph
 
-    def _validate_graph_with_attrs(self, graph: nx.DiGraph | nx.MultiDiGraph):
-        # 校验节点
-        for node, data in graph.nodes(data=True):
-            for attr in self.REQUIRED_NODE_ATTRS:
-                if attr not in data:
-                    logger.error(f"Node {node} has no attr {attr}.")
-                    raise AttributeError
-
-        # 校验边
-        if graph.is_multigraph():
-            for u, v, key, data in graph.edges(keys=True, data=True):
-                for attr in self.REQUIRED_EDGE_ATTRS_VIR:
-                    if attr not in data:
-                        logger.error(f"Edge {key}th from {u} to {v} has no attr {attr}.")
-                        raise AttributeError
-        else:
-            for u, v, data in graph.edges(data=True):
-                for attr in self.REQUIRED_EDGE_ATTRS_PHY:
-                    if attr not in data:
-                        logger.error(f"Edge from {u} to {v} has no attr {attr}.")
-                        raise AttributeError
+    def get_sub_csr_graph(
+            self,
+            blocked_nodes: list = [],
+            blocked_edges: [tuple] = [],
+            blocked_nodes_attr: dict = {},
+            blocked_edges_attr: dict = {}
+    ):
+        """
+        与 get_sub_aux_graph 过滤语义相同，但返回基于 CSR 快照的视图（csr 引擎）。
+        快照只编译一次，波长占用/释放、lightpath 增删和剩余容量变化都原地同步。
+        """
+        from .csr_engine import CSRAuxiliaryGraph
+
+        if self._csr is None:
+            self._csr = CSRAuxiliaryGraph(self.aux_graph)
+        return self._csr.get_sub_graph(
+            blocked_nodes=blocked_nodes,
+            blocked_edges=blocked_edges,
+            blocked_nodes_attr=blocked_nodes_attr,
+            blocked_edges_attr=blocked_edges_attr,
+        )
 
     def _get_node_id(self):
         return next(self._counter)
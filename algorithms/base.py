@@ -5,7 +5,8 @@ from dataclasses import dataclass
 
 from models.flow import Flow
 from topology.physical import PhysicalTopology
-from topology.virtual import VirtualTopology
+from topology.virtual import Lightpath, VirtualTopology
+from .auxiliary_graph import AuxiliaryGraph, WavelengthNode
 
 
 @dataclass
@@ -14,6 +15,7 @@ class AlgInput:
     flow: Flow
     pt: PhysicalTopology
     vt: VirtualTopology
+    ag: AuxiliaryGraph
 
 
 @dataclass
@@ -24,17 +26,104 @@ class AlgOutput:
 
 
 class HeuristicAlgorithm(Protocol):
+    ENGINES = ("networkx", "csr")
+
     def flow_arrival(self, alg_input: AlgInput) -> AlgOutput: ...
 
     def flow_departure(self, flow_id: int) -> AlgOutput: ...
 
     def simulation_end(self) -> None: ...
 
+    def _get_sub_graph(self, ag: AuxiliaryGraph, **filters):
+        """按所选搜索引擎（networkx 或 csr）返回过滤后的辅助图视图。"""
+        if getattr(self, "engine", "networkx") == "csr":
+            return ag.get_sub_csr_graph(**filters)
+        return ag.get_sub_aux_graph(**filters)
+
+    def _get_candidate_paths(self, alg_input: AlgInput) -> list:
+        """
+        数据路径候选集。
+
+        默认在过滤后的辅助图（数据路径不能走协商光路，并且必须满足带宽约束）上运行 Yen 算法；
+        若配置了预计算的物理 K 路由缓存，则直接把缓存路由结合已有光路和 first-fit 波长
+        转换为辅助图路径，不再构建过滤视图。
+        """
+        flow = alg_input.flow
+        path_cache = getattr(self, "path_cache", None)
+        if path_cache is None:
+            sub_graph = self._get_sub_graph(
+                alg_input.ag,
+                blocked_edges_attr={
+                    "usage": "recip",
+                    "avl_bandwidth": flow.rate
+                }
+            )
+            return self._get_kpaths(sub_graph, flow.src, flow.dst, self.k)
+
+        candidates = []
+        for route in path_cache.get(flow.src, flow.dst)[:self.k]:
+            aux_path = self._route_to_aux_path(alg_input, route)
+            if aux_path:
+                candidates.append(aux_path)
+        return candidates
+
+    @staticmethod
+    def _route_to_aux_path(alg_input: AlgInput, route: list[int]) -> list:
+        """
+        沿物理路由从源到宿贪心地拼接辅助图路径：
+
+         - 已有数据光路：物理路由与当前位置之后的路由重合、且剩余带宽足够，取走得最远的一条；
+         - 新建光路：从当前位置起对沿途链路的波长位图按位与，尽量延伸，取 first-fit 波长。
+
+        两者中走得更远者胜出，相同则优先复用已有光路；均不可行时返回空列表。
+        """
+        pt, vt, ag, rate = alg_input.pt, alg_input.vt, alg_input.ag, alg_input.flow.rate
+        masks = pt.wavelengths.masks
+        links = pt.routes.get(route).links
+
+        aux_path: list = [route[0]]
+        i = 0
+        while i < len(links):
+            groom_reach, groom_nodes = i, None
+            for _, v, key, data in vt.graph.out_edges(route[i], keys=True, data=True):
+                if data["usage"] != "data" or data["avl_bandwidth"] < rate:
+                    continue
+                lightpath_links = data["route"].links
+                end = i + len(lightpath_links)
+                if end > groom_reach and links[i:end] == lightpath_links:
+                    groom_reach, groom_nodes = end, ag.get_lightpath_nodes(route[i], v, key)
+
+            mask = pt.wavelengths.full_mask
+            new_reach = i
+            while (
+                new_reach < len(links)
+                and mask & masks[links[new_reach]]
+                and pt.graph.edges[route[new_reach], route[new_reach + 1]]["max_bandwidth"] >= rate
+            ):
+                mask &= masks[links[new_reach]]
+                new_reach += 1
+
+            if new_reach > groom_reach:
+                w = pt.wavelengths.lowest_wavelength(mask)
+                aux_path.extend(WavelengthNode(node, w) for node in route[i:new_reach + 1])
+                aux_path.append(route[new_reach])
+                i = new_reach
+            elif groom_nodes is not None:
+                aux_path.extend(groom_nodes)
+                aux_path.append(route[groom_reach])
+                i = groom_reach
+            else:
+                return []
+        return aux_path
+
     @staticmethod
     def _get_kpaths(graph, src: int, dst: int, k: int) -> list:
         import networkx as nx
         from itertools import islice
 
+        if hasattr(graph, "k_shortest_paths"):
+            return graph.k_shortest_paths(src, dst, k)
+
         # 寻找K条路径
         try:
             paths = nx.shortest_simple_paths(graph, src, dst)
@@ -43,6 +132,21 @@ class HeuristicAlgorithm(Protocol):
             k_paths = []
         return k_paths
 
+    @staticmethod
+    def _get_shortest_path(graph, src, dst, weight=None) -> list:
+        """两种引擎共用的最短路入口，无路径时抛出 nx.NetworkXNoPath / nx.NodeNotFound。"""
+        import networkx as nx
+
+        if hasattr(graph, "k_shortest_paths"):
+            return graph.shortest_path(src, dst, weight=weight)
+        return nx.shortest_path(graph, src, dst, weight=weight)
+
+    @staticmethod
+    def _wavelength_edges(lightpath: Lightpath) -> list[tuple[WavelengthNode, WavelengthNode]]:
+        """光路路由在辅助图波长层对应的边。"""
+        w = lightpath.wavelength_used
+        return [(WavelengthNode(u, w), WavelengthNode(v, w)) for u, v in lightpath.route.edges]
+
     @staticmethod
     def _get_node_pairs(path: list):
         return zip(path[:-1], path[1:])
\ No newline at end of file
@@ -0,0 +1,490 @@
+from __future__ import annotations
+
+import logging
+from heapq import heappop, heappush
+from itertools import count
+from typing import Any, Callable, Hashable
+
+import networkx as nx
+import numpy as np
+
+from models.exceptions import TopologyError
+
+logger = logging.getLogger(__name__)
+
+# 与 AuxiliaryGraph.get_sub_aux_graph 一致：这两个属性按 "actual < value" 过滤，其余属性按相等过滤。
+CAPACITY_ATTRS = ("avl_bandwidth", "avl_key_rate")
+
+
+class CSRAuxiliaryGraph:
+    """
+    辅助图的 CSR 编译快照。
+
+    节点和边映射为整数编号，每个节点的出边/入边保存为按 networkx 邻接表迭代顺序排列的
+    (邻居编号, 边编号) 列表，因此在其上运行的 BFS、Dijkstra 和 K 最短路与 networkx 在
+    subgraph_view 上的结果完全一致。边的剩余带宽/密钥速率保存在 NumPy 列中，过滤条件被
+    向量化为布尔掩码，搜索时不再逐边调用 Python 过滤闭包。
+
+    快照构建一次后随辅助图增量维护：波长占用/释放只改写可用性掩码（update_available），
+    lightpath 层节点和边的增删通过 add_nodes / remove_nodes 占用或释放预留的编号槽位，
+    空闲槽位的可用性为 False，不会出现在任何过滤视图中。
+    """
+
+    def __init__(self, graph: nx.DiGraph):
+        self.graph = graph
+        self.nodes: list[Hashable | None] = []
+        self.node_index: dict[Hashable, int] = {}
+        self.edge_data: list[dict[str, Any] | None] = []
+        self.edge_index: dict[tuple[Hashable, Hashable], int] = {}
+        # 被释放的节点/边编号，新的 lightpath 层节点和边优先复用。
+        self._free_nodes: list[int] = []
+        self._free_edges: list[int] = []
+
+        num_nodes = graph.number_of_nodes()
+        num_edges = graph.number_of_edges()
+        self.node_available = np.zeros(num_nodes, dtype=bool)
+        self.edge_src = np.zeros(num_edges, dtype=np.int64)
+        self.edge_dst = np.zeros(num_edges, dtype=np.int64)
+        self.edge_available = np.zeros(num_edges, dtype=bool)
+        # 容量列：None 记为 NaN，NaN 参与 "<" 比较恒为 False，即不被过滤。
+        self.capacity: dict[str, np.ndarray] = {
+            attr: np.full(num_edges, np.nan, dtype=np.float64) for attr in CAPACITY_ATTRS
+        }
+        # 其余属性（usage、dedicate 等）按需编码为整数列，空闲槽位编码为 -1。
+        self._codes: dict[str, tuple[np.ndarray, dict[Any, int]]] = {}
+
+        # 遍历时使用 Python 列表，避免逐元素访问 NumPy 标量的开销。
+        self._succ: list[list[tuple[int, int]]] = []
+        self._pred: list[list[tuple[int, int]]] = []
+
+        for node in graph:
+            self._add_node(node)
+        for u, v in graph.edges:
+            self._add_edge(u, v)
+        for node in graph:
+            self._link(node)
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.node_index)
+
+    @property
+    def num_edges(self) -> int:
+        return len(self.edge_index)
+
+    def update_capacity(self, u: Hashable, v: Hashable) -> None:
+        """边 (u, v) 的剩余容量变化后同步容量列，无需重新编译。"""
+        eid = self.edge_index[(u, v)]
+        data = self.edge_data[eid]
+        for attr, column in self.capacity.items():
+            column[eid] = np.nan if data.get(attr) is None else data[attr]
+
+    def update_available(self, u: Hashable, v: Hashable) -> None:
+        """边 (u, v) 及其端点的 available 属性变化后同步可用性掩码。"""
+        self.edge_available[self.edge_index[(u, v)]] = self.graph.edges[u, v].get("available", True)
+        for node in (u, v):
+            self.node_available[self.node_index[node]] = self.graph.nodes[node].get("available", True)
+
+    def add_nodes(self, nodes) -> None:
+        """
+        辅助图新增了 nodes 及其关联边后调用：为它们分配编号，并按辅助图当前的邻接顺序
+        重建这些节点及其邻居的邻接列表。
+        """
+        neighbors = set()
+        for node in nodes:
+            self._add_node(node)
+        for node in nodes:
+            for v in self.graph.succ[node]:
+                if (node, v) not in self.edge_index:
+                    self._add_edge(node, v)
+                neighbors.add(v)
+            for u in self.graph.pred[node]:
+                if (u, node) not in self.edge_index:
+                    self._add_edge(u, node)
+                neighbors.add(u)
+        for node in neighbors.union(nodes):
+            self._link(node)
+
+    def remove_nodes(self, nodes) -> None:
+        """辅助图删除了 nodes 及其关联边后调用：释放它们的编号，并从邻居的邻接列表中移除。"""
+        for node in nodes:
+            i = self.node_index.pop(node)
+            for w, eid in self._succ[i]:
+                self._pred[w] = [entry for entry in self._pred[w] if entry[1] != eid]
+                self._remove_edge(eid)
+            for w, eid in self._pred[i]:
+                self._succ[w] = [entry for entry in self._succ[w] if entry[1] != eid]
+                self._remove_edge(eid)
+            self._succ[i] = []
+            self._pred[i] = []
+            self.nodes[i] = None
+            self.node_available[i] = False
+            self._free_nodes.append(i)
+
+    def verify(self) -> None:
+        """调试用：核对增量维护的编号、邻接顺序、可用性掩码和容量列与辅助图一致，否则抛出 TopologyError。"""
+        if self.num_nodes != self.graph.number_of_nodes() or self.num_edges != self.graph.number_of_edges():
+            raise TopologyError("CSR snapshot and auxiliary graph differ in size")
+        for node, i in self.node_index.items():
+            if (
+                    [self.nodes[w] for w, _ in self._succ[i]] != list(self.graph.succ[node])
+                    or [self.nodes[w] for w, _ in self._pred[i]] != list(self.graph.pred[node])
+            ):
+                raise TopologyError(f"CSR adjacency of {node!r} differs from the auxiliary graph")
+            if self.node_available[i] != self.graph.nodes[node].get("available", True):
+                raise TopologyError(f"CSR availability of {node!r} differs from the auxiliary graph")
+        for (u, v), eid in self.edge_index.items():
+            data = self.graph.edges[u, v]
+            if self.edge_available[eid] != data.get("available", True):
+                raise TopologyError(f"CSR availability of edge {u!r} -> {v!r} differs from the auxiliary graph")
+            for attr, column in self.capacity.items():
+                expected = np.nan if data.get(attr) is None else data[attr]
+                if not (column[eid] == expected or np.isnan(column[eid]) and np.isnan(expected)):
+                    raise TopologyError(f"CSR {attr} of edge {u!r} -> {v!r} differs from the auxiliary graph")
+
+    def _add_node(self, node: Hashable) -> None:
+        if self._free_nodes:
+            i = self._free_nodes.pop()
+            self.nodes[i] = node
+        else:
+            i = len(self.nodes)
+            self.nodes.append(node)
+            self._succ.append([])
+            self._pred.append([])
+            if i == len(self.node_available):
+                self.node_available = _grow(self.node_available, False)
+        self.node_index[node] = i
+        self.node_available[i] = self.graph.nodes[node].get("available", True)
+
+    def _add_edge(self, u: Hashable, v: Hashable) -> None:
+        data = self.graph.edges[u, v]
+        if self._free_edges:
+            eid = self._free_edges.pop()
+            self.edge_data[eid] = data
+        else:
+            eid = len(self.edge_data)
+            self.edge_data.append(data)
+            if eid == len(self.edge_available):
+                self.edge_src = _grow(self.edge_src, 0)
+                self.edge_dst = _grow(self.edge_dst, 0)
+                self.edge_available = _grow(self.edge_available, False)
+                for attr, column in self.capacity.items():
+                    self.capacity[attr] = _grow(column, np.nan)
+                for key, (codes, vocabulary) in self._codes.items():
+                    self._codes[key] = (_grow(codes, -1), vocabulary)
+        self.edge_index[(u, v)] = eid
+        self.edge_src[eid] = self.node_index[u]
+        self.edge_dst[eid] = self.node_index[v]
+        self.edge_available[eid] = data.get("available", True)
+        for attr, column in self.capacity.items():
+            column[eid] = np.nan if data.get(attr) is None else data[attr]
+        for key, (codes, vocabulary) in self._codes.items():
+            codes[eid] = vocabulary.setdefault(data.get(key), len(vocabulary))
+
+    def _remove_edge(self, eid: int) -> None:
+        key = (self.nodes[self.edge_src[eid]], self.nodes[self.edge_dst[eid]])
+        if self.edge_index.pop(key, None) is None:
+            return      # 两端点同时被删除时，这条边已经在另一端释放
+        self.edge_data[eid] = None
+        self.edge_available[eid] = False
+        for codes, _ in self._codes.values():
+            codes[eid] = -1
+        self._free_edges.append(eid)
+
+    def _link(self, node: Hashable) -> None:
+        """按辅助图当前的邻接顺序重建 node 的出边/入边列表，并同步边属性字典的引用。"""
+        i = self.node_index[node]
+        succ = []
+        for v, data in self.graph.succ[node].items():
+            eid = self.edge_index[(node, v)]
+            self.edge_data[eid] = data
+            succ.append((self.node_index[v], eid))
+        pred = []
+        for u, data in self.graph.pred[node].items():
+            eid = self.edge_index[(u, node)]
+            self.edge_data[eid] = data
+            pred.append((self.node_index[u], eid))
+        self._succ[i] = succ
+        self._pred[i] = pred
+
+    def get_sub_graph(
+            self,
+            blocked_nodes=(),
+            blocked_edges=(),
+            blocked_nodes_attr: dict | None = None,
+            blocked_edges_attr: dict | None = None,
+    ) -> CSRSubGraph:
+        """与 AuxiliaryGraph.get_sub_aux_graph 过滤语义一致的掩码视图。"""
+        node_mask = self.node_available.copy()
+        for node in blocked_nodes or ():
+            index = self.node_index.get(node)
+            if index is not None:
+                node_mask[index] = False
+        for key, value in (blocked_nodes_attr or {}).items():
+            for node, index in self.node_index.items():
+                if self.graph.nodes[node].get(key) == value:
+                    node_mask[index] = False
+
+        edge_mask = self.edge_available & node_mask[self.edge_src] & node_mask[self.edge_dst]
+        for key, value in (blocked_edges_attr or {}).items():
+            if key in self.capacity:
+                edge_mask &= ~(self.capacity[key] < value)
+            else:
+                codes, vocabulary = self._category_codes(key)
+                if value in vocabulary:
+                    edge_mask &= codes != vocabulary[value]
+        for edge in blocked_edges or ():
+            eid = self.edge_index.get(edge)
+            if eid is not None:
+                edge_mask[eid] = False
+
+        return CSRSubGraph(self, node_mask.tolist(), edge_mask.tolist())
+
+    def _category_codes(self, key: str) -> tuple[np.ndarray, dict[Any, int]]:
+        if key not in self._codes:
+            vocabulary: dict[Any, int] = {}
+            codes = np.full(len(self.edge_available), -1, dtype=np.int64)
+            for eid, data in enumerate(self.edge_data):
+                if data is not None:
+                    codes[eid] = vocabulary.setdefault(data.get(key), len(vocabulary))
+            self._codes[key] = (codes, vocabulary)
+        return self._codes[key]
+
+
+def _grow(array: np.ndarray, fill) -> np.ndarray:
+    """容量翻倍，新增的槽位填充为 fill。"""
+    return np.concatenate([array, np.full(max(len(array), 16), fill, dtype=array.dtype)])
+
+
+class CSRSubGraph:
+    """
+    CSR 辅助图上的过滤视图，提供 BFS、Dijkstra 与 K 最短路搜索。
+
+    各搜索过程逐行对应 networkx 的实现（bidirectional_shortest_path、
+    bidirectional_dijkstra、shortest_simple_paths），邻居遍历顺序也与其相同，
+    从而保证两种引擎返回同一条路径。
+    """
+
+    def __init__(self, csr: CSRAuxiliaryGraph, node_mask: list[bool], edge_mask: list[bool]):
+        self.csr = csr
+        self.node_mask = node_mask
+        self.edge_mask = edge_mask
+
+    def __contains__(self, node: Hashable) -> bool:
+        index = self.csr.node_index.get(node)
+        return index is not None and self.node_mask[index]
+
+    def shortest_path(
+            self,
+            source: Hashable,
+            target: Hashable,
+            weight: Callable[[Any, Any, dict], float | None] | None = None,
+    ) -> list[Hashable]:
+        """等价于 nx.shortest_path(sub_graph, source, target, weight)。"""
+        if source not in self:
+            raise nx.NodeNotFound(f"Source {source} is not in G")
+        if target not in self:
+            raise nx.NodeNotFound(f"Target {target} is not in G")
+
+        s = self.csr.node_index[source]
+        t = self.csr.node_index[target]
+        if weight is None:
+            path = self._bidirectional_bfs(s, t)
+        else:
+            path = self._bidirectional_dijkstra(s, t, weight)
+        return [self.csr.nodes[i] for i in path]
+
+    def k_shortest_paths(self, source: Hashable, target: Hashable, k: int) -> list[list[Hashable]]:
+        """等价于 islice(nx.shortest_simple_paths(sub_graph, source, target), k)，无路径时返回空列表。"""
+        if source not in self or target not in self:
+            return []
+
+        s = self.csr.node_index[source]
+        t = self.csr.node_index[target]
+        paths: list[list[Hashable]] = []
+        for path in self._shortest_simple_paths(s, t):
+            paths.append([self.csr.nodes[i] for i in path])
+            if len(paths) >= k:
+                break
+        return paths
+
+    def _neighbors(self, adjacency, v: int, ignore_nodes=None, ignore_edges=None, reverse=False):
+        node_mask = self.node_mask
+        edge_mask = self.edge_mask
+        for w, e in adjacency[v]:
+            if not edge_mask[e] or not node_mask[w]:
+                continue
+            if ignore_nodes and w in ignore_nodes:
+                continue
+            if ignore_edges and ((w, v) if reverse else (v, w)) in ignore_edges:
+                continue
+            yield w
+
+    def _bidirectional_pred_succ(self, source: int, target: int, ignore_nodes=None, ignore_edges=None):
+        if ignore_nodes and (source in ignore_nodes or target in ignore_nodes):
+            raise nx.NetworkXNoPath(f"No path between {source} and {target}.")
+        if target == source:
+            return {target: None}, {source: None}, source
+
+        succ_adj = self.csr._succ
+        pred_adj = self.csr._pred
+        pred = {source: None}
+        succ = {target: None}
+        forward_fringe = [source]
+        reverse_fringe = [target]
+
+        while forward_fringe and reverse_fringe:
+            if len(forward_fringe) <= len(reverse_fringe):
+                this_level = forward_fringe
+                forward_fringe = []
+                for v in this_level:
+                    for w in self._neighbors(succ_adj, v, ignore_nodes, ignore_edges):
+                        if w not in pred:
+                            forward_fringe.append(w)
+                            pred[w] = v
+                        if w in succ:
+                            return pred, succ, w
+            else:
+                this_level = reverse_fringe
+                reverse_fringe = []
+                for v in this_level:
+                    for w in self._neighbors(pred_adj, v, ignore_nodes, ignore_edges, reverse=True):
+                        if w not in succ:
+                            succ[w] = v
+                            reverse_fringe.append(w)
+                        if w in pred:
+                            return pred, succ, w
+
+        raise nx.NetworkXNoPath(f"No path between {source} and {target}.")
+
+    def _bidirectional_bfs(self, source: int, target: int, ignore_nodes=None, ignore_edges=None) -> list[int]:
+        pred, succ, w = self._bidirectional_pred_succ(source, target, ignore_nodes, ignore_edges)
+        path: list[int] = []
+        while w is not None:
+            path.append(w)
+            w = pred[w]
+        path.reverse()
+        w = succ[path[-1]]
+        while w is not None:
+            path.append(w)
+            w = succ[w]
+        return path
+
+    def _bidirectional_dijkstra(self, source: int, target: int, weight) -> list[int]:
+        if source == target:
+            return [source]
+
+        nodes = self.csr.nodes
+        edge_data = self.csr.edge_data
+        node_mask = self.node_mask
+        edge_mask = self.edge_mask
+        adjacency = (self.csr._succ, self.csr._pred)
+
+        dists: list[dict[int, float]] = [{}, {}]
+        preds: list[dict[int, int | None]] = [{source: None}, {target: None}]
+        fringe: list[list] = [[], []]
+        seen: list[dict[int, float]] = [{source: 0}, {target: 0}]
+        c = count()
+        heappush(fringe[0], (0, next(c), source))
+        heappush(fringe[1], (0, next(c), target))
+
+        def path(curr, direction):
+            ret = []
+            while curr is not None:
+                ret.append(curr)
+                curr = preds[direction][curr]
+            return list(reversed(ret)) if direction == 0 else ret
+
+        finaldist = None
+        meetnode = None
+        direction = 1
+        while fringe[0] and fringe[1]:
+            direction = 1 - direction
+            (dist, _, v) = heappop(fringe[direction])
+            if v in dists[direction]:
+                continue
+            dists[direction][v] = dist
+            if v in dists[1 - direction]:
+                return path(meetnode, 0) + path(preds[1][meetnode], 1)
+
+            for w, e in adjacency[direction][v]:
+                if not edge_mask[e] or not node_mask[w]:
+                    continue
+                if direction == 0:
+                    cost = weight(nodes[v], nodes[w], edge_data[e])
+                else:
+                    cost = weight(nodes[w], nodes[v], edge_data[e])
+                if cost is None:
+                    continue
+                vw_length = dist + cost
+                if w in dists[direction]:
+                    if vw_length < dists[direction][w]:
+                        raise ValueError("Contradictory paths found: negative weights?")
+                elif w not in seen[direction] or vw_length < seen[direction][w]:
+                    seen[direction][w] = vw_length
+                    heappush(fringe[direction], (vw_length, next(c), w))
+                    preds[direction][w] = v
+                    if w in seen[1 - direction]:
+                        finaldist_w = vw_length + seen[1 - direction][w]
+                        if finaldist is None or finaldist > finaldist_w:
+                            finaldist, meetnode = finaldist_w, w
+        raise nx.NetworkXNoPath(f"No path between {source} and {target}.")
+
+    def _spur_path(self, source: int, target: int, ignore_nodes, ignore_edges) -> list[int]:
+        # networkx 的 Yen 算法使用另一种路径拼接顺序（从相遇点向两端展开），结果相同。
+        pred, succ, w = self._bidirectional_pred_succ(source, target, ignore_nodes, ignore_edges)
+        path: list[int] = []
+        while w is not None:
+            path.append(w)
+            w = succ[w]
+        w = pred[path[0]]
+        while w is not None:
+            path.insert(0, w)
+            w = pred[w]
+        return path
+
+    def _shortest_simple_paths(self, source: int, target: int):
+        """Yen 算法，按长度从短到长产生简单路径。"""
+        list_a: list[list[int]] = []
+        buffer: list[tuple[int, int, list[int]]] = []
+        buffered: set[tuple[int, ...]] = set()
+        counter = count()
+
+        def push(cost: int, path: list[int]) -> None:
+            hashable_path = tuple(path)
+            if hashable_path not in buffered:
+                heappush(buffer, (cost, next(counter), path))
+                buffered.add(hashable_path)
+
+        prev_path = None
+        while True:
+            if not prev_path:
+                try:
+                    path = self._spur_path(source, target, None, None)
+                except nx.NetworkXNoPath:
+                    return
+                push(len(path), path)
+            else:
+                ignore_nodes: set[int] = set()
+                ignore_edges: set[tuple[int, int]] = set()
+                for i in range(1, len(prev_path)):
+                    root = prev_path[:i]
+                    root_length = len(root)
+                    for path in list_a:
+                        if path[:i] == root:
+                            ignore_edges.add((path[i - 1], path[i]))
+                    try:
+                        spur = self._spur_path(root[-1], target, ignore_nodes, ignore_edges)
+                        push(root_length + len(spur), root[:-1] + spur)
+                    except nx.NetworkXNoPath:
+                        pass
+                    ignore_nodes.add(root[-1])
+
+            if buffer:
+                _, _, path = heappop(buffer)
+                buffered.remove(tuple(path))
+                yield path
+                list_a.append(path)
+                prev_path = path
+            else:
+                break
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import argparse
+import gc
+import random
+import sys
+import time
+from pathlib import Path
+
+# 允许在项目根目录外直接运行本脚本
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_DIR))
+
+from simulation.scheduler import BACKENDS, make_queue  # noqa: E402
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Hold-model benchmark of the event scheduler backends."
+    )
+    parser.add_argument(
+        "--sizes",
+        type=float,
+        nargs="+",
+        default=[1e4, 1e6, 1e7],
+        help="Numbers of pending events kept in the queue.",
+    )
+    parser.add_argument(
+        "--holds",
+        type=int,
+        default=1_000_000,
+        help="Pop/push pairs timed at each queue size.",
+    )
+    parser.add_argument(
+        "--mean-holding-time",
+        type=float,
+        default=10.0,
+        help="Mean of the exponential increment added to each popped event time.",
+    )
+    parser.add_argument("--seed", type=int, default=1)
+    return parser.parse_args()
+
+
+def run(backend: str, size: int, holds: int, mean_holding_time: float, seed: int) -> dict[str, float]:
+    """
+    经典的 hold 模型：先放入 size 个事件，再重复“弹出最早事件、以指数增量放回一个新事件”，
+    队列长度保持不变。时间取 (time, seq, kind, flow_id) 四元组，与 CompactEventScheduler 一致。
+    """
+    rng = random.Random(seed)
+    expovariate = rng.expovariate
+    rate = 1 / mean_holding_time
+    queue = make_queue(backend)
+
+    start = time.perf_counter()
+    for seq in range(size):
+        queue.push((expovariate(rate), seq, 0, seq))
+    fill = time.perf_counter() - start
+
+    seq = size
+    start = time.perf_counter()
+    for _ in range(holds):
+        now = queue.pop()[0]
+        queue.push((now + expovariate(rate), seq, 1, seq))
+        seq += 1
+    hold = time.perf_counter() - start
+
+    del queue
+    gc.collect()
+    return {"fill": fill / size * 1e9, "hold": hold / holds * 1e9}
+
+
+def main() -> int:
+    args = parse_args()
+    print(f"{'pending':>10} {'backend':>9} {'fill ns/op':>11} {'hold ns/op':>11}")
+    for size in map(int, args.sizes):
+        for backend in BACKENDS:
+            result = run(backend, size, args.holds, args.mean_holding_time, args.seed)
+            print(f"{size:>10} {backend:>9} {result['fill']:>11.0f} {result['hold']:>11.0f}", flush=True)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
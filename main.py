@@ -3,6 +3,7 @@ from __future__ import annotations
 import argparse
 import logging.config
 
+from simulation.lockstep import LockstepRunner
 from simulation.runner import SimulationRunner
 from models.config import SimulationConfig
 
@@ -29,7 +30,8 @@ def main() -> int:
     config.load_logging()
 
     logger.info(f"{'='*25} Start Running {'='*25}")
-    runner = SimulationRunner()
+    # algorithm.lockstep 非空时在同一业务流上同步运行多个算法，summary 按算法名分组
+    runner = LockstepRunner() if config.algorithm.lockstep else SimulationRunner()
     runner.build(config)
     summary = runner.run()
     logger.info("Simulation completed with summary=%s", summary)
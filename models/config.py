@@ -20,6 +20,10 @@ class LoggingConfig:
     format: str = "%(asctime)s - %(levelname)s - %(message)s"
     encoding: str = "utf-8"
     console: bool = False
+    trace: list[str] = field(default_factory=list)
+    trace_file: str = ""
+    trace_chunk_records: int = 65536
+    trace_compression: str = "zlib"
 
 
 @dataclass(frozen=True, slots=True)
@@ -38,6 +42,8 @@ class TopologyConfig(AttrsMixin):
 
     path: str = "../graphml/Nsfnet.graphml"
     resource: LinkResourceConfig = None
+    cache_dir: str = "cache"
+    paranoid: bool = False
 
     attrs: Mapping[str, Any] = field(default_factory=dict)
 
@@ -62,6 +68,8 @@ class TrafficConfig(AttrsMixin):
     seed: int | None = None
     call_types: list[CallTypeConfig] = field(default_factory=list)
     max_bandwidth: int = 0
+    streaming: bool = False
+    generator: str = "python"
 
     attrs: Mapping[str, Any] = field(default_factory=dict)
 
@@ -72,6 +80,32 @@ class AlgorithmConfig(AttrsMixin):
 
     name: str = ""
     k: int = 0
+    engine: str = "networkx"
+    path_cache: bool = False
+    lockstep: list[str] = field(default_factory=list)
+
+    attrs: Mapping[str, Any] = field(default_factory=dict)
+
+
+@dataclass(frozen=True, slots=True)
+class SchedulerConfig(AttrsMixin):
+    """Event scheduler selection."""
+
+    compact: bool = False
+    backend: str = "heap"
+
+    attrs: Mapping[str, Any] = field(default_factory=dict)
+
+
+@dataclass(frozen=True, slots=True)
+class SteadyStateConfig(AttrsMixin):
+    """Steady-state run mode: warm-up removal and confidence-based early stop."""
+
+    enabled: bool = False
+    batch_size: int = 500
+    min_batches: int = 10
+    confidence: float = 0.95
+    relative_precision: float = 0.05
 
     attrs: Mapping[str, Any] = field(default_factory=dict)
 
@@ -85,6 +119,8 @@ class SimulationConfig(AttrsMixin):
     traffic: TrafficConfig = TrafficConfig()
     resource: LinkResourceConfig = LinkResourceConfig()
     algorithm: AlgorithmConfig = AlgorithmConfig()
+    scheduler: SchedulerConfig = SchedulerConfig()
+    steady_state: SteadyStateConfig = SteadyStateConfig()
 
     attrs: Mapping[str, Any] = field(default_factory=dict)
 
@@ -102,6 +138,8 @@ class SimulationConfig(AttrsMixin):
         self.topology = self._read_dataclass(TopologyConfig, config.get("topology", {}))
         self.traffic = self._read_dataclass(TrafficConfig, config.get("traffic", {}))
         self.algorithm = self._read_dataclass(AlgorithmConfig, config.get("algorithm", {}))
+        self.scheduler = self._read_dataclass(SchedulerConfig, config.get("scheduler", {}))
+        self.steady_state = self._read_dataclass(SteadyStateConfig, config.get("steady_state", {}))
         self.attrs = {
             key: values for key, values in config.items() if not hasattr(self, key)
         }
@@ -2,6 +2,10 @@ from dataclasses import dataclass
 
 from .flow import Flow
 
+# 紧凑事件编码中的事件类型，见 simulation.scheduler.CompactEventScheduler
+ARRIVAL = 0
+DEPARTURE = 1
+
 
 @dataclass(slots=True, frozen=True)
 class Event:
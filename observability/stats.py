@@ -1,20 +1,101 @@
 from __future__ import annotations
 
 import logging
-from dataclasses import dataclass, field
+from dataclasses import dataclass, fields
 from typing import Any, Iterable
-from collections import Counter, defaultdict
+
+import numpy as np
 
 from models.events import Event, FlowArrivalEvent
 from models.flow import Flow
 from models.config import SimulationConfig
+from observability.trace import TraceCode, get_trace
 
 
 logger = logging.getLogger(__name__)
+_trace = get_trace("stats")
+
+USAGE_INDEX = {"data": 0, "recip": 1}
+
+
+@dataclass(frozen=True, slots=True)
+class StatsSnapshot:
+    """
+    summary 和 utilization 所依据的累计量在某一时刻的取值（计数、安全暴露、成本单位、时间积分）。
+
+    两个快照相减得到其间的增量，StatsCollector.summary(since=...) 和 utilization(since=...)
+    据此只统计快照之后的部分。
+    """
+    time: float
+    arrivals: int
+    accepted: int
+    blocked: int
+    arrivals_secure: int
+    accepted_secure: int
+    blocked_secure: int
+    arrivals_unsecure: int
+    accepted_unsecure: int
+    blocked_unsecure: int
+    security_exposure: int
+    recip_channel_total: int
+    recip_channel_count: int
+    cost_recip_channel: int
+    cost_recip_port: int
+    lightpath_setups: int
+    lightpath_assignments: int
+    # 按链路编号的占用波长数、协商信道数时间积分，按用途 (data, recip) 的在用光路数、业务关联数时间积分
+    busy_wavelengths: np.ndarray | float
+    recip_channels: np.ndarray | float
+    active_lightpaths: np.ndarray | float
+    lightpath_flows: np.ndarray | float
+
+    @classmethod
+    def zero(cls) -> StatsSnapshot:
+        """仿真开始时（所有统计为零）的快照。"""
+        return cls(**{f.name: 0 for f in fields(cls)})
+
+    def __sub__(self, other: StatsSnapshot) -> StatsSnapshot:
+        return StatsSnapshot(**{f.name: getattr(self, f.name) - getattr(other, f.name) for f in fields(self)})
+
+
+class TimeWeighted:
+    """
+    一组分段常数量的精确时间积分。
+
+    每次取值变化时先把旧值乘以距上次变化的时长累加进积分，再更新取值，单次更新 O(1)；
+    integrals(until) 把所有量积分到 until 时刻，不修改内部状态。
+    """
+    __slots__ = ("values", "integral", "last")
+
+    def __init__(self, size: int):
+        self.values = np.zeros(size, dtype=np.int64)
+        self.integral = np.zeros(size, dtype=np.float64)
+        self.last = np.zeros(size, dtype=np.float64)
+
+    def add(self, index: int, delta: int, time: float) -> int:
+        self.integral[index] += self.values[index] * (time - self.last[index])
+        self.last[index] = time
+        self.values[index] += delta
+        return self.values[index]
+
+    def integrals(self, until: float) -> np.ndarray:
+        return self.integral + self.values * (until - self.last)
+
 
 class StatsCollector:
     
     def __init__(self, config: SimulationConfig = None):
+        self.c_h = config.attrs["costs"]["channel"]
+        self.c_p = config.attrs["costs"]["port"]
+        # 物理链路表由 register_links 在构建时登记，按链路编号索引的统计数组与之等长。
+        self.physical_links: list[tuple[int, int]] = []
+        self.num_wavelengths: int = 0
+        self.reset()
+
+    def reset(self) -> None:
+        """所有统计清零，登记的链路表和成本系数保持不变；耗时与链路数成正比。"""
+        num_links = len(self.physical_links)
+
         # 当前优先统计阻塞率、成本、安全性
         self.arrivals: int = 0
         self.accepted: int = 0
@@ -30,51 +111,93 @@ class StatsCollector:
     
         # self.grooming_count: int = 0
     
-        # Security metrics
-        self.num_inband_transmission: dict[tuple[int, int], int] = {}
-        self.num_recip_channel_per_edge: dict[tuple[int, int], list] = defaultdict(list)
-        self.physical_edges: set[tuple[int, int]] = set()
+        # Security metrics，按链路编号索引
+        self.num_inband_transmission: np.ndarray = np.zeros(num_links, dtype=np.int64)
+        # 每条链路当前的协商信道数（及其时间积分），以及每次变化后取值样本的累加和与样本数
+        self.recip_channels = TimeWeighted(num_links)
+        self.num_recip_channel_per_link: np.ndarray = self.recip_channels.values
+        self.recip_channel_total: np.ndarray = np.zeros(num_links, dtype=np.int64)
+        self.recip_channel_count: np.ndarray = np.zeros(num_links, dtype=np.int64)
+
+        # Resource metrics，均为随 ControlPlane.current_time 更新的时间积分。
+        # now 为最近一次状态变化的仿真时间，统计窗口为 [0, now]。
+        self.now: float = 0.0
+        # 每条链路被占用的波长数
+        self.busy_wavelengths = TimeWeighted(num_links)
+        # 按用途（data, recip）统计的在用光路数，以及业务与光路的关联数
+        self.active_lightpaths = TimeWeighted(len(USAGE_INDEX))
+        self.lightpath_flows = TimeWeighted(len(USAGE_INDEX))
+        # 业务占用光路的次数，以及其中新建光路的次数，其余为疏导复用
+        self.lightpath_assignments: int = 0
+        self.lightpath_setups: int = 0
     
         # Cost metric
         self.cost_recip_channel: int = 0
         self.cost_recip_port: int = 0
-        self.c_h = config.attrs["costs"]["channel"]
-        self.c_p = config.attrs["costs"]["port"]
+
+    def register_links(self, links: Iterable[tuple[int, int]], num_wavelengths: int = 0) -> None:
+        """
+        登记物理链路表，第 i 项为链路编号 i 的 (u, v)，与 PhysicalTopology.links 一致。
+
+        登记后按新的链路数重新分配统计数组，已有统计清零。
+        """
+        self.physical_links = [(int(u), int(v)) for u, v in links]
+        self.num_wavelengths = num_wavelengths
+        self.reset()
+
+    def lightpath_setup(self, usage: str, route: Any, time: float) -> None:
+        """新建光路：沿途每条链路占用一个波长。"""
+        self.now = time
+        self.active_lightpaths.add(USAGE_INDEX[usage], 1, time)
+        self.lightpath_setups += 1
+        for link in route.links:
+            self.busy_wavelengths.add(link, 1, time)
+
+    def lightpath_teardown(self, usage: str, route: Any, time: float) -> None:
+        """拆除空闲光路：沿途每条链路释放一个波长。"""
+        self.now = time
+        self.active_lightpaths.add(USAGE_INDEX[usage], -1, time)
+        for link in route.links:
+            self.busy_wavelengths.add(link, -1, time)
 
     def observe_event(self, event: Event) -> None:
         if isinstance(event, FlowArrivalEvent):
-            self.arrivals += 1
-
-            # 增加安全业务统计项
-            if event.flow.attrs["sec"] > 0:
-                self.arrivals_secure += 1
-            else:
-                self.arrivals_unsecure += 1
-
-    def accept_flow(
-        self,
-        flow: Flow,
-        lightpaths: dict[str, list[Any]],
-        physical_edges: Iterable[tuple[int, int]] | None = None,
-    ) -> None:
-        if physical_edges is not None:
-            self.physical_edges.update((int(u), int(v)) for u, v in physical_edges)
-
-        logger.debug(f"Flow {flow}")
-        logger.debug(f"Paths have {lightpaths.keys()}.")
-        logger.debug(f"Already accepted {self.accepted}, including security {self.accepted_secure} and normal {self.accepted_unsecure}")
+            self.observe_arrival(event.flow)
+
+    def observe_arrival(self, flow: Flow, time: float | None = None) -> None:
+        if time is not None:
+            self.now = time
+        self.arrivals += 1
+
+        # 增加安全业务统计项
+        if flow.attrs["sec"] > 0:
+            self.arrivals_secure += 1
+        else:
+            self.arrivals_unsecure += 1
+
+    def accept_flow(self, flow: Flow, lightpaths: dict[str, list[Any]], time: float | None = None) -> None:
+        if time is not None:
+            self.now = time
         # 统计阻塞率
         self.accepted += 1
         if flow.attrs["sec"] > 0:
             self.accepted_secure += 1
         else:
             self.accepted_unsecure += 1
-        logger.debug(f"Now accept {self.accepted}, including security {self.accepted_secure} and normal {self.accepted_unsecure}")
+        if _trace.enabled:
+            _trace.emit(
+                TraceCode.STATS_ACCEPT, flow.id, tuple(lightpaths), self.accepted, self.accepted_secure, self.accepted_unsecure
+            )
 
         # 统计安全性
         self._update_security_metrics(lightpaths)
         # 统计成本
         self._update_cost_metrics(lightpaths)
+        # 统计光路疏导
+        for usage, values in lightpaths.items():
+            for _ in values or []:
+                self.lightpath_flows.add(USAGE_INDEX[usage], 1, self.now)
+                self.lightpath_assignments += 1
 
         # self.physical_hops_accepted += physical_hops
         # self.virtual_hops_accepted += virtual_hops
@@ -83,7 +206,9 @@ class StatsCollector:
         # else:
         #     self.new_lightpath_count += 1
 
-    def block_flow(self, flow: Flow) -> None:
+    def block_flow(self, flow: Flow, time: float | None = None) -> None:
+        if time is not None:
+            self.now = time
         self.blocked += 1
 
         if flow.attrs["sec"] > 0:
@@ -91,40 +216,80 @@ class StatsCollector:
         else:
             self.blocked_unsecure += 1
 
-    def remove_flow(self, flow: Flow, lightpaths: dict[str, list[Any]]):
+    def remove_flow(self, flow: Flow, lightpaths: dict[str, list[Any]], time: float | None = None):
+        if time is not None:
+            self.now = time
 
         for lightpath in lightpaths:
+            self.lightpath_flows.add(USAGE_INDEX[lightpath.usage], -1, self.now)
             if lightpath.usage == "data":
                 continue
-            for edge in self._route_physical_edges(lightpath.route):
-                self.num_recip_channel_per_edge[edge].append(
-                        self.num_recip_channel_per_edge.get(edge, [0])[-1] - 1
-                )
-                logger.debug(f"The number of recip channels carried by {edge} link is {self.num_recip_channel_per_edge[edge]}.")
+            for link in lightpath.route.links:
+                self._update_recip_channels(link, -1)
+
+    def snapshot(self, until: float | None = None) -> StatsSnapshot:
+        """until 时刻（默认为 now）的累计量。"""
+        until = self.now if until is None else until
+        return StatsSnapshot(
+            time=until,
+            arrivals=self.arrivals,
+            accepted=self.accepted,
+            blocked=self.blocked,
+            arrivals_secure=self.arrivals_secure,
+            accepted_secure=self.accepted_secure,
+            blocked_secure=self.blocked_secure,
+            arrivals_unsecure=self.arrivals_unsecure,
+            accepted_unsecure=self.accepted_unsecure,
+            blocked_unsecure=self.blocked_unsecure,
+            security_exposure=int(self.num_inband_transmission.sum()),
+            recip_channel_total=int(self.recip_channel_total.sum()),
+            recip_channel_count=int(self.recip_channel_count.sum()),
+            cost_recip_channel=self.cost_recip_channel,
+            cost_recip_port=self.cost_recip_port,
+            lightpath_setups=self.lightpath_setups,
+            lightpath_assignments=self.lightpath_assignments,
+            busy_wavelengths=self.busy_wavelengths.integrals(until),
+            recip_channels=self.recip_channels.integrals(until),
+            active_lightpaths=self.active_lightpaths.integrals(until),
+            lightpath_flows=self.lightpath_flows.integrals(until),
+        )
+
+    def summary(self, since: StatsSnapshot | None = None) -> dict[str, Any]:
+        """
+        统计汇总，窗口默认为整个仿真 [0, now]。
 
-    def summary(self) -> dict[str, Any]:
-        edge_count = len(self.physical_edges)
-        total_security_exposure = sum(self.num_inband_transmission.values())
-        total_security_cost = (self.c_h * self.cost_recip_channel + 2.0 * self.c_p * self.cost_recip_port)
+        since 为 snapshot() 的返回值时窗口为 [since.time, now]：计数、阻塞率、安全暴露、成本和
+        时间平均资源占用都只统计快照之后的部分，各字段之间可以直接组合。
+        """
+        window = self.snapshot()
+        if since is not None:
+            window = window - since
+        edge_count = len(self.physical_links)
+        total_security_exposure = window.security_exposure
+        total_security_cost = (self.c_h * window.cost_recip_channel + 2.0 * self.c_p * window.cost_recip_port)
+        duration = window.time if window.time > 0 else 0.0
+        scale = 1 / duration if duration else 0.0
+        busy = window.busy_wavelengths * scale
+        wavelength_utilization = busy / self.num_wavelengths if self.num_wavelengths else busy * 0.0
 
         return {
-            "arrivals": self.arrivals,
-            "accepted": self.accepted,
-            "blocked": self.blocked,
-            "blocking_rate": self.blocked / self.arrivals if self.arrivals else 0.0,
-
-            "arrivals_secure": self.arrivals_secure,
-            "accepted_secure": self.accepted_secure,
-            "blocked_secure": self.blocked_secure,
+            "arrivals": window.arrivals,
+            "accepted": window.accepted,
+            "blocked": window.blocked,
+            "blocking_rate": window.blocked / window.arrivals if window.arrivals else 0.0,
+
+            "arrivals_secure": window.arrivals_secure,
+            "accepted_secure": window.accepted_secure,
+            "blocked_secure": window.blocked_secure,
             "secure_blocking_rate": (
-                self.blocked_secure / self.arrivals_secure if self.arrivals_secure else 0.0
+                window.blocked_secure / window.arrivals_secure if window.arrivals_secure else 0.0
             ),
 
-            "arrivals_unsecure": self.arrivals_unsecure,
-            "accepted_unsecure": self.accepted_unsecure,
-            "blocked_unsecure": self.blocked_unsecure,
+            "arrivals_unsecure": window.arrivals_unsecure,
+            "accepted_unsecure": window.accepted_unsecure,
+            "blocked_unsecure": window.blocked_unsecure,
             "unsecure_blocking_rate": (
-                self.blocked_unsecure / self.arrivals_unsecure if self.arrivals_unsecure else 0.0
+                window.blocked_unsecure / window.arrivals_unsecure if window.arrivals_unsecure else 0.0
             ),
 
             # Uploaded security metrics.
@@ -132,39 +297,82 @@ class StatsCollector:
             "average_security_exposure": (
                 total_security_exposure / edge_count if edge_count else 0.0
             ),
-            "average_num_recip_channels": self._mean_dictlist(self.num_recip_channel_per_edge),
+            "average_num_recip_channels": (
+                window.recip_channel_total / window.recip_channel_count if window.recip_channel_count else 0.0
+            ),
 
             # Uploaded cost metric C_bar.
             "total_security_cost": total_security_cost,
-            "average_security_cost": total_security_cost / self.accepted_secure,
+            "average_security_cost": (
+                total_security_cost / window.accepted_secure if window.accepted_secure else 0.0
+            ),
+
+            # Time-weighted resource metrics over the window.
+            "average_wavelength_utilization": (
+                float(wavelength_utilization.mean()) if edge_count else 0.0
+            ),
+            "average_active_lightpaths": float((window.active_lightpaths * scale).sum()),
+            "grooming_ratio": (
+                1 - window.lightpath_setups / window.lightpath_assignments if window.lightpath_assignments else 0.0
+            ),
+
+        }
 
+    def utilization(self, until: float | None = None, since: StatsSnapshot | None = None) -> dict[str, np.ndarray]:
+        """
+        统计窗口 [0, until]（默认到最近一次状态变化）内的时间平均资源占用；
+        since 为 snapshot() 的返回值时窗口为 [since.time, until]，与 summary(since=...) 相同：
+
+         - wavelength_utilization: 每条链路被占用波长数的时间平均 / 链路波长数
+         - recip_channel_occupancy: 每条链路协商信道数的时间平均
+         - active_lightpaths: 按用途 (data, recip) 的在用光路数时间平均
+         - flows_per_lightpath: 按用途的每条在用光路平均承载业务数，>1 表示发生了疏导
+        """
+        window = self.snapshot(until)
+        if since is not None:
+            window = window - since
+        duration = window.time if window.time > 0 else 0.0
+        scale = 1 / duration if duration else 0.0
+        busy = window.busy_wavelengths * scale
+        lightpaths = window.active_lightpaths
+        flows = window.lightpath_flows
+        return {
+            "duration": np.float64(duration),
+            "wavelength_utilization": busy / self.num_wavelengths if self.num_wavelengths else busy * 0.0,
+            "recip_channel_occupancy": window.recip_channels * scale,
+            "active_lightpaths": lightpaths * scale,
+            "flows_per_lightpath": np.divide(flows, lightpaths, out=np.zeros_like(flows), where=lightpaths > 0),
         }
 
     def _update_security_metrics(self, lightpaths: dict[str, list[Any]]) -> None:
-        data_edge_counts: Counter[tuple[int, int]] = Counter()
-        recip_edge_counts: Counter[tuple[int, int]] = Counter()
+        data_mask = 0
+        recip_mask = 0
 
         for lightpath in lightpaths.get("data", []) or []:
-            for edge in self._route_physical_edges(lightpath.route):
-                data_edge_counts[edge] += 1
-                self.physical_edges.add(edge)
+            data_mask |= lightpath.route.link_mask
 
         for lightpath in lightpaths.get("recip", []) or []:
-            for edge in self._route_physical_edges(lightpath.route):
-                recip_edge_counts[edge] += 1
-                self.physical_edges.add(edge)
-
-                val = self.num_recip_channel_per_edge.get(edge, [0])[-1] + 1
-                self.num_recip_channel_per_edge[edge].append(val)
-                logger.debug(f"The number of recip channels carried by {edge} link is {self.num_recip_channel_per_edge[edge]}.")
+            recip_mask |= lightpath.route.link_mask
+            for link in lightpath.route.links:
+                self._update_recip_channels(link, 1)
 
         # S_eij for this request is (#recip wavelengths on eij) *
         # (#data wavelengths on eij). Accumulate it over accepted requests.
-        for edge in set(data_edge_counts) & set(recip_edge_counts):
-            self.num_inband_transmission[edge] = (
-                    self.num_inband_transmission.get(edge, 0) + 1
-            )
-            logger.debug(f"The number of in-band transmission is {edge}: {self.num_inband_transmission[edge]}.")
+        inband_mask = data_mask & recip_mask
+        while inband_mask:
+            lowest = inband_mask & -inband_mask
+            link = lowest.bit_length() - 1
+            inband_mask ^= lowest
+            self.num_inband_transmission[link] += 1
+            if _trace.enabled:
+                _trace.emit(TraceCode.STATS_INBAND, self.physical_links[link], self.num_inband_transmission[link])
+
+    def _update_recip_channels(self, link: int, delta: int) -> None:
+        value = self.recip_channels.add(link, delta, self.now)
+        self.recip_channel_total[link] += value
+        self.recip_channel_count[link] += 1
+        if _trace.enabled:
+            _trace.emit(TraceCode.STATS_RECIP_CHANNELS, self.physical_links[link], value)
 
     def _update_cost_metrics(self, lightpaths: dict[str, list[Any]]) -> None:
         """Update the cost units in the uploaded C_bar formula.
@@ -176,35 +384,9 @@ class StatsCollector:
         """
         for lightpath in lightpaths.get("recip", []) or []:
             self.cost_recip_port += 1
-            self.cost_recip_channel += len(lightpath.route)
-
-    @staticmethod
-    def _route_physical_edges(route: list[Any]) -> list[tuple[int, int]]:
-        if not route:
-            return []
-
-        # Some helper functions store route as [(u, v), ...].
-        if all(isinstance(item, tuple) and len(item) == 2 for item in route):
-            return [(int(u), int(v)) for u, v in route]
-
-        edges: list[tuple[int, int]] = []
-        for u, v in zip(route[:-1], route[1:]):
-            if hasattr(u, "node") and hasattr(v, "node"):
-                edges.append((int(u.node), int(v.node)))
-            elif isinstance(u, int) and isinstance(v, int):
-                edges.append((u, v))
-        return edges
+            self.cost_recip_channel += len(lightpath.route.nodes)
 
     @staticmethod
     def _stringify_edge_dict(values: dict[tuple[int, int], int]) -> dict[str, int]:
         return {f"{u}->{v}": value for (u, v), value in sorted(values.items())}
 
-    @staticmethod
-    def _mean_dictlist(data: dict[Any, list]):
-        all_values = [
-            value
-            for values in data.values()
-            for value in values
-        ]
-
-        return sum(all_values) / len(all_values) if all_values else 0.0
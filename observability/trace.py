@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import logging
+from enum import IntEnum
+from typing import Any, Iterable
+
+from models.exceptions import ConfigurationError
+
+logger = logging.getLogger(__name__)
+
+SUBSYSTEMS = ("auxgraph", "control_plane", "stats", "algorithm", "traffic", "runner")
+
+
+class TraceCode(IntEnum):
+    """调试跟踪记录的类型码，按子系统分段编号。"""
+    # auxgraph
+    AUXG_NODE_ADDED = 100
+    AUXG_EDGE_ADDED = 101
+    AUXG_WAVELENGTH_TAKEN = 102
+    AUXG_LIGHTPATH_REMOVED = 103
+    AUXG_EDGE_FILTERED = 104
+    AUXG_WAVELENGTH_RELEASED = 105
+    # control_plane
+    CP_EVENT = 200
+    CP_WAVELENGTH_RELEASED = 201
+    CP_LIGHTPATH_TORN_DOWN = 202
+    # stats
+    STATS_ACCEPT = 300
+    STATS_RECIP_CHANNELS = 301
+    STATS_INBAND = 302
+    # algorithm
+    ALG_CANDIDATE_PATH = 400
+    ALG_RECIP_PATH = 401
+    ALG_NO_RECIP_PATH = 402
+    ALG_INBAND_DISABLED = 403
+    ALG_SOLUTION_COST = 404
+    # traffic
+    TRAFFIC_ARRIVAL = 500
+    # runner
+    RUNNER_DISPATCH = 600
+
+
+class _LazyPayload:
+    """负载在日志记录被格式化时才求值；可调用的负载项在此时才被调用。"""
+    __slots__ = ("items",)
+
+    def __init__(self, items: tuple):
+        self.items = items
+
+    def values(self) -> tuple:
+        return tuple(item() if callable(item) else item for item in self.items)
+
+    def __str__(self) -> str:
+        return " ".join(map(str, self.values()))
+
+
+class Trace:
+    """
+    一个子系统的调试跟踪开关。
+
+    调用方先检查 enabled 再调用 emit，跟踪关闭时热路径上只有一次属性读取：
+
+        if _trace.enabled:
+            _trace.emit(TraceCode.AUXG_EDGE_ADDED, u, v, lambda: dict(graph.edges[u, v]))
+
+    记录以 DEBUG 级别交给标准 logging，类型码和原始负载放在 LogRecord 的 trace_code /
+    trace_payload 属性中供结构化处理器使用；文本只在处理器格式化时生成。
+    """
+    __slots__ = ("subsystem", "enabled", "_logger")
+
+    def __init__(self, subsystem: str):
+        self.subsystem = subsystem
+        self.enabled = False
+        self._logger = logging.getLogger(f"trace.{subsystem}")
+
+    def emit(self, code: TraceCode, *payload: Any) -> None:
+        lazy = _LazyPayload(payload)
+        self._logger.debug(
+            "[%s] %s %s", self.subsystem, code.name, lazy,
+            extra={"trace_code": code, "trace_payload": lazy},
+        )
+
+
+_TRACES: dict[str, Trace] = {}
+
+
+def get_trace(subsystem: str) -> Trace:
+    if subsystem not in SUBSYSTEMS:
+        raise ValueError(f"unknown trace subsystem: {subsystem}")
+    trace = _TRACES.get(subsystem)
+    if trace is None:
+        trace = _TRACES[subsystem] = Trace(subsystem)
+    return trace
+
+
+def configure_trace(subsystems: Iterable[str]) -> None:
+    """
+    按 [logging] trace 配置开启子系统跟踪，"all" 表示全部子系统。
+
+    只有 DEBUG 级别实际可输出时才开启，否则跟踪记录会被 logging 丢弃，不值得构造。
+    """
+    selected = set(subsystems)
+    if "all" in selected:
+        selected = set(SUBSYSTEMS)
+    unknown = selected - set(SUBSYSTEMS)
+    if unknown:
+        raise ConfigurationError(f"unknown trace subsystem(s): {sorted(unknown)}")
+
+    for subsystem in SUBSYSTEMS:
+        trace = get_trace(subsystem)
+        trace.enabled = subsystem in selected and trace._logger.isEnabledFor(logging.DEBUG)
+    logger.info("Debug trace enabled for: %s", sorted(s for s in SUBSYSTEMS if _TRACES[s].enabled))
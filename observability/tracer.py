@@ -1,34 +1,372 @@
 from __future__ import annotations
 
 import json
+import mmap
+import struct
+import zlib
+from collections import defaultdict
 from dataclasses import dataclass, field
+from enum import IntEnum
 from pathlib import Path
-from typing import Any
+from typing import TYPE_CHECKING, Any, BinaryIO, Iterable, Iterator, NamedTuple
 
+import numpy as np
+
+from models.exceptions import ConfigurationError
 from models.flow import Flow
+from topology.route import Route
+
+if TYPE_CHECKING:
+    from observability.stats import StatsCollector
+
+
+MAGIC = b"SONTRACE"
+VERSION = 1
+COMPRESSIONS = ("zlib", "none")
+
+# 定长记录格式；字段含义随记录类型不同，见 RecordKind。
+RECORD_DTYPE = np.dtype([
+    ("time", "<f8"),
+    ("flow", "<i8"),
+    ("value", "<f8"),
+    ("rate", "<f4"),
+    ("kgr", "<f4"),
+    ("src", "<i4"),
+    ("dst", "<i4"),
+    ("route", "<i4"),
+    ("key", "<i4"),
+    ("wavelength", "<i2"),
+    ("sec", "<i2"),
+    ("kind", "u1"),
+    ("usage", "u1"),
+])
+
+_FILE_HEADER = struct.Struct("<8sII")    # magic, version, 元数据 JSON 长度
+_CHUNK_HEADER = struct.Struct("<II")     # 记录数, 块字节数
+
+USAGES = ("data", "recip")
+
+
+class RecordKind(IntEnum):
+    """
+    记录类型。
+
+     - ARRIVAL: 业务到达；src/dst/rate/kgr/sec 为业务参数，value 为持续时间
+     - ACCEPT / BLOCK: 算法决策；value 为本次决策耗时（秒），ACCEPT 之后紧跟该业务占用的光路记录
+     - DEPARTURE: 业务离开，之后紧跟该业务释放的光路记录
+     - LIGHTPATH_SETUP / LIGHTPATH_GROOM: 业务新建 / 复用的光路
+     - LIGHTPATH_RELEASE: 业务离开时释放的光路
+     - LIGHTPATH_TEARDOWN: 空闲光路被拆除，波长归还
+     - ROUTE_NODE: 路由定义，每个节点一条，在路由首次出现时写入；
+       src 为节点，dst 为从该节点出发的链路编号（末节点为 -1），key 为节点序号
+
+    光路记录中 src/dst 为光路端点，key 为虚拟拓扑边键，route 为 Route.id。
+    """
+    ARRIVAL = 0
+    ACCEPT = 1
+    BLOCK = 2
+    DEPARTURE = 3
+    LIGHTPATH_SETUP = 4
+    LIGHTPATH_GROOM = 5
+    LIGHTPATH_RELEASE = 6
+    LIGHTPATH_TEARDOWN = 7
+    ROUTE_NODE = 8
 
 
 @dataclass
 class Tracer:
-    path: Path | None = None
-    records: list[dict[str, Any]] = field(default_factory=list)
-
-    def record(self, event_type: str, time: float, flow: Flow, **details: Any) -> None:
-        record = {
-            "time": time,
-            "simulation": event_type,
-            "flow_id": flow.id,
-            "src": flow.src,
-            "dst": flow.dst,
-            "rate": flow.rate,
-            **details,
-        }
-        self.records.append(record)
+    """
+    流式二进制事件追踪器。
+
+    记录写入预分配的定长缓冲区，缓冲区满 chunk_records 条时压缩成一个块追加到文件，
+    因此内存占用与仿真规模无关。文件结构为：
+
+        文件头 | 元数据 JSON | (块头 | 块数据)*
+
+    块数据是 RECORD_DTYPE 数组的原始字节（compression = "none"）或其 zlib 压缩结果，
+    读取时可以直接对文件做内存映射，见 TraceReader。
+    """
+    path: Path
+    meta: dict[str, Any] = field(default_factory=dict)
+    chunk_records: int = 65536
+    compression: str = "zlib"
+
+    _buffer: np.ndarray = field(init=False, repr=False)
+    _size: int = field(default=0, init=False, repr=False)
+    _file: BinaryIO | None = field(default=None, init=False, repr=False)
+    _routes: set[int] = field(default_factory=set, init=False, repr=False)
+
+    def __post_init__(self):
+        if self.compression not in COMPRESSIONS:
+            raise ConfigurationError(f"unknown trace compression: {self.compression}")
+        if self.chunk_records <= 0:
+            raise ConfigurationError(f"trace chunk_records must be positive, got {self.chunk_records}")
+        self.path = Path(self.path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._buffer = np.zeros(self.chunk_records, dtype=RECORD_DTYPE)
+
+        header = json.dumps(
+            {"compression": self.compression, "dtype": RECORD_DTYPE.descr, "meta": self.meta},
+            sort_keys=True,
+        ).encode("utf-8")
+        self._file = self.path.open("wb")
+        self._file.write(_FILE_HEADER.pack(MAGIC, VERSION, len(header)))
+        self._file.write(header)
+
+    def arrival(self, time: float, flow: Flow) -> None:
+        self._append(
+            time, flow.id, RecordKind.ARRIVAL, value=flow.duration, rate=flow.rate, kgr=flow.attrs["kgr"],
+            src=flow.src, dst=flow.dst, sec=flow.attrs["sec"],
+        )
+
+    def accept(self, time: float, flow: Flow, lightpaths: Iterable, elapsed: float) -> None:
+        """lightpaths 为控制平面的 FlowLightpathRef 列表，顺序与交给 StatsCollector 的光路一致。"""
+        self._append(time, flow.id, RecordKind.ACCEPT, value=elapsed, src=flow.src, dst=flow.dst)
+        for ref in lightpaths:
+            kind = RecordKind.LIGHTPATH_SETUP if ref.created_by_this_flow else RecordKind.LIGHTPATH_GROOM
+            self._lightpath(time, flow.id, kind, ref.usage, ref.src, ref.dst, ref.key, ref.wavelength_used, ref.route)
+
+    def block(self, time: float, flow: Flow, elapsed: float) -> None:
+        self._append(time, flow.id, RecordKind.BLOCK, value=elapsed, src=flow.src, dst=flow.dst)
+
+    def departure(self, time: float, flow: Flow, lightpaths: Iterable) -> None:
+        self._append(time, flow.id, RecordKind.DEPARTURE, src=flow.src, dst=flow.dst)
+        for ref in lightpaths:
+            self._lightpath(
+                time, flow.id, RecordKind.LIGHTPATH_RELEASE, ref.usage, ref.src, ref.dst, ref.key,
+                ref.wavelength_used, ref.route,
+            )
+
+    def teardown(self, time: float, flow: Flow, usage: str, src: int, dst: int, key: int, wavelength: int,
+                 route: Route) -> None:
+        self._lightpath(time, flow.id, RecordKind.LIGHTPATH_TEARDOWN, usage, src, dst, key, wavelength, route)
+
+    def flush(self) -> None:
+        """把缓冲区中的记录作为一个块写入文件。"""
+        if not self._size:
+            return
+        payload = self._buffer[:self._size].tobytes()
+        if self.compression == "zlib":
+            payload = zlib.compress(payload)
+        self._file.write(_CHUNK_HEADER.pack(self._size, len(payload)))
+        self._file.write(payload)
+        self._size = 0
 
     def close(self) -> None:
-        if self.path is None:
+        if self._file is None:
             return
-        self.path.parent.mkdir(parents=True, exist_ok=True)
-        with self.path.open("w", encoding="utf-8") as fh:
-            for record in self.records:
-                fh.write(json.dumps(record, sort_keys=True) + "\n")
+        self.flush()
+        self._file.close()
+        self._file = None
+
+    def __enter__(self) -> Tracer:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _lightpath(self, time: float, flow_id: int, kind: RecordKind, usage: str, src: int, dst: int, key: int,
+                   wavelength: int, route: Route) -> None:
+        if route.id not in self._routes:
+            self._define_route(time, route)
+        self._append(
+            time, flow_id, kind, src=src, dst=dst, route=route.id, key=key, wavelength=wavelength,
+            usage=USAGES.index(usage),
+        )
+
+    def _define_route(self, time: float, route: Route) -> None:
+        self._routes.add(route.id)
+        links = route.links + (-1,)
+        for position, (node, link) in enumerate(zip(route.nodes, links)):
+            self._append(time, -1, RecordKind.ROUTE_NODE, src=node, dst=link, route=route.id, key=position)
+
+    def _append(self, time: float, flow_id: int, kind: RecordKind, *, value: float = 0.0, rate: float = 0.0,
+                kgr: float = 0.0, src: int = -1, dst: int = -1, route: int = -1, key: int = -1,
+                wavelength: int = -1, sec: int = 0, usage: int = 0) -> None:
+        if self._file is None:
+            raise ValueError("trace file is already closed")
+        self._buffer[self._size] = (
+            time, flow_id, value, rate, kgr, src, dst, route, key, wavelength, sec, kind, usage
+        )
+        self._size += 1
+        if self._size == self.chunk_records:
+            self.flush()
+
+
+class TracedLightpath(NamedTuple):
+    """从追踪文件还原的光路，字段与 FlowLightpathRef 同名，可直接交给 StatsCollector。"""
+    usage: str
+    src: int
+    dst: int
+    key: int
+    wavelength_used: int
+    route: Route
+    created_by_this_flow: bool
+
+
+class TraceReader:
+    """
+    Tracer 文件的只读视图。
+
+    文件以 mmap 方式打开，未压缩的块以零拷贝的 numpy 数组返回，压缩块按需解压，
+    因此可以逐块处理比内存大的追踪文件。summary() 把记录重放进 StatsCollector，
+    离线得到与仿真时相同的统计结果；新增统计指标时只需重放已有的追踪文件。
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        with self.path.open("rb") as fh:
+            self._mmap = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, header_len = _FILE_HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"not a trace file: {self.path}")
+        if version != VERSION:
+            raise ValueError(f"unsupported trace file version {version}: {self.path}")
+        offset = _FILE_HEADER.size
+        header = json.loads(self._mmap[offset:offset + header_len].decode("utf-8"))
+        self.compression: str = header["compression"]
+        self.meta: dict[str, Any] = header["meta"]
+
+        # 块索引 (记录数, 数据偏移, 字节数)；文件尾部不完整的块（例如仿真中途退出）被忽略。
+        self._chunks: list[tuple[int, int, int]] = []
+        offset += header_len
+        while offset + _CHUNK_HEADER.size <= len(self._mmap):
+            count, nbytes = _CHUNK_HEADER.unpack_from(self._mmap, offset)
+            offset += _CHUNK_HEADER.size
+            if offset + nbytes > len(self._mmap):
+                break
+            self._chunks.append((count, offset, nbytes))
+            offset += nbytes
+
+    def __len__(self) -> int:
+        return sum(count for count, _, _ in self._chunks)
+
+    def chunks(self) -> Iterator[np.ndarray]:
+        for count, offset, nbytes in self._chunks:
+            if self.compression == "zlib":
+                yield np.frombuffer(zlib.decompress(self._mmap[offset:offset + nbytes]), dtype=RECORD_DTYPE)
+            else:
+                yield np.frombuffer(self._mmap, dtype=RECORD_DTYPE, count=count, offset=offset)
+
+    def records(self) -> np.ndarray:
+        """全部记录拼接成一个数组；大文件应使用 chunks() 逐块处理。"""
+        chunks = list(self.chunks())
+        return np.concatenate(chunks) if chunks else np.zeros(0, dtype=RECORD_DTYPE)
+
+    def replay(self) -> Iterator[tuple[RecordKind, np.void, Any]]:
+        """
+        按写入顺序重放业务级事件 (kind, 记录, 附带数据)：
+
+         - ARRIVAL / BLOCK: 附带 Flow
+         - ACCEPT / DEPARTURE: 附带 (Flow, 光路列表)
+         - LIGHTPATH_TEARDOWN: 附带 TracedLightpath
+        """
+        routes: dict[int, Route] = {}
+        route_nodes: dict[int, list[tuple[int, int]]] = defaultdict(list)
+        flows: dict[int, Flow] = {}
+        pending: tuple[RecordKind, np.void, Flow, list[TracedLightpath]] | None = None
+
+        for chunk in self.chunks():
+            for record in chunk:
+                kind = RecordKind(record["kind"])
+                if kind == RecordKind.ROUTE_NODE:
+                    nodes = route_nodes[int(record["route"])]
+                    nodes.append((int(record["src"]), int(record["dst"])))
+                    if record["dst"] < 0:
+                        route_id = int(record["route"])
+                        routes[route_id] = self._make_route(route_id, route_nodes.pop(route_id))
+                    continue
+                if kind in (RecordKind.LIGHTPATH_SETUP, RecordKind.LIGHTPATH_GROOM, RecordKind.LIGHTPATH_RELEASE):
+                    pending[3].append(self._make_lightpath(record, routes))
+                    continue
+
+                if pending is not None:
+                    yield pending[0], pending[1], (pending[2], pending[3])
+                    pending = None
+
+                flow_id = int(record["flow"])
+                if kind == RecordKind.ARRIVAL:
+                    flow = flows[flow_id] = Flow(
+                        id=flow_id,
+                        src=int(record["src"]),
+                        dst=int(record["dst"]),
+                        rate=int(record["rate"]),
+                        duration=float(record["value"]),
+                        attrs={"sec": int(record["sec"]), "kgr": int(record["kgr"])},
+                    )
+                    yield kind, record, flow
+                elif kind == RecordKind.BLOCK:
+                    yield kind, record, flows.pop(flow_id)
+                elif kind == RecordKind.ACCEPT:
+                    pending = (kind, record, flows[flow_id], [])
+                elif kind == RecordKind.DEPARTURE:
+                    pending = (kind, record, flows.pop(flow_id), [])
+                elif kind == RecordKind.LIGHTPATH_TEARDOWN:
+                    yield kind, record, self._make_lightpath(record, routes)
+        if pending is not None:
+            yield pending[0], pending[1], (pending[2], pending[3])
+
+    def replay_stats(self) -> StatsCollector:
+        """重放追踪记录到一个新的 StatsCollector，调用方式与仿真时的控制平面一致。"""
+        from models.config import SimulationConfig
+        from observability.stats import StatsCollector
+
+        stats = StatsCollector(SimulationConfig(attrs={"costs": self.meta["costs"]}))
+        stats.register_links((tuple(link) for link in self.meta["physical_links"]), self.meta["wavelengths"])
+        for kind, record, payload in self.replay():
+            time = float(record["time"])
+            if kind == RecordKind.ARRIVAL:
+                stats.observe_arrival(payload, time)
+            elif kind == RecordKind.BLOCK:
+                stats.block_flow(payload, time=time)
+            elif kind == RecordKind.ACCEPT:
+                flow, lightpaths = payload
+                by_usage: dict[str, list[TracedLightpath]] = {}
+                for lightpath in lightpaths:
+                    if lightpath.created_by_this_flow:
+                        stats.lightpath_setup(lightpath.usage, lightpath.route, time)
+                    by_usage.setdefault(lightpath.usage, []).append(lightpath)
+                stats.accept_flow(flow=flow, lightpaths=by_usage, time=time)
+            elif kind == RecordKind.DEPARTURE:
+                flow, lightpaths = payload
+                stats.remove_flow(flow, lightpaths, time=time)
+            elif kind == RecordKind.LIGHTPATH_TEARDOWN:
+                stats.lightpath_teardown(payload.usage, payload.route, time)
+        return stats
+
+    def summary(self) -> dict[str, Any]:
+        """重放追踪记录，重新计算 StatsCollector.summary()。"""
+        return self.replay_stats().summary()
+
+    def close(self) -> None:
+        self._mmap.close()
+
+    def __enter__(self) -> TraceReader:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    @staticmethod
+    def _make_route(route_id: int, hops: list[tuple[int, int]]) -> Route:
+        nodes = tuple(node for node, _ in hops)
+        links = tuple(link for _, link in hops[:-1])
+        link_mask = 0
+        for link in links:
+            link_mask |= 1 << link
+        return Route(
+            id=route_id, nodes=nodes, links=links, edges=tuple(zip(nodes[:-1], nodes[1:])), link_mask=link_mask
+        )
+
+    @staticmethod
+    def _make_lightpath(record: np.void, routes: dict[int, Route]) -> TracedLightpath:
+        return TracedLightpath(
+            usage=USAGES[record["usage"]],
+            src=int(record["src"]),
+            dst=int(record["dst"]),
+            key=int(record["key"]),
+            wavelength_used=int(record["wavelength"]),
+            route=routes[int(record["route"])],
+            created_by_this_flow=record["kind"] == RecordKind.LIGHTPATH_SETUP,
+        )
@@ -1,11 +1,13 @@
 from __future__ import annotations
 
 import csv
+import hashlib
+import json
 import math
 import os
 import random
 from concurrent.futures import ProcessPoolExecutor, as_completed
-from dataclasses import replace
+from dataclasses import asdict, replace
 from datetime import datetime
 from pathlib import Path
 from statistics import mean, stdev
@@ -16,11 +18,17 @@ PROJECT_DIR = Path(__file__).resolve().parent
 CONFIG_PATH = PROJECT_DIR / 'config.toml'
 OUT_DIR = PROJECT_DIR / "data"
 OUT_DIR.mkdir(parents=True, exist_ok=True)
+# 已完成实验的结果库，每完成一个任务追加一行；重新运行时跳过已有结果
+RESULT_STORE = OUT_DIR / "results.jsonl"
+# 参与代码版本哈希的源码包
+CODE_PACKAGES = ("algorithms", "models", "observability", "simulation", "topology")
 
 
 LOADS = [x*10 for x in range(1, 11)]
 NUM_REPEATS = 1  # 如需每个 load 重复 10 次，改为 10
 SEED_RANGE = range(1, 100)
+# 种子抽样使用固定的随机源，中断后重新运行得到相同的任务集合，才能复用结果库
+SWEEP_SEED = 20231120
 ALGORITHMS = {
     'ag_cf_grooming': 'CFG',
     'ag_sf_grooming': 'SFG',
@@ -29,18 +37,89 @@ ALGORITHMS = {
 
 # None 表示自动使用 CPU 核心数；也可以手动指定，例如 MAX_WORKERS = 8
 MAX_WORKERS: int | None = 8
-
-
-def _build_config(load: float, seed: int, algorithm_name: str):
-    """Load config.toml and override only the parameters for one experiment."""
+# 为 True 时同一 (load, seed) 的各算法作为一个任务在同一业务流上同步运行（LockstepRunner），
+# 业务和拓扑只生成/加载一次；结果与逐个算法运行相同，结果库可以混用
+LOCKSTEP = True
+
+# 进程内缓存：解析过的 config.toml，以及按 (拓扑文件, 链路资源) 加载好的物理拓扑模板。
+# 每个任务从缓存复制，不再重复解析 TOML 和 GraphML。
+_BASE_CONFIG = None
+_TOPOLOGY_TEMPLATES: dict[tuple[str, str], Any] = {}
+# 主进程发布到共享内存的只读表（编译后的拓扑和 K 路由），工作进程附加后直接使用，不各自持有副本
+_SHARED_TABLES = None
+_SHARED_META: dict[str, Any] = {}
+_SHARED_TOPOLOGY = None
+_SHARED_PATHS = None
+
+
+def init_worker(shared: dict[str, Any] | None = None) -> None:
+    """
+    进程池初始化：切换工作目录，预先导入仿真模块并解析一次 config.toml。
+
+    shared 为 publish_tables() 返回的句柄时，附加主进程发布的共享内存表。
+    """
+    global _BASE_CONFIG, _SHARED_TABLES, _SHARED_META, _SHARED_TOPOLOGY, _SHARED_PATHS
     # 子进程在 Windows/PyCharm 下不会继承工作目录，显式切到项目根目录，
     # 确保 graphml/Nsfnet.graphml 等相对路径能够被正确读取。
     os.chdir(PROJECT_DIR)
 
+    # 预先导入 networkx、NumPy 和全部算法模块，任务中不再付出导入开销。
+    import simulation.runner  # noqa: F401
     from models.config import SimulationConfig
 
     config = SimulationConfig()
     config.load_config(path=str(CONFIG_PATH))
+    _BASE_CONFIG = config
+
+    if shared is not None:
+        from topology import CompiledTopology, PathCache
+        from topology.shared import SharedArrays
+
+        _SHARED_TABLES = SharedArrays.attach(shared["handle"])
+        _SHARED_META = shared["meta"]
+        _SHARED_TOPOLOGY = CompiledTopology.from_arrays(
+            _SHARED_META["topology"], _shared_arrays(_SHARED_TABLES, "topology.")
+        )
+        if "paths" in _SHARED_META:
+            _SHARED_PATHS = PathCache.from_arrays(_SHARED_META["paths"], _shared_arrays(_SHARED_TABLES, "paths."))
+
+
+def publish_tables(config) -> tuple[Any, dict[str, Any]]:
+    """
+    主进程：把配置对应的编译拓扑和（启用时的）K 路由表发布到一块共享内存。
+
+    返回共享内存块和传给 init_worker 的句柄；共享内存块由调用方在进程池结束后 close 并 unlink。
+    """
+    from topology import CompiledTopology, PathCache, PhysicalTopology
+    from topology.shared import SharedArrays
+
+    compiled = CompiledTopology.load_or_build(
+        config.topology.path, config.topology.cache_dir, **asdict(config.topology.resource)
+    )
+    arrays = {f"topology.{name}": array for name, array in compiled.arrays().items()}
+    meta: dict[str, Any] = {"topology_path": config.topology.path, "topology": compiled.meta()}
+    if config.algorithm.path_cache:
+        topology = PhysicalTopology()
+        topology.load_compiled(compiled)
+        paths = PathCache.load_or_build(
+            config.topology.path, topology.graph, config.algorithm.k, cache_dir=config.topology.cache_dir
+        )
+        arrays.update({f"paths.{name}": array for name, array in paths.arrays().items()})
+        meta["paths"] = paths.meta()
+
+    shared = SharedArrays.publish(arrays)
+    return shared, {"handle": shared.handle(), "meta": meta}
+
+
+def _shared_arrays(shared, prefix: str) -> dict[str, Any]:
+    return {name[len(prefix):]: array for name, array in shared.arrays.items() if name.startswith(prefix)}
+
+
+def _build_config(load: float, seed: int, algorithm_name: str):
+    """Override only the parameters for one experiment on the cached config.toml."""
+    if _BASE_CONFIG is None:
+        init_worker()
+    config = _BASE_CONFIG
 
     return replace(
         config,
@@ -49,6 +128,99 @@ def _build_config(load: float, seed: int, algorithm_name: str):
     )
 
 
+def _topology_template(cfg):
+    """返回该配置对应的物理拓扑模板，首次使用时加载；调用方只能使用它的副本。"""
+    from topology import PhysicalTopology
+
+    resource = asdict(cfg.topology.resource)
+    key = (cfg.topology.path, json.dumps(resource, sort_keys=True, default=dict))
+    template = _TOPOLOGY_TEMPLATES.get(key)
+    if template is None:
+        template = _TOPOLOGY_TEMPLATES[key] = PhysicalTopology()
+        if _shared_topology(cfg) is not None:
+            template.load_compiled(_SHARED_TOPOLOGY)
+        else:
+            template.load(cfg.topology.path, cache_dir=cfg.topology.cache_dir, **resource)
+    return template
+
+
+def _shared_topology(cfg):
+    """共享内存中的编译拓扑，与该配置的拓扑文件或链路资源不符时返回 None。"""
+    from topology.compiled import resource_digest
+
+    if _SHARED_TOPOLOGY is None or _SHARED_META["topology_path"] != cfg.topology.path:
+        return None
+    if _SHARED_TOPOLOGY.resource_hash != resource_digest(asdict(cfg.topology.resource)):
+        return None
+    return _SHARED_TOPOLOGY
+
+
+def _shared_paths(cfg):
+    """共享内存中的 K 路由表，与该配置不符时返回 None，由 SimulationRunner 自行加载。"""
+    if _SHARED_PATHS is None or not cfg.algorithm.path_cache or _shared_topology(cfg) is None:
+        return None
+    return _SHARED_PATHS if _SHARED_PATHS.k == cfg.algorithm.k else None
+
+
+def code_version() -> str:
+    """仿真源码的内容哈希，任何源码修改都会使已有结果失效。"""
+    digest = hashlib.sha256()
+    for package in CODE_PACKAGES:
+        for path in sorted((PROJECT_DIR / package).rglob("*.py")):
+            digest.update(path.relative_to(PROJECT_DIR).as_posix().encode("utf-8"))
+            digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def config_key(cfg, version: str) -> str:
+    """
+    实验结果的键：生效配置的规范化 JSON、拓扑文件内容和代码版本的哈希。
+
+    logging 段只影响日志输出，不参与哈希。
+    """
+    from topology.paths import file_digest
+
+    effective = asdict(cfg)
+    effective.pop("logging", None)
+    canonical = json.dumps(
+        {
+            "config": effective,
+            "topology": file_digest(PROJECT_DIR / cfg.topology.path),
+            "code": version,
+        },
+        sort_keys=True,
+        default=lambda value: dict(value) if hasattr(value, "keys") else str(value),
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def load_result_store(path: Path = RESULT_STORE) -> dict[str, dict[str, Any]]:
+    """读取结果库；中断时写了一半的末行被截掉，以免与之后追加的结果连在一起。"""
+    results: dict[str, dict[str, Any]] = {}
+    if not path.exists():
+        return results
+    data = path.read_bytes()
+    complete = data.rfind(b"\n") + 1
+    if complete < len(data):
+        with path.open("r+b") as f:
+            f.truncate(complete)
+    for line in data[:complete].decode("utf-8").splitlines():
+        try:
+            entry = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        results[entry["key"]] = entry["row"]
+    return results
+
+
+def append_result(key: str, row: dict[str, Any], path: Path = RESULT_STORE) -> None:
+    """把一个完成的结果追加到结果库并立即落盘。"""
+    with path.open("a", encoding="utf-8") as f:
+        f.write(json.dumps({"key": key, "row": row}, sort_keys=True) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
 def run_one(task: tuple[float, int, str, str]) -> dict[str, Any]:
     """Run one independent simulation task in a worker process."""
     load, seed, alg_label, alg_name = task
@@ -58,9 +230,36 @@ def run_one(task: tuple[float, int, str, str]) -> dict[str, Any]:
     from simulation.runner import SimulationRunner
 
     runner = SimulationRunner()
-    runner.build(cfg)
+    runner.build(cfg, topology=_topology_template(cfg), path_cache=_shared_paths(cfg))
     summary = runner.run()
 
+    return _result_row(cfg, task, summary)
+
+
+def run_lockstep(tasks: list[tuple[float, int, str, str]]) -> list[dict[str, Any]]:
+    """在一个工作进程中同步运行同一 (load, seed) 的多个算法，按 tasks 的顺序返回结果行。"""
+    load, seed = tasks[0][:2]
+    cfg = _build_config(load=load, seed=seed, algorithm_name=tasks[0][3])
+    cfg = replace(cfg, algorithm=replace(cfg.algorithm, lockstep=[task[3] for task in tasks]))
+
+    from simulation.lockstep import LockstepRunner
+
+    runner = LockstepRunner()
+    runner.build(cfg, topology=_topology_template(cfg), path_cache=_shared_paths(cfg))
+    summaries = runner.run()
+
+    return [_result_row(cfg, task, summaries[task[3]]) for task in tasks]
+
+
+def run_tasks(tasks: list[tuple[float, int, str, str]]) -> list[dict[str, Any]]:
+    """工作进程入口：多个任务（同一 load 和 seed）同步运行，单个任务单独运行。"""
+    if len(tasks) > 1:
+        return run_lockstep(tasks)
+    return [run_one(tasks[0])]
+
+
+def _result_row(cfg, task: tuple[float, int, str, str], summary: dict[str, Any]) -> dict[str, Any]:
+    load, seed, alg_label, alg_name = task
     return {
         "topology": cfg.topology.path,
         "algorithm": alg_label,
@@ -238,47 +437,76 @@ def main() -> None:
     os.chdir(PROJECT_DIR)
     OUT_DIR.mkdir(parents=True, exist_ok=True)
 
-    seeds = random.sample(SEED_RANGE, NUM_REPEATS)
-    tasks = [
+    seeds = random.Random(SWEEP_SEED).sample(SEED_RANGE, NUM_REPEATS)
+    all_tasks = [
         (float(load), int(seed), alg_label, alg_name)
         for load in LOADS
         for seed in seeds
         for alg_label, alg_name in ALGORITHMS.items()
     ]
 
-    if not tasks:
+    if not all_tasks:
         print("No simulation tasks to run.", flush=True)
         return
 
-    worker_count = MAX_WORKERS or min(os.cpu_count() or 1, len(tasks))
+    # 已在结果库中的任务直接复用，其余任务完成一个写入一个
+    version = code_version()
+    stored = load_result_store()
+    keys = {
+        task: config_key(_build_config(load=task[0], seed=task[1], algorithm_name=task[3]), version)
+        for task in all_tasks
+    }
+    rows: list[dict[str, Any]] = [stored[keys[task]] for task in all_tasks if keys[task] in stored]
+    tasks = [task for task in all_tasks if keys[task] not in stored]
+    print(f"Cached results: {len(rows)}, result store: {RESULT_STORE}", flush=True)
+
+    if LOCKSTEP:
+        groups: dict[tuple[float, int], list[tuple[float, int, str, str]]] = {}
+        for task in tasks:
+            groups.setdefault(task[:2], []).append(task)
+        batches = list(groups.values())
+    else:
+        batches = [[task] for task in tasks]
+
+    worker_count = MAX_WORKERS or min(os.cpu_count() or 1, max(len(batches), 1))
     print(f"LOADS: {LOADS}", flush=True)
     print(f"SEEDS: {seeds}", flush=True)
-    print(f"Total tasks: {len(tasks)}, workers: {worker_count}", flush=True)
+    print(f"Total tasks: {len(tasks)} in {len(batches)} batches, workers: {worker_count}", flush=True)
 
-    rows: list[dict[str, Any]] = []
     completed = 0
 
-    with ProcessPoolExecutor(max_workers=worker_count) as executor:
-        futures = {executor.submit(run_one, task): task for task in tasks}
-        for future in as_completed(futures):
-            task = futures[future]
-            load, seed, alg_label, _ = task
-            try:
-                row = future.result()
-            except Exception as exc:
-                print(
-                    f"FAILED load={load}, seed={seed}, algorithm={alg_label}: {exc}",
-                    flush=True,
-                )
-                raise
-
-            rows.append(row)
-            completed += 1
-            print(
-                f"DONE {completed}/{len(tasks)}: "
-                f"load={load}, seed={seed}, algorithm={alg_label}",
-                flush=True,
-            )
+    # 拓扑和 K 路由表只在主进程加载一次，工作进程附加同一块共享内存
+    shared, shared_handle = publish_tables(_BASE_CONFIG)
+    try:
+        with ProcessPoolExecutor(
+                max_workers=worker_count, initializer=init_worker, initargs=(shared_handle,)
+        ) as executor:
+            futures = {executor.submit(run_tasks, batch): batch for batch in batches}
+            for future in as_completed(futures):
+                batch = futures[future]
+                load, seed = batch[0][:2]
+                try:
+                    batch_rows = future.result()
+                except Exception as exc:
+                    print(
+                        f"FAILED load={load}, seed={seed}, "
+                        f"algorithm={','.join(task[2] for task in batch)}: {exc}",
+                        flush=True,
+                    )
+                    raise
+
+                for task, row in zip(batch, batch_rows):
+                    append_result(keys[task], row)
+                    rows.append(row)
+                    completed += 1
+                    print(
+                        f"DONE {completed}/{len(tasks)}: "
+                        f"load={load}, seed={seed}, algorithm={task[2]}",
+                        flush=True,
+                    )
+    finally:
+        shared.close()
+        shared.unlink()
 
     rows.sort(key=lambda r: (r["load"], r["seed"], r["algorithm"]))
     agg_rows = aggregate_results(rows)
@@ -1,18 +1,26 @@
 from __future__ import annotations
 
 import logging
+import time as clock
 from dataclasses import dataclass, field
-from typing import Literal, Any
+from typing import Literal
 
-from models.events import Event, FlowArrivalEvent, FlowDepartureEvent
+from models.events import ARRIVAL, DEPARTURE, Event, FlowArrivalEvent, FlowDepartureEvent
 from models.flow import Flow
 from models.exceptions import SimulationError, TopologyError
 from observability.stats import StatsCollector
+from observability.trace import TraceCode, get_trace
+from observability.tracer import Tracer
+from simulation.scheduler import CompactEventScheduler, EventScheduler
+from topology import schema
 from topology.physical import PhysicalTopology
-from topology.virtual import VirtualTopology
+from topology.route import Route
+from topology.virtual import Lightpath, VirtualTopology
+from algorithms.auxiliary_graph import AuxiliaryGraph
 from algorithms.base import HeuristicAlgorithm, AlgInput, AlgOutput
 
 logger = logging.getLogger(__name__)
+_trace = get_trace("control_plane")
 
 
 @dataclass
@@ -22,7 +30,7 @@ class FlowLightpathRef:
     dst: int
     key: int
     wavelength_used: int
-    route: list[Any]
+    route: Route
     created_by_this_flow: bool
 
 
@@ -31,6 +39,13 @@ class ControlPlane:
     pt: PhysicalTopology
     vt: VirtualTopology
     stats: StatsCollector
+    # 由 SimulationRunner 注入；业务被接受时在此调度其离开事件。
+    scheduler: EventScheduler | CompactEventScheduler | None = None
+    # 调试用：每个到达事件前完整校验拓扑属性，并核对增量维护的辅助图与完整构建的结果一致；
+    # 默认只校验控制平面写入的光路。
+    paranoid: bool = False
+    # 可选的二进制事件追踪器，记录到达、决策、光路建立与拆除，供离线重算统计指标。
+    tracer: Tracer | None = None
 
     current_time: float = 0.0
     algorithm: HeuristicAlgorithm | None = None
@@ -38,32 +53,78 @@ class ControlPlane:
     active_flows: dict[int, Flow] = field(default_factory=dict)
     mapped_flow_lightpaths: dict[int, list[FlowLightpathRef]] = field(default_factory=dict)
 
+    # 控制平面是网络状态的唯一写者，因此由它持有辅助图并在资源变化时原地修补。
+    aux_graph: AuxiliaryGraph = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.aux_graph = AuxiliaryGraph()
+        self.aux_graph.get_aux_graph(self.pt.graph, self.vt.graph, self.pt.wavelengths, self.pt.routes)
+
+    def reset(self) -> None:
+        """
+        拆除所有仍在使用的光路并清空业务表，网络恢复到刚构建时的状态，耗时与现存光路数成正比。
+
+        辅助图原地复位：删除现存光路的 lightpath 层节点，恢复它们占用的波长边，
+        结果与从空网络完整构建的辅助图邻接顺序相同（paranoid 模式下在下一个到达事件时核对）。
+        虚拟拓扑只删除现存光路，物理拓扑只恢复波长位图。
+        """
+        for src, dst, key, data in list(self.vt.graph.edges(keys=True, data=True)):
+            for u, v in data["route"].edges:
+                self.aux_graph.release_wavelength(u, v, data["wavelength_used"])
+            self.aux_graph.remove_lightpath(src, dst, key)
+        self.vt.reset()
+        self.pt.reset()
+
+        self.active_flows.clear()
+        self.mapped_flow_lightpaths.clear()
+        self.current_time = 0.0
+
     def set_algorithm(self, algorithm: HeuristicAlgorithm) -> None:
         self.algorithm = algorithm
         logger.info(f"Control plane bound to routing algorithm=%s", type(algorithm).__name__)
 
     def process_event(self, event: Event) -> None:
-        # Arrivals are made visible to the algorithm before admission; departures
-        # reclaim any working or backup resources still tied to the flow.
-        self.current_time = event.time
-        logger.debug(f"{"*" * 50}")
-        logger.debug("Processing simulation type=%s time=%.6f", type(event).__name__, event.time)
         if isinstance(event, FlowArrivalEvent):
-            logger.info(f"Flow arrival id={event.flow.id} src={event.flow.src} dst={event.flow.dst}")
-            self.active_flows[event.flow.id] = event.flow
+            self.dispatch(event.time, ARRIVAL, event.flow)
+        elif isinstance(event, FlowDepartureEvent):
+            self.dispatch(event.time, DEPARTURE, event.flow)
+        else:
+            raise SimulationError(f"unsupported simulation type: {type(event).__name__}")
 
-            alg_input = AlgInput(flow=event.flow, pt=self.pt, vt=self.vt)
+    def dispatch(self, time: float, kind: int, flow: Flow) -> None:
+        # Arrivals are made visible to the algorithm before admission; departures
+        # reclaim any working or backup resources still tied to the flow.
+        self.current_time = time
+        if _trace.enabled:
+            _trace.emit(TraceCode.CP_EVENT, kind, time, flow.id)
+        if kind == ARRIVAL:
+            logger.info("Flow arrival id=%d src=%d dst=%d", flow.id, flow.src, flow.dst)
+            if self.paranoid:
+                schema.validate_graph(self.pt.graph)
+                schema.validate_graph(self.vt.graph)
+                self.aux_graph.verify_against_rebuild(self.pt.graph)
+            self.active_flows[flow.id] = flow
+            tracer = self.tracer
+            if tracer is not None:
+                tracer.arrival(time, flow)
+                start = clock.perf_counter()
+
+            alg_input = AlgInput(flow=flow, pt=self.pt, vt=self.vt, ag=self.aux_graph)
             alg_output = self.algorithm.flow_arrival(alg_input)
 
             if alg_output.status:
-                self.accept_flow(event.flow.id, alg_output.routes)
+                if self.accept_flow(flow.id, alg_output.routes) and tracer is not None:
+                    tracer.accept(
+                        time, flow, self.mapped_flow_lightpaths.get(flow.id, []), clock.perf_counter() - start
+                    )
             else:
-                self.block_flow(event.flow.id)
-        elif isinstance(event, FlowDepartureEvent):
-            logger.info(f"Flow departure id={event.flow.id} src={event.flow.src} dst={event.flow.dst}")
-            self.remove_flow(event.flow.id)
+                if self.block_flow(flow.id) and tracer is not None:
+                    tracer.block(time, flow, clock.perf_counter() - start)
+        elif kind == DEPARTURE:
+            logger.info("Flow departure id=%d src=%d dst=%d", flow.id, flow.src, flow.dst)
+            self.remove_flow(flow.id)
         else:
-            raise SimulationError(f"unsupported simulation type: {type(event).__name__}")
+            raise SimulationError(f"unsupported simulation kind: {kind}")
 
     def accept_flow(self, flow_id: int, lightpaths: dict) -> bool:
         flow = self.active_flows.get(flow_id)
@@ -84,7 +145,7 @@ class ControlPlane:
                 for lightpath in value:
                     if lightpath.kind == "new":
                         # 新建光路
-                        edge_key = self.vt.graph.add_edge(
+                        edge_key = self.vt.add_lightpath(
                             lightpath.src,
                             lightpath.dst,
                             layer="lightpath",
@@ -110,36 +171,42 @@ class ControlPlane:
                                 created_by_this_flow=True,
                             )
                         )
+                        edge_data = self.vt.graph.edges[lightpath.src, lightpath.dst, edge_key]
+                        schema.validate_edge(
+                            lightpath.src, lightpath.dst, edge_data, schema.REQUIRED_EDGE_ATTRS_VIR, key=edge_key
+                        )
+                        self.aux_graph.add_lightpath(lightpath.src, lightpath.dst, edge_key, edge_data)
+                        self.stats.lightpath_setup(edge_data["usage"], lightpath.route, self.current_time)
                         virtual_hops += 1
                         # 删除波长
-                        for u, v in zip(lightpath.route[:-1], lightpath.route[1:]):
-                            self.pt.graph.edges[u.node, v.node]["wavelength_available"].remove(lightpath.wavelength_used)
-                            self.pt.graph.edges[u.node, v.node]["wavelength_used"].append(lightpath.wavelength_used)
+                        for link, (u, v) in zip(lightpath.route.links, lightpath.route.edges):
+                            self.pt.wavelengths.take(link, lightpath.wavelength_used)
+                            self.aux_graph.take_wavelength(u, v, lightpath.wavelength_used)
                             physical_hops += 1
                     elif lightpath.kind == "exist":
-                        for key, attr in self.vt.graph[lightpath.src][lightpath.dst].items():
-                            if attr["route"] == lightpath.route and attr["usage"] == "data":
-                                attr["avl_bandwidth"] -= flow.rate
-                                attr.setdefault("active_flows", set()).add(flow.id)
-
-                                self.mapped_flow_lightpaths.setdefault(flow.id, []).append(
-                                    FlowLightpathRef(
-                                        usage="data",
-                                        src=lightpath.src,
-                                        dst=lightpath.dst,
-                                        key=key,
-                                        wavelength_used=lightpath.wavelength_used,
-                                        route=lightpath.route,
-                                        created_by_this_flow=False,
-                                    )
-                                )
-                                break
+                        key = self._existing_lightpath_key(lightpath, "data")
+                        attr = self.vt.graph.edges[lightpath.src, lightpath.dst, key]
+                        attr["avl_bandwidth"] -= flow.rate
+                        attr.setdefault("active_flows", set()).add(flow.id)
+                        self.aux_graph.update_lightpath(lightpath.src, lightpath.dst, key, attr)
+
+                        self.mapped_flow_lightpaths.setdefault(flow.id, []).append(
+                            FlowLightpathRef(
+                                usage="data",
+                                src=lightpath.src,
+                                dst=lightpath.dst,
+                                key=key,
+                                wavelength_used=lightpath.wavelength_used,
+                                route=lightpath.route,
+                                created_by_this_flow=False,
+                            )
+                        )
                         virtual_hops += 1
                         groomed = True
             elif usage == "recip":
                 for lightpath in value:
                     if lightpath.kind == "new":
-                        edge_key = self.vt.graph.add_edge(
+                        edge_key = self.vt.add_lightpath(
                             lightpath.src,
                             lightpath.dst,
                             layer="lightpath",
@@ -165,48 +232,67 @@ class ControlPlane:
                                 created_by_this_flow=True,
                             )
                         )
+                        edge_data = self.vt.graph.edges[lightpath.src, lightpath.dst, edge_key]
+                        schema.validate_edge(
+                            lightpath.src, lightpath.dst, edge_data, schema.REQUIRED_EDGE_ATTRS_VIR, key=edge_key
+                        )
+                        self.aux_graph.add_lightpath(lightpath.src, lightpath.dst, edge_key, edge_data)
+                        self.stats.lightpath_setup(edge_data["usage"], lightpath.route, self.current_time)
                         virtual_hops += 1
                         # 删除波长
-                        for u, v in zip(lightpath.route[:-1], lightpath.route[1:]):
-                            self.pt.graph.edges[u.node, v.node]["wavelength_available"].remove(lightpath.wavelength_used)
-                            self.pt.graph.edges[u.node, v.node]["wavelength_used"].append(lightpath.wavelength_used)
+                        for link, (u, v) in zip(lightpath.route.links, lightpath.route.edges):
+                            self.pt.wavelengths.take(link, lightpath.wavelength_used)
+                            self.aux_graph.take_wavelength(u, v, lightpath.wavelength_used)
                             physical_hops += 1
                     elif lightpath.kind == "exist":
-                        for key, attr in self.vt.graph[lightpath.src][lightpath.dst].items():
-                            if attr["route"] == lightpath.route and attr["usage"] == "recip":
-                                attr["avl_key_rate"] -= flow.attrs["kgr"]
-                                attr.setdefault("active_flows", set()).add(flow.id)
-
-                                self.mapped_flow_lightpaths.setdefault(flow.id, []).append(
-                                    FlowLightpathRef(
-                                        usage="recip",
-                                        src=lightpath.src,
-                                        dst=lightpath.dst,
-                                        key=key,
-                                        wavelength_used=lightpath.wavelength_used,
-                                        route=lightpath.route,
-                                        created_by_this_flow=False,
-                                    )
-                                )
-                                break
+                        key = self._existing_lightpath_key(lightpath, "recip")
+                        attr = self.vt.graph.edges[lightpath.src, lightpath.dst, key]
+                        attr["avl_key_rate"] -= flow.attrs["kgr"]
+                        attr.setdefault("active_flows", set()).add(flow.id)
+                        self.aux_graph.update_lightpath(lightpath.src, lightpath.dst, key, attr)
+
+                        self.mapped_flow_lightpaths.setdefault(flow.id, []).append(
+                            FlowLightpathRef(
+                                usage="recip",
+                                src=lightpath.src,
+                                dst=lightpath.dst,
+                                key=key,
+                                wavelength_used=lightpath.wavelength_used,
+                                route=lightpath.route,
+                                created_by_this_flow=False,
+                            )
+                        )
                         virtual_hops += 1
                         groomed = True
 
-        self.stats.accept_flow(
-            flow=flow,
-            lightpaths=lightpaths,
-            physical_edges=self.pt.graph.edges()
-        )
+        self.stats.accept_flow(flow=flow, lightpaths=lightpaths, time=self.current_time)
 
-        logger.info(f"Flow {flow.id} accepted.")
+        if self.scheduler is not None:
+            self.scheduler.add_departure(self.current_time + flow.duration, flow)
+
+        logger.info("Flow %d accepted.", flow.id)
         return True
 
+    def _existing_lightpath_key(self, lightpath: Lightpath, usage: str) -> int:
+        """复用光路的边键：算法已给出则直接使用，否则查虚拟拓扑的光路索引。"""
+        key = lightpath.key
+        if key is None:
+            key = self.vt.find_lightpath(
+                lightpath.src, lightpath.dst, usage, lightpath.wavelength_used, lightpath.route
+            )
+        if key is None:
+            raise TopologyError(
+                f"no existing {usage} lightpath {lightpath.src} - {lightpath.dst} "
+                f"on wavelength {lightpath.wavelength_used}"
+            )
+        return key
+
     def block_flow(self, flow_id: int) -> bool:
         flow = self.active_flows.pop(flow_id, None)
         if flow is None:
             logger.warning("Ignoring block for missing flow id=%d", flow_id)
             return False
-        self.stats.block_flow(flow)
+        self.stats.block_flow(flow, time=self.current_time)
         logger.info(
             "Flow blocked id=%d src=%d dst=%d rate=%d",
             flow.id,
@@ -231,6 +317,8 @@ class ControlPlane:
             return False
 
         lightpath_refs = self.mapped_flow_lightpaths.pop(flow_id, [])
+        if self.tracer is not None:
+            self.tracer.departure(self.current_time, flow, lightpath_refs)
 
         for ref in lightpath_refs:
             try:
@@ -246,6 +334,8 @@ class ControlPlane:
                 )
                 continue
 
+            schema.validate_edge(ref.src, ref.dst, edge_data, schema.REQUIRED_EDGE_ATTRS_VIR, key=ref.key)
+
             # 1. 释放虚拟光路上的业务资源
             if ref.usage == "data":
                 edge_data["avl_bandwidth"] += flow.rate
@@ -262,19 +352,24 @@ class ControlPlane:
 
             # 3. 如果该 lightpath 已经空闲，并且是动态新建的，则拆除
             if not active_flow_ids:
-                for u, v in zip(edge_data["route"][:-1], edge_data["route"][1:]):
-                    self.pt.graph[u.node][v.node]["wavelength_available"].append(edge_data["wavelength_used"])
-                    self.pt.graph[u.node][v.node]["wavelength_used"].remove(edge_data["wavelength_used"])
-                    logger.debug(f"Release resource on edge {u.node} - {v.node}: {self.pt.graph[u.node][v.node]}")
-
-                self.vt.graph.remove_edge(
-                    ref.src,
-                    ref.dst,
-                    key=ref.key,
-                )
-                logger.debug(f"Tear down lightpath {ref.src} - {ref.dst} - {ref.key}.")
+                w = edge_data["wavelength_used"]
+                for link, (u, v) in zip(edge_data["route"].links, edge_data["route"].edges):
+                    self.pt.wavelengths.release(link, w)
+                    self.aux_graph.release_wavelength(u, v, w)
+                    if _trace.enabled:
+                        _trace.emit(TraceCode.CP_WAVELENGTH_RELEASED, u, v, w)
+
+                self.vt.remove_lightpath(ref.src, ref.dst, ref.key)
+                self.stats.lightpath_teardown(ref.usage, edge_data["route"], self.current_time)
+                self.aux_graph.remove_lightpath(ref.src, ref.dst, ref.key)
+                if _trace.enabled:
+                    _trace.emit(TraceCode.CP_LIGHTPATH_TORN_DOWN, ref.src, ref.dst, ref.key)
+                if self.tracer is not None:
+                    self.tracer.teardown(self.current_time, flow, ref.usage, ref.src, ref.dst, ref.key, w, ref.route)
+            else:
+                self.aux_graph.update_lightpath(ref.src, ref.dst, ref.key, edge_data)
 
-        self.stats.remove_flow(flow, lightpath_refs)
+        self.stats.remove_flow(flow, lightpath_refs, time=self.current_time)
 
         del self.active_flows[flow_id]
 
@@ -0,0 +1,113 @@
+"""
+按配置创建仿真各组成部分，SimulationRunner 和 LockstepRunner 共用。
+配置不合法时抛出 ConfigurationError。
+"""
+from __future__ import annotations
+
+import logging
+from dataclasses import asdict
+from pathlib import Path
+
+from algorithms import AuxGCostFirstGrooming, AuxGJointDataRecipGrooming, AuxGSecurityFirstGrooming, HeuristicAlgorithm
+from models.config import SimulationConfig
+from models.exceptions import ConfigurationError
+from observability.tracer import Tracer
+from simulation.scheduler import BACKENDS as SCHEDULER_BACKENDS, CompactEventScheduler, EventScheduler
+from simulation.steady_state import SteadyStateMonitor
+from topology import PathCache, PhysicalTopology
+
+logger = logging.getLogger(__name__)
+
+
+def load_topology(config: SimulationConfig) -> PhysicalTopology:
+    pt = PhysicalTopology()
+    pt.load(
+        config.topology.path,
+        cache_dir=config.topology.cache_dir,
+        **asdict(config.topology.resource),
+    )
+    return pt
+
+
+def load_path_cache(
+        config: SimulationConfig, pt: PhysicalTopology, path_cache: PathCache | None = None
+) -> PathCache | None:
+    """未开启 algorithm.path_cache 时返回 None；path_cache 为已加载的 K 路由表时校验 k 后直接使用。"""
+    if not config.algorithm.path_cache:
+        return None
+    if path_cache is None:
+        return PathCache.load_or_build(
+            config.topology.path,
+            pt.graph,
+            config.algorithm.k,
+            cache_dir=config.topology.cache_dir,
+        )
+    if path_cache.k != config.algorithm.k:
+        raise ConfigurationError(f"path cache holds k={path_cache.k} routes, algorithm.k is {config.algorithm.k}")
+    return path_cache
+
+
+def create_tracer(config: SimulationConfig, pt: PhysicalTopology) -> Tracer | None:
+    if not config.logging.trace_file:
+        return None
+    tracer = Tracer(
+        path=config.logging.trace_file,
+        meta={
+            "topology": config.topology.path,
+            "algorithm": config.algorithm.name,
+            "load": config.traffic.load,
+            "seed": config.traffic.seed,
+            "costs": config.attrs["costs"],
+            "physical_links": [[u, v] for u, v in pt.links],
+            "wavelengths": pt.wavelengths.num_wavelengths,
+        },
+        chunk_records=config.logging.trace_chunk_records,
+        compression=config.logging.trace_compression.strip().lower(),
+    )
+    logger.info("Event trace written to %s", config.logging.trace_file)
+    return tracer
+
+
+def seed_trace_file(path: str, seed: int) -> str:
+    """reset(seed) 之后各次运行的追踪文件：在扩展名前插入种子，例如 trace.bin -> trace.seed2.bin。"""
+    path = Path(path)
+    return str(path.with_name(f"{path.stem}.seed{seed}{path.suffix}"))
+
+
+def create_scheduler(config: SimulationConfig) -> EventScheduler | CompactEventScheduler:
+    backend = config.scheduler.backend.strip().lower()
+    if backend not in SCHEDULER_BACKENDS:
+        raise ConfigurationError(f"unknown scheduler backend: {config.scheduler.backend}")
+    scheduler_cls = CompactEventScheduler if config.scheduler.compact else EventScheduler
+    return scheduler_cls(backend=backend)
+
+
+def create_steady_state(config: SimulationConfig) -> SteadyStateMonitor | None:
+    if not config.steady_state.enabled:
+        return None
+    # 需要流式业务才能在任意时刻停止生成
+    if not config.traffic.streaming:
+        raise ConfigurationError("steady-state mode requires traffic.streaming = true")
+    return SteadyStateMonitor(config.steady_state)
+
+
+def create_algorithm(config: SimulationConfig, path_cache: PathCache | None = None) -> HeuristicAlgorithm:
+    # Accept a few aliases so config files can stay readable while still mapping
+    # cleanly onto concrete algorithm classes.
+    name = config.algorithm.name.strip().lower()
+    engine = config.algorithm.engine.strip().lower()
+    if engine not in HeuristicAlgorithm.ENGINES:
+        raise ConfigurationError(f"unknown path search engine: {config.algorithm.engine}")
+    if name == "jdrg":
+        return AuxGJointDataRecipGrooming(k=config.algorithm.k, engine=engine, path_cache=path_cache)
+    elif name == "sfg":
+        return AuxGSecurityFirstGrooming(k=config.algorithm.k, engine=engine, path_cache=path_cache)
+    elif name == "cfg":
+        return AuxGCostFirstGrooming(
+            k=config.algorithm.k,
+            c_h=config.attrs["costs"]["channel"],
+            c_p=config.attrs["costs"]["port"],
+            engine=engine,
+            path_cache=path_cache,
+        )
+    raise ConfigurationError(f"unknown routing algorithm: {config.algorithm}")
@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import logging
+import math
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Any
+
+from models.config import SimulationConfig
+from models.events import ARRIVAL, DEPARTURE
+from models.exceptions import ConfigurationError
+from observability.stats import StatsCollector
+from observability.trace import configure_trace
+from observability.tracer import Tracer
+from simulation.control_plane import ControlPlane
+from simulation.factory import (
+    create_algorithm,
+    create_scheduler,
+    create_steady_state,
+    create_tracer,
+    load_path_cache,
+    load_topology,
+    seed_trace_file,
+)
+from simulation.scheduler import CompactEventScheduler, EventScheduler
+from simulation.steady_state import SteadyStateMonitor
+from simulation.traffic import TrafficGenerator
+from topology import PathCache, PhysicalTopology, VirtualTopology
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Lane:
+    """同步运行中的一个算法：独立的网络状态、统计、离开事件队列、追踪器和稳态监视器。"""
+    name: str
+    config: SimulationConfig
+    control_plane: ControlPlane
+    stats: StatsCollector
+    departures: EventScheduler | CompactEventScheduler | None = None
+    tracer: Tracer | None = None
+    steady_state: SteadyStateMonitor | None = None
+    finished: bool = False
+
+    def advance(self, time: float) -> None:
+        """处理所有早于 time 的离开事件；处理离开事件不会调度新事件，可以一次取出。"""
+        dispatch = self.control_plane.dispatch
+        for departure_time, _, flow in self.departures.pop_before(time):
+            dispatch(departure_time, DEPARTURE, flow)
+
+    def summary(self) -> dict[str, Any]:
+        if self.tracer is not None:
+            self.tracer.close()
+        if self.steady_state is not None:
+            return self.steady_state.summary(self.stats)
+        return self.stats.summary()
+
+
+class LockstepRunner:
+    """
+    在同一业务流上同步运行 algorithm.lockstep 中列出的多个算法。
+
+    业务只生成一次，到达事件放在共享的调度器中；每个到达事件依次交给各算法的控制平面。
+    各算法只在自己接受的业务上产生离开事件，因此离开事件放在各自的队列中，
+    处理到达之前先处理本算法中早于该到达的离开事件。每个算法看到的事件顺序与单独运行
+    SimulationRunner 时相同（时间完全相同的到达和离开按到达在前处理，连续分布下概率为零），
+    结果也相同，而业务生成、拓扑加载和 K 路由只做一次，算法之间构成公共随机数的配对比较。
+
+    物理拓扑的图结构和路由驻留表在各算法之间共享，波长位图、虚拟拓扑和辅助图各自独立。
+    """
+
+    def __init__(self):
+        self.lanes: list[Lane] = []
+        self.arrivals: EventScheduler | CompactEventScheduler | None = None
+        self.traffic: TrafficGenerator | None = None
+        self.config: SimulationConfig | None = None
+        # 配置中的追踪文件路径，reset(seed) 据此为每个种子派生各自的文件名
+        self.trace_file: str = ""
+
+    def build(
+            self,
+            config: SimulationConfig,
+            topology: PhysicalTopology | None = None,
+            path_cache: PathCache | None = None,
+    ) -> None:
+        names = list(config.algorithm.lockstep)
+        if not names:
+            raise ConfigurationError("lockstep mode requires algorithm.lockstep to list at least one algorithm")
+        normalized = [name.strip().lower() for name in names]
+        if len(set(normalized)) != len(normalized):
+            raise ConfigurationError(f"duplicate algorithm in algorithm.lockstep: {names}")
+
+        configure_trace(config.logging.trace)
+        template = load_topology(config) if topology is None else topology.clone()
+        path_cache = load_path_cache(config, template, path_cache)
+
+        self.lanes = []
+        for name in names:
+            lane_config = replace(config, algorithm=replace(config.algorithm, name=name, lockstep=[]))
+            if config.logging.trace_file:
+                trace_file = lane_trace_file(config.logging.trace_file, name)
+                lane_config = replace(lane_config, logging=replace(config.logging, trace_file=trace_file))
+            stats = StatsCollector(lane_config)
+            pt = template.fork()
+            stats.register_links(pt.links, pt.wavelengths.num_wavelengths)
+            vt = VirtualTopology()
+            vt.init(pt.graph)
+
+            control_plane = ControlPlane(pt=pt, vt=vt, stats=stats, paranoid=config.topology.paranoid)
+            routing_algorithm = create_algorithm(lane_config, path_cache)
+            control_plane.set_algorithm(routing_algorithm)
+            self.lanes.append(Lane(name=name, config=lane_config, control_plane=control_plane, stats=stats))
+        logger.info("Lockstep algorithms: %s", names)
+
+        self.config = config
+        self.trace_file = config.logging.trace_file
+        self._start(config)
+
+    def reset(self, seed: int | None = None) -> None:
+        """与 SimulationRunner.reset 相同：各算法的网络状态和统计复位后，重新生成业务。"""
+        if seed is not None:
+            self.config = replace(self.config, traffic=replace(self.config.traffic, seed=seed))
+        for lane in self.lanes:
+            if lane.tracer is not None:
+                lane.tracer.close()
+            lane.config = replace(lane.config, traffic=self.config.traffic)
+            if seed is not None and self.trace_file:
+                trace_file = lane_trace_file(seed_trace_file(self.trace_file, seed), lane.name)
+                lane.config = replace(lane.config, logging=replace(lane.config.logging, trace_file=trace_file))
+            lane.stats.reset()
+            lane.control_plane.reset()
+        self._start(self.config)
+
+    def run(self) -> dict[str, dict[str, Any]]:
+        """运行到业务结束（或所有算法的稳态估计都已收敛），返回 {算法名: summary}。"""
+        logger.info(f"{"=" * 30} Start Lockstep Simulation {"=" * 30}")
+        arrivals, traffic, lanes = self.arrivals, self.traffic, self.lanes
+        running = len(lanes)
+        while running and len(arrivals) > 0:
+            time, _, flow = arrivals.pop()
+            if traffic.streaming:
+                traffic.schedule_next(arrivals)
+            for lane in lanes:
+                if lane.finished:
+                    continue
+                lane.advance(time)
+                lane.stats.observe_arrival(flow, time)
+                lane.control_plane.dispatch(time, ARRIVAL, flow)
+                if lane.steady_state is not None and lane.steady_state.observe(lane.stats):
+                    logger.info(
+                        "Steady-state estimate of %s converged after %d arrivals", lane.name, lane.stats.arrivals
+                    )
+                    lane.finished = True
+                    running -= 1
+        for lane in lanes:
+            if not lane.finished:
+                lane.advance(math.inf)
+        return {lane.name: lane.summary() for lane in lanes}
+
+    def _start(self, config: SimulationConfig) -> None:
+        """创建每次运行各自独立的部分：共享的到达调度器和业务，以及各算法的离开队列、追踪器和稳态监视器。"""
+        for lane in self.lanes:
+            lane.finished = False
+            lane.tracer = create_tracer(lane.config, lane.control_plane.pt)
+            lane.departures = create_scheduler(config)
+            lane.steady_state = create_steady_state(config)
+            lane.control_plane.scheduler = lane.departures
+            lane.control_plane.tracer = lane.tracer
+
+        self.arrivals = create_scheduler(config)
+        self.traffic = TrafficGenerator(config.traffic, sorted(self.lanes[0].control_plane.pt.graph.nodes()))
+        if self.traffic.streaming:
+            self.traffic.start(self.arrivals)
+        else:
+            self.traffic.generate(self.arrivals)
+            logger.info("Traffic generation completed with %d arrivals", len(self.arrivals))
+
+
+def lane_trace_file(path: str, name: str) -> str:
+    """各算法的追踪文件：在扩展名前插入算法名，例如 trace.bin -> trace.cfg.bin。"""
+    path = Path(path)
+    return str(path.with_name(f"{path.stem}.{name.strip().lower()}{path.suffix}"))
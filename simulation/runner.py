@@ -1,83 +1,162 @@
 from __future__ import annotations
 
 import logging
-from dataclasses import asdict
+from dataclasses import replace
 from typing import Any
 
-from algorithms import *
+from algorithms import HeuristicAlgorithm
 from models.config import SimulationConfig
 from simulation.control_plane import ControlPlane
-from models.events import Event
-from simulation.scheduler import EventScheduler
+from models.events import ARRIVAL
+from simulation.factory import (
+    create_algorithm,
+    create_scheduler,
+    create_steady_state,
+    create_tracer,
+    load_path_cache,
+    load_topology,
+    seed_trace_file,
+)
+from simulation.steady_state import SteadyStateMonitor
+from simulation.scheduler import CompactEventScheduler, EventScheduler
 from simulation.traffic import TrafficGenerator
-from models.exceptions import ConfigurationError
 from observability.stats import StatsCollector
-from topology import VirtualTopology, PhysicalTopology
+from observability.trace import TraceCode, configure_trace, get_trace
+from topology import VirtualTopology, PhysicalTopology, PathCache
 from observability.tracer import Tracer
 
 logger = logging.getLogger(__name__)
+_trace = get_trace("runner")
 
 
 class SimulationRunner:
     def __init__(self):
-        self.scheduler: EventScheduler | None = None
+        self.scheduler: EventScheduler | CompactEventScheduler | None = None
         self.control_plane: ControlPlane | None = None
         self.stats: StatsCollector | None = None
         self.routing_algorithm: HeuristicAlgorithm | None = None
+        self.traffic: TrafficGenerator | None = None
+        self.tracer: Tracer | None = None
+        self.steady_state: SteadyStateMonitor | None = None
+        self.config: SimulationConfig | None = None
+        # 配置中的追踪文件路径，reset(seed) 据此为每个种子派生各自的文件名
+        self.trace_file: str = ""
 
     def run(self) -> dict[str, Any]:
         # Core discrete-simulation loop: process the earliest simulation, observe it in
         # statistics, then let the control plane mutate network state.
         logger.info(f"{"=" * 30} Start Simulation {"=" * 30}")
         logger.info("Simulation loop started with %d scheduled events", len(self.scheduler))
-        while len(self.scheduler) > 0:
-            event: Event = self.scheduler.pop_event()
-            logger.debug("Dispatching simulation type=%s time=%.6f", type(event).__name__, event.time)
-            self.stats.observe_event(event)
-            self.control_plane.process_event(event)
+        scheduler, traffic, steady_state = self.scheduler, self.traffic, self.steady_state
+        while len(scheduler) > 0:
+            # 两种调度器都以 (time, kind, flow) 形式出队，控制平面按整数类型分派。
+            time, kind, flow = scheduler.pop()
+            if _trace.enabled:
+                _trace.emit(TraceCode.RUNNER_DISPATCH, kind, time, flow.id)
+            if kind == ARRIVAL:
+                if traffic.streaming:
+                    # 流式业务：到达事件出队时补充下一个到达，保证事件顺序与一次性生成一致。
+                    traffic.schedule_next(scheduler)
+                self.stats.observe_arrival(flow, time)
+            self.control_plane.dispatch(time, kind, flow)
+            if kind == ARRIVAL and steady_state is not None and steady_state.observe(self.stats):
+                logger.info("Steady-state estimate converged after %d arrivals", self.stats.arrivals)
+                break
         # self.routing_algorithm.simulation_end()
+        if self.tracer is not None:
+            self.tracer.close()
+        if steady_state is not None:
+            return steady_state.summary(self.stats)
         return self.stats.summary()
 
-    def build(self, config: SimulationConfig):
+    def build(
+            self,
+            config: SimulationConfig,
+            topology: PhysicalTopology | None = None,
+            path_cache: PathCache | None = None,
+    ):
+        """
+        按配置构建一次仿真。topology 为同一配置下已加载的物理拓扑模板时，
+        使用它的副本而不重新读取 GraphML 文件（模板本身不会被修改）；
+        path_cache 为已加载（例如附加在共享内存上）的 K 路由表时直接使用，不再读取磁盘缓存。
+        """
+        # 按配置开启各子系统的调试跟踪，关闭时热路径上不构造任何日志字符串。
+        configure_trace(config.logging.trace)
         # 创建统计模块，用于记录业务到达、接受、阻塞、释放、资源利用率等仿真过程中的统计信息。
         self.stats = StatsCollector(config)
-        # 创建事件追踪器
-        # tracer = Tracer(path=config.trace_path)
 
         # 加载物理拓扑
-        pt = PhysicalTopology()
-        pt.load(config.topology.path, **asdict(config.topology.resource))
+        if topology is None:
+            pt = load_topology(config)
+        else:
+            pt = topology.clone()
+        self.stats.register_links(pt.links, pt.wavelengths.num_wavelengths)
 
         # 创建虚拟拓扑
         vt = VirtualTopology()
         vt.init(pt.graph)
 
-        # 创建控制平面
+        # 预计算物理 K 路由
+        path_cache = load_path_cache(config, pt, path_cache)
+
+        # 创建控制平面，离开事件由控制平面在接受业务时调度
         logger.info(f"{'='*25} Initialize Control Plane {'='*25}")
-        routing_algorithm = self._create_algorithm(config)
+        routing_algorithm = create_algorithm(config, path_cache)
         self.control_plane = ControlPlane(
             pt=pt,
             vt=vt,
             stats=self.stats,
+            paranoid=config.topology.paranoid,
         )
         self.control_plane.set_algorithm(routing_algorithm)
         logger.info("Algorithm selected: %s", type(routing_algorithm).__name__)
 
+        self.config = config
+        self.trace_file = config.logging.trace_file
+        self._start(config)
+
+    def reset(self, seed: int | None = None) -> None:
+        """
+        把已构建的仿真复位到 build() 刚完成时的状态，以便在同一进程内连续运行多个种子。
+
+        拓扑、路由驻留表、路径缓存和算法对象都被保留：控制平面拆除仍在使用的光路并原地复位辅助图，
+        统计清零，然后重新创建调度器并生成业务。seed 不为 None 时换用新的业务随机种子，
+        追踪文件也改为该种子各自的文件（见 seed_trace_file），不会覆盖之前种子的追踪。
+        """
+        if seed is not None:
+            config = replace(self.config, traffic=replace(self.config.traffic, seed=seed))
+            if self.trace_file:
+                trace_file = seed_trace_file(self.trace_file, seed)
+                config = replace(config, logging=replace(config.logging, trace_file=trace_file))
+            self.config = config
+        if self.tracer is not None:
+            self.tracer.close()
+        self.stats.reset()
+        self.control_plane.reset()
+        self._start(self.config)
+
+    def _start(self, config: SimulationConfig) -> None:
+        """创建每次运行各自独立的部分：追踪器、调度器、稳态监视器和业务。"""
+        pt = self.control_plane.pt
+
+        # 创建事件追踪器
+        self.tracer = create_tracer(config, pt)
+
         # 创建事件调度器
         logger.info(f"{'=' * 25} Initialize Scheduler {'=' * 25}")
-        self.scheduler = EventScheduler()
-        TrafficGenerator(config.traffic, sorted(pt.graph.nodes())).generate(self.scheduler)
-        logger.info("Traffic generation completed with %d scheduled events", len(self.scheduler))
-
-    @staticmethod
-    def _create_algorithm(config: SimulationConfig) -> HeuristicAlgorithm:
-        # Accept a few aliases so config files can stay readable while still mapping
-        # cleanly onto concrete algorithm classes.
-        name = config.algorithm.name.strip().lower()
-        if name == "jdrg":
-            return AuxGJointDataRecipGrooming(k=config.algorithm.k)
-        elif name == "sfg":
-            return AuxGSecurityFirstGrooming(k=config.algorithm.k)
-        elif name == "cfg":
-            return AuxGCostFirstGrooming(k=config.algorithm.k, c_h=config.attrs["costs"]["channel"], c_p=config.attrs["costs"]["port"])
-        raise ConfigurationError(f"unknown routing algorithm: {config.algorithm}")
+        self.scheduler = create_scheduler(config)
+
+        self.control_plane.scheduler = self.scheduler
+        self.control_plane.tracer = self.tracer
+
+        # 稳态模式：按批均值估计阻塞率，收敛后提前结束
+        self.steady_state = create_steady_state(config)
+
+        # 生成业务
+        self.traffic = TrafficGenerator(config.traffic, sorted(pt.graph.nodes()))
+        if self.traffic.streaming:
+            self.traffic.start(self.scheduler)
+            logger.info("Streaming traffic generation started")
+        else:
+            self.traffic.generate(self.scheduler)
+            logger.info("Traffic generation completed with %d scheduled events", len(self.scheduler))
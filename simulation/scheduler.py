@@ -1,27 +1,265 @@
 from __future__ import annotations
 
+import bisect
 import heapq
 import itertools
+import math
 from dataclasses import dataclass, field
+from typing import Any
 
-from models.events import Event
+from models.events import ARRIVAL, DEPARTURE, Event, FlowArrivalEvent, FlowDepartureEvent
+from models.flow import Flow
+
+
+BACKENDS = ("heap", "calendar")
+
+
+class HeapQueue:
+    """基于 heapq 的优先队列，元素为以 (time, seq) 开头的元组。"""
+    __slots__ = ("_items",)
+
+    def __init__(self):
+        self._items: list[tuple] = []
+
+    def push(self, item: tuple) -> None:
+        heapq.heappush(self._items, item)
+
+    def pop(self) -> tuple:
+        return heapq.heappop(self._items)
+
+    def peek(self) -> tuple:
+        return self._items[0]
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+class CalendarQueue:
+    """
+    日历队列（Brown, 1988），入队和出队均摊 O(1)。
+
+    时间轴按宽度 width 划分为虚拟桶 int(time / width)，虚拟桶对桶数取模后映射到桶，
+    每个桶内的元素按 (time, seq) 升序保存。出队从当前虚拟桶开始逐桶查找属于该虚拟桶的元素，
+    一整轮都没有命中时退化为直接比较各桶头部。元素数超过桶数的两倍或不足一半时桶数翻倍或减半，
+    并根据队首若干元素的平均间隔重新估计桶宽。出队顺序与 HeapQueue 完全相同。
+    """
+    __slots__ = ("_width", "_buckets", "_mask", "_size", "_current")
+
+    MIN_BUCKETS = 2
+    SAMPLE_SIZE = 25
+
+    def __init__(self, width: float = 1.0):
+        if width <= 0:
+            raise ValueError(f"calendar bucket width must be positive, got {width}")
+        self._width = width
+        self._buckets: list[list[tuple]] = [[] for _ in range(self.MIN_BUCKETS)]
+        self._mask = self.MIN_BUCKETS - 1
+        self._size = 0
+        # 当前虚拟桶编号；队列中所有元素的虚拟桶编号都不小于它。
+        self._current = 0
+
+    def push(self, item: tuple) -> None:
+        vb = int(item[0] / self._width)
+        bucket = self._buckets[vb & self._mask]
+        if not bucket or bucket[-1] < item:
+            bucket.append(item)
+        else:
+            bisect.insort(bucket, item)
+        if vb < self._current:
+            self._current = vb
+        self._size += 1
+        if self._size > 2 * len(self._buckets):
+            self._resize(2 * len(self._buckets))
+
+    def pop(self) -> tuple:
+        item = self._locate().pop(0)
+        self._size -= 1
+        if self._size < len(self._buckets) // 2 and len(self._buckets) > self.MIN_BUCKETS:
+            self._resize(len(self._buckets) // 2)
+        return item
+
+    def peek(self) -> tuple:
+        return self._locate()[0]
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _locate(self) -> list[tuple]:
+        """返回队首元素所在的桶，并把当前虚拟桶推进到队首元素处。"""
+        if not self._size:
+            raise IndexError("pop from an empty calendar queue")
+        buckets, mask, width = self._buckets, self._mask, self._width
+        for vb in range(self._current, self._current + len(buckets)):
+            bucket = buckets[vb & mask]
+            if bucket and int(bucket[0][0] / width) == vb:
+                self._current = vb
+                return bucket
+
+        bucket = min((b for b in buckets if b), key=lambda b: b[0])
+        self._current = int(bucket[0][0] / width)
+        return bucket
+
+    def _resize(self, num_buckets: int) -> None:
+        items = [item for bucket in self._buckets for item in bucket]
+        self._width = self._sample_width(items) or self._width
+        self._buckets = [[] for _ in range(num_buckets)]
+        self._mask = num_buckets - 1
+
+        width, buckets, mask = self._width, self._buckets, self._mask
+        for item in items:
+            buckets[int(item[0] / width) & mask].append(item)
+        for bucket in buckets:
+            bucket.sort()
+        if items:
+            self._current = int(min(item[0] for item in items) / width)
+
+    def _sample_width(self, items: list[tuple]) -> float | None:
+        """桶宽取队首样本平均间隔的 3 倍，计算前剔除大于两倍平均值的间隔。"""
+        times = heapq.nsmallest(self.SAMPLE_SIZE, (item[0] for item in items))
+        gaps = [b - a for a, b in zip(times[:-1], times[1:])]
+        if not gaps:
+            return None
+        mean_gap = sum(gaps) / len(gaps)
+        if mean_gap <= 0:
+            return None
+        gaps = [gap for gap in gaps if gap <= 2 * mean_gap]
+        return 3 * sum(gaps) / len(gaps)
+
+
+def make_queue(backend: str) -> HeapQueue | CalendarQueue:
+    if backend == "heap":
+        return HeapQueue()
+    if backend == "calendar":
+        return CalendarQueue()
+    raise ValueError(f"unknown scheduler backend: {backend}")
 
 
 @dataclass
 class EventScheduler:
-    _heap: list[tuple[float, int, Event]] = field(default_factory=list)
+    backend: str = "heap"
+    _queue: Any = field(init=False, repr=False)
     _sequence: itertools.count = field(default_factory=itertools.count)
+    # pop_before 已经取出的时间界，之后入队的事件不能早于它
+    _horizon: float = field(default=0.0, init=False, repr=False)
+
+    def __post_init__(self):
+        self._queue = make_queue(self.backend)
 
     def add_event(self, event: Event) -> None:
         if event.time < 0:
             raise ValueError(f"simulation time must be non-negative, got {event.time}")
-        heapq.heappush(self._heap, (event.time, next(self._sequence), event))
+        if event.time < self._horizon:
+            raise ValueError(f"event at {event.time} precedes events already taken before {self._horizon}")
+        self._queue.push((event.time, next(self._sequence), event))
 
     def pop_event(self) -> Event:
-        if not self._heap:
+        if not self._queue:
             raise IndexError("cannot pop from an empty simulation scheduler")
-        return heapq.heappop(self._heap)[2]
+        return self._queue.pop()[2]
+
+    def add_arrival(self, time: float, flow: Flow) -> None:
+        self.add_event(FlowArrivalEvent(time=time, flow=flow))
+
+    def add_departure(self, time: float, flow: Flow) -> None:
+        self.add_event(FlowDepartureEvent(time=time, flow=flow))
+
+    def pop(self) -> tuple[float, int, Flow]:
+        """以紧凑形式 (time, kind, flow) 弹出最早的事件，与 CompactEventScheduler.pop 一致。"""
+        event = self.pop_event()
+        kind = ARRIVAL if isinstance(event, FlowArrivalEvent) else DEPARTURE
+        return event.time, kind, event.flow
+
+    def next_time(self) -> float:
+        """最早事件的发生时间，调度器为空时为 inf。"""
+        return self._queue.peek()[0] if self._queue else math.inf
+
+    def pop_before(self, time: float) -> list[tuple[float, int, Flow]]:
+        """与 CompactEventScheduler.pop_before 相同。"""
+        queue = self._queue
+        events = []
+        while queue and queue.peek()[0] < time:
+            event = queue.pop()[2]
+            kind = ARRIVAL if isinstance(event, FlowArrivalEvent) else DEPARTURE
+            events.append((event.time, kind, event.flow))
+        self._horizon = max(self._horizon, time)
+        return events
 
     def __len__(self) -> int:
-        return len(self._heap)
+        return len(self._queue)
+
+
+@dataclass
+class CompactEventScheduler:
+    """
+    紧凑事件调度器：队列中只保存 (time, seq, kind, flow_id) 四元组，不为每个事件创建 Event 对象。
+
+    flows 是流表，保存仍有待处理事件的业务：到达事件出队时取出，业务被接受后随离开事件重新登记，
+    因此流表大小与待处理事件数同阶。出队顺序与 EventScheduler 相同（按 time，再按入队序号）。
+    """
+    backend: str = "heap"
+    flows: dict[int, Flow] = field(default_factory=dict)
+    _queue: Any = field(init=False, repr=False)
+    _sequence: itertools.count = field(default_factory=itertools.count)
+    # pop_before 已经取出的时间界，之后入队的事件不能早于它
+    _horizon: float = field(default=0.0, init=False, repr=False)
+
+    def __post_init__(self):
+        self._queue = make_queue(self.backend)
 
+    def add(self, time: float, kind: int, flow_id: int) -> None:
+        if time < 0:
+            raise ValueError(f"simulation time must be non-negative, got {time}")
+        if time < self._horizon:
+            raise ValueError(f"event at {time} precedes events already taken before {self._horizon}")
+        self._queue.push((time, next(self._sequence), kind, flow_id))
+
+    def add_arrival(self, time: float, flow: Flow) -> None:
+        self.flows[flow.id] = flow
+        self.add(time, ARRIVAL, flow.id)
+
+    def add_departure(self, time: float, flow: Flow) -> None:
+        self.flows[flow.id] = flow
+        self.add(time, DEPARTURE, flow.id)
+
+    def pop(self) -> tuple[float, int, Flow]:
+        if not self._queue:
+            raise IndexError("cannot pop from an empty simulation scheduler")
+        time, _, kind, flow_id = self._queue.pop()
+        return time, kind, self.flows.pop(flow_id)
+
+    def next_time(self) -> float:
+        """最早事件的发生时间，调度器为空时为 inf。"""
+        return self._queue.peek()[0] if self._queue else math.inf
+
+    def pop_before(self, time: float) -> list[tuple[float, int, Flow]]:
+        """
+        按顺序弹出所有早于 time 的事件。
+
+        处理这些事件时新调度的事件不会出现在返回结果中，因此之后入队早于 time 的事件会引发 ValueError，
+        而不是被悄悄排到已返回的事件之后。
+        """
+        queue, flows = self._queue, self.flows
+        events = []
+        while queue and queue.peek()[0] < time:
+            event_time, _, kind, flow_id = queue.pop()
+            events.append((event_time, kind, flows.pop(flow_id)))
+        self._horizon = max(self._horizon, time)
+        return events
+
+    # Event API，兼容按事件对象读写调度器的代码。
+    def add_event(self, event: Event) -> None:
+        if isinstance(event, FlowArrivalEvent):
+            self.add_arrival(event.time, event.flow)
+        elif isinstance(event, FlowDepartureEvent):
+            self.add_departure(event.time, event.flow)
+        else:
+            raise TypeError(f"unsupported simulation type: {type(event).__name__}")
+
+    def pop_event(self) -> Event:
+        time, kind, flow = self.pop()
+        if kind == ARRIVAL:
+            return FlowArrivalEvent(time=time, flow=flow)
+        return FlowDepartureEvent(time=time, flow=flow)
+
+    def __len__(self) -> int:
+        return len(self._queue)
@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import logging
+import math
+from dataclasses import dataclass, field
+from statistics import NormalDist
+from typing import Any
+
+import numpy as np
+
+from models.config import SteadyStateConfig
+from models.exceptions import ConfigurationError
+from observability.stats import StatsCollector, StatsSnapshot
+
+logger = logging.getLogger(__name__)
+
+def t_quantile(p: float, df: int) -> float:
+    """
+    Student t 分布的 p 分位数。
+
+    df = 1、2 用闭式解，df = 3..5 对精确分布函数二分求逆，df >= 6 用 Cornish-Fisher 展开（误差小于 1e-3）。
+
+    >>> [round(t_quantile(0.975, df), 3) for df in (1, 2, 5, 30)]
+    [12.706, 4.303, 2.571, 2.042]
+    """
+    if df == 1:
+        return math.tan(math.pi * (p - 0.5))
+    if df == 2:
+        return (2 * p - 1) / math.sqrt(2 * p * (1 - p))
+    if df <= _EXACT_T_DF:
+        return math.copysign(_t_quantile_exact(abs(2 * p - 1), df), p - 0.5)
+    z = NormalDist().inv_cdf(p)
+    g1 = (z ** 3 + z) / 4
+    g2 = (5 * z ** 5 + 16 * z ** 3 + 3 * z) / 96
+    g3 = (3 * z ** 7 + 19 * z ** 5 + 17 * z ** 3 - 15 * z) / 384
+    g4 = (79 * z ** 9 + 776 * z ** 7 + 1482 * z ** 5 - 1920 * z ** 3 - 945 * z) / 92160
+    return z + g1 / df + g2 / df ** 2 + g3 / df ** 3 + g4 / df ** 4
+
+
+# 不超过该自由度时 t_quantile 使用精确分布函数，Cornish-Fisher 展开在此范围内误差过大
+_EXACT_T_DF = 5
+
+
+def _t_quantile_exact(a: float, df: int) -> float:
+    """
+    求 t >= 0 使 P(|T| < t) = a：令 θ = atan(t / √df)，P(|T| < t) 是 θ 的单调函数（Abramowitz-Stegun 26.7.3、26.7.4），
+    在 [0, π/2) 上二分 θ。
+    """
+    def central(theta: float) -> float:
+        s, c2 = math.sin(theta), math.cos(theta) ** 2
+        term, total = 1.0, 1.0 if df % 2 == 0 else math.cos(theta) * (df > 1)
+        for j in range(2 if df % 2 == 0 else 3, df - 1, 2):
+            term *= c2 * (j - 1) / j
+            total += term if df % 2 == 0 else term * math.cos(theta)
+        if df % 2 == 0:
+            return s * total
+        return 2 / math.pi * (theta + s * total)
+
+    low, high = 0.0, math.pi / 2
+    for _ in range(60):
+        mid = (low + high) / 2
+        if central(mid) < a:
+            low = mid
+        else:
+            high = mid
+    return math.sqrt(df) * math.tan((low + high) / 2)
+
+
+def mser(values: list[float], min_kept: int = 2) -> int:
+    """
+    MSER 预热截断点：在 d <= n - min_kept 范围内选择 d，使剩余序列的 Σ(x - mean)² / (n - d)² 最小。
+
+    values 为批均值序列；利用后缀和每次调用 O(n)。
+    """
+    n = len(values)
+    if n < max(min_kept, 2):
+        return 0
+    best_d, best = 0, math.inf
+    total = total_sq = 0.0
+    suffix = []
+    for value in reversed(values):
+        total += value
+        total_sq += value * value
+        suffix.append((total, total_sq))
+    suffix.reverse()
+    for d in range(n - max(min_kept, 2) + 1):
+        k = n - d
+        total, total_sq = suffix[d]
+        statistic = (total_sq - total * total / k) / (k * k)
+        if statistic < best:
+            best_d, best = d, statistic
+    return best_d
+
+
+@dataclass
+class SteadyStateMonitor:
+    """
+    稳态阻塞率估计与提前终止。
+
+    每处理完 batch_size 个到达业务记录一次计数器快照，得到批阻塞率序列；用 MSER 剔除预热批，
+    对剩余批做批均值估计，剩余批数不少于 min_batches、预热批数不超过总批数的一半、估计值大于 0
+    且置信区间半宽不超过 relative_precision × 估计值时判定收敛，仿真循环随即结束。
+    """
+    config: SteadyStateConfig
+
+    # 各批结束时的统计快照，首项为仿真开始时的全零快照
+    snapshots: list[StatsSnapshot] = field(default_factory=lambda: [StatsSnapshot.zero()])
+    warmup_batches: int = 0
+    estimate: float = 0.0
+    half_width: float = math.inf
+    converged: bool = False
+
+    def __post_init__(self):
+        if self.config.batch_size <= 0:
+            raise ConfigurationError(f"steady_state.batch_size must be positive, got {self.config.batch_size}")
+        if self.config.min_batches < 2:
+            raise ConfigurationError(f"steady_state.min_batches must be at least 2, got {self.config.min_batches}")
+        if not 0 < self.config.confidence < 1:
+            raise ConfigurationError(f"steady_state.confidence must be in (0, 1), got {self.config.confidence}")
+        if self.config.relative_precision <= 0:
+            raise ConfigurationError(
+                f"steady_state.relative_precision must be positive, got {self.config.relative_precision}"
+            )
+
+    def observe(self, stats: StatsCollector) -> bool:
+        """每个到达事件处理完后调用；在批边界上更新估计，收敛时返回 True。"""
+        if stats.arrivals % self.config.batch_size:
+            return False
+        self.snapshots.append(stats.snapshot())
+        self._estimate()
+        return self.converged
+
+    def batch_means(self) -> list[float]:
+        size = self.config.batch_size
+        return [(end.blocked - start.blocked) / size for start, end in zip(self.snapshots[:-1], self.snapshots[1:])]
+
+    def summary(self, stats: StatsCollector) -> dict[str, Any]:
+        """
+        剔除预热后的统计汇总：所有指标（计数、阻塞率、安全暴露、成本、时间平均资源占用）
+        都只覆盖预热结束之后的部分，并附加估计精度。
+        """
+        self._estimate()
+        summary = stats.summary(since=self.snapshots[self.warmup_batches])
+        summary.update({
+            "warmup_calls": self.warmup_batches * self.config.batch_size,
+            "batches": len(self.snapshots) - 1 - self.warmup_batches,
+            "blocking_rate_half_width": self.half_width,
+            "converged": self.converged,
+        })
+        return summary
+
+    def utilization(self, stats: StatsCollector) -> dict[str, np.ndarray]:
+        """剔除预热后的逐链路、逐用途时间平均资源占用，窗口与 summary 相同。"""
+        self._estimate()
+        return stats.utilization(since=self.snapshots[self.warmup_batches])
+
+    def _estimate(self) -> None:
+        means = self.batch_means()
+        self.warmup_batches = mser(means, self.config.min_batches)
+        kept = means[self.warmup_batches:]
+        k = len(kept)
+        if k < 2:
+            return
+        self.estimate = sum(kept) / k
+        variance = sum((value - self.estimate) ** 2 for value in kept) / (k - 1)
+        self.half_width = t_quantile((1 + self.config.confidence) / 2, k - 1) * math.sqrt(variance / k)
+        # 相对精度在估计值为 0 时无从满足：各批均无阻塞时半宽也为 0，但这只说明阻塞是稀有事件，
+        # 仍需继续仿真，直到出现阻塞或达到 traffic.calls 上限（此时 converged 为 False）。
+        # 截断点落在序列后一半或搜索上界上时，MSER 的极小值可能还在更后面（网络仍在填充），
+        # 预热尚未结束，继续仿真。
+        bound = len(means) - self.config.min_batches
+        self.converged = (
+            k >= self.config.min_batches
+            and self.warmup_batches <= len(means) // 2
+            and (self.warmup_batches < bound or self.warmup_batches == 0)
+            and self.estimate > 0
+            and self.half_width <= self.config.relative_precision * self.estimate
+        )
+        logger.info(
+            "Steady-state batch %d: warmup=%d blocking=%.6f half_width=%.6f converged=%s",
+            len(means), self.warmup_batches, self.estimate, self.half_width, self.converged,
+        )
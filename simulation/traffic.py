@@ -1,43 +1,176 @@
 from __future__ import annotations
 
+import bisect
+import itertools
 import logging
 import random
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from typing import Any, Iterator
 
-from models.events import FlowArrivalEvent, FlowDepartureEvent
 from models.flow import Flow
-from .scheduler import EventScheduler
+from .scheduler import CompactEventScheduler, EventScheduler
 from models.config import CallTypeConfig, TrafficConfig
+from models.exceptions import ConfigurationError
+from observability.trace import TraceCode, get_trace
 
 logger = logging.getLogger(__name__)
+_trace = get_trace("traffic")
+
+GENERATORS = ("python", "numpy")
+# numpy 生成器每批生成的业务数
+BATCH_SIZE = 1 << 16
+
+
+@dataclass(frozen=True, slots=True)
+class TrafficBatch:
+    """一批业务的列式数据，第 i 行对应 id 为 first_id + i 的业务。"""
+
+    first_id: int
+    arrival: Any
+    duration: Any
+    src: Any
+    dst: Any
+    rate: Any
+    sec: Any
+    kgr: Any
+
+    def __len__(self) -> int:
+        return len(self.arrival)
+
+    def flows(self) -> Iterator[tuple[float, Flow]]:
+        rows = zip(
+            self.arrival.tolist(),
+            self.src.tolist(),
+            self.dst.tolist(),
+            self.rate.tolist(),
+            self.duration.tolist(),
+            self.sec.tolist(),
+            self.kgr.tolist(),
+        )
+        for flow_id, (time, src, dst, rate, duration, sec, kgr) in enumerate(rows, start=self.first_id):
+            yield time, Flow(
+                id=flow_id,
+                src=src,
+                dst=dst,
+                rate=rate,
+                duration=duration,
+                attrs={
+                    "sec": sec,
+                    "kgr": kgr
+                }
+            )
 
 
 @dataclass
 class TrafficGenerator:
+    """
+    业务生成器。config.generator 选择随机数来源：python（random.Random 逐个抽样）
+    或 numpy（按批向量化抽样，各属性使用独立随机流）。支持两种调度方式
+    （同一随机种子下产生完全相同的业务序列）：
+
+     - eager：generate() 在仿真开始前把全部到达事件放入调度器；
+     - streaming：start() 只调度第一个到达，之后每处理一个到达事件，
+       由仿真循环调用 schedule_next() 补充下一个到达，调度器中只保留当前在途业务的事件。
+    离开事件由 ControlPlane 在业务被接受时调度。
+    """
     config: TrafficConfig
     node_ids: list[int]
 
-    def generate(self, scheduler: EventScheduler) -> None:
-        rng = random.Random(self.config.seed)
-        mean_rate = _weighted_mean_rate(self.config.call_types)
-        mean_arrival_time = (
-            self.config.mean_holding_time * (mean_rate / self.config.max_bandwidth)
-        ) / self.config.load
+    _flows: Iterator[tuple[float, Flow]] | None = field(default=None, init=False, repr=False)
+
+    def __post_init__(self):
+        if self.config.generator not in GENERATORS:
+            raise ConfigurationError(f"unknown traffic generator: {self.config.generator}")
+
+    @property
+    def streaming(self) -> bool:
+        return self.config.streaming
+
+    def generate(self, scheduler: EventScheduler | CompactEventScheduler) -> None:
+        for time, flow in self.flows():
+            self._schedule_flow(scheduler, time, flow)
+
+    def start(self, scheduler: EventScheduler | CompactEventScheduler) -> None:
+        self._flows = self.flows()
+        self.schedule_next(scheduler)
+
+    def schedule_next(self, scheduler: EventScheduler | CompactEventScheduler) -> bool:
+        """调度业务流中的下一个业务，业务已全部生成时返回 False。"""
+        item = next(self._flows, None)
+        if item is None:
+            return False
+        self._schedule_flow(scheduler, *item)
+        return True
+
+    def flows(self) -> Iterator[tuple[float, Flow]]:
+        """按到达时间顺序惰性产生 (arrival_time, flow)。"""
+        if self.config.generator == "numpy":
+            for batch in self.batches():
+                yield from batch.flows()
+        else:
+            yield from self._python_flows()
+
+    def batches(self, batch_size: int = BATCH_SIZE) -> Iterator[TrafficBatch]:
+        """
+        用 NumPy Generator 按批生成业务列。
+
+        到达间隔、持续时间、业务类型、节点对、安全等级和密钥速率各自使用
+        SeedSequence(seed) 派生的独立子随机流，修改其中一个分布不会改变其余各列。
+        """
+        import numpy as np
+
+        mean_arrival_time = self._mean_arrival_time()
+        pairs = self._node_pairs()
+        logger.info(f"Start generate traffic: {self.config.calls} flows, {mean_arrival_time} mean_arrival_time.")
 
-        pairs = [
-            (src, dst)
-            for src in self.node_ids
-            for dst in self.node_ids
-            if src != dst
-        ]
-        if not pairs:
-            raise ValueError("traffic generation requires at least two nodes")
+        arrival_rng, duration_rng, call_type_rng, pair_rng, sec_rng, kgr_rng = (
+            np.random.default_rng(child) for child in np.random.SeedSequence(self.config.seed).spawn(6)
+        )
+        rates = np.array([item.rate for item in self.config.call_types], dtype=np.int64)
+        cumulative = np.cumsum([float(item.weight) for item in self.config.call_types])
+        pair_src = np.array([src for src, _ in pairs], dtype=np.int64)
+        pair_dst = np.array([dst for _, dst in pairs], dtype=np.int64)
+        attrs = self.config.attrs
+
+        time = 0.0
+        for first_id in range(0, self.config.calls, batch_size):
+            size = min(batch_size, self.config.calls - first_id)
+
+            # 从上一批的最后到达时刻开始顺序累加，与逐个累加的结果一致。
+            arrival = np.cumsum(np.concatenate(([time], arrival_rng.exponential(mean_arrival_time, size))))[1:]
+            time = float(arrival[-1])
+            duration = duration_rng.exponential(self.config.mean_holding_time, size)
+
+            threshold = call_type_rng.uniform(0.0, cumulative[-1], size)
+            call_type = np.minimum(np.searchsorted(cumulative, threshold, side="left"), len(rates) - 1)
+            pair = pair_rng.integers(len(pairs), size=size)
+
+            sec = sec_rng.integers(attrs["min_security_level"], attrs["max_security_level"], size=size, endpoint=True)
+            kgr = kgr_rng.integers(attrs["min_key_rate"], attrs["max_key_rate"], size=size, endpoint=True)
+            kgr = np.where(sec > 0, kgr, 0)
+
+            yield TrafficBatch(
+                first_id=first_id,
+                arrival=arrival,
+                duration=duration,
+                src=pair_src[pair],
+                dst=pair_dst[pair],
+                rate=rates[call_type],
+                sec=sec,
+                kgr=kgr,
+            )
+
+    def _python_flows(self) -> Iterator[tuple[float, Flow]]:
+        rng = random.Random(self.config.seed)
+        mean_arrival_time = self._mean_arrival_time()
+        pairs = self._node_pairs()
+        cumulative = _cumulative_weights(self.config.call_types)
 
         logger.info(f"Start generate traffic: {self.config.calls} flows, {mean_arrival_time} mean_arrival_time.")
 
         time = 0.0
         for flow_id in range(self.config.calls):
-            call_type = _weighted_choice(rng, self.config.call_types)
+            call_type = _weighted_choice(rng, self.config.call_types, cumulative)
             pair = rng.choice(pairs)
             inter_arrival = rng.expovariate(1.0 / mean_arrival_time)
             duration = rng.expovariate(1.0 / self.config.mean_holding_time)
@@ -58,13 +191,32 @@ class TrafficGenerator:
                     "kgr": kgr
                 }
             )
-            event_arrival = FlowArrivalEvent(time=time, flow=flow)
-            event_depart = FlowDepartureEvent(time=time + duration, flow=flow)
-            scheduler.add_event(event_arrival)
-            scheduler.add_event(event_depart)
+            yield time, flow
 
-            logger.debug(event_arrival)
-            logger.debug(event_depart)
+    def _mean_arrival_time(self) -> float:
+        mean_rate = _weighted_mean_rate(self.config.call_types)
+        return (
+            self.config.mean_holding_time * (mean_rate / self.config.max_bandwidth)
+        ) / self.config.load
+
+    def _node_pairs(self) -> list[tuple[int, int]]:
+        pairs = [
+            (src, dst)
+            for src in self.node_ids
+            for dst in self.node_ids
+            if src != dst
+        ]
+        if not pairs:
+            raise ValueError("traffic generation requires at least two nodes")
+        return pairs
+
+    @staticmethod
+    def _schedule_flow(scheduler: EventScheduler | CompactEventScheduler, time: float, flow: Flow) -> None:
+        # 只调度到达事件；离开事件由控制平面在业务被接受时调度，被阻塞的业务不产生离开事件。
+        scheduler.add_arrival(time, flow)
+
+        if _trace.enabled:
+            _trace.emit(TraceCode.TRAFFIC_ARRIVAL, time, flow)
 
 
 def _weighted_mean_rate(call_types: list[CallTypeConfig]) -> float:
@@ -74,14 +226,15 @@ def _weighted_mean_rate(call_types: list[CallTypeConfig]) -> float:
     return sum(item.rate * item.weight for item in call_types) / total_weight
 
 
-def _weighted_choice(rng: random.Random, items: list):
-    total = sum(float(getattr(item, "weight")) for item in items)
-    if total <= 0:
+def _cumulative_weights(items: list) -> list[float]:
+    cumulative = list(itertools.accumulate(float(getattr(item, "weight")) for item in items))
+    if not cumulative or cumulative[-1] <= 0:
         raise ValueError("weights must sum to a positive value")
-    threshold = rng.uniform(0.0, total)
-    cumulative = 0.0
-    for item in items:
-        cumulative += float(getattr(item, "weight"))
-        if threshold <= cumulative:
-            return item
-    return items[-1]
+    return cumulative
+
+
+def _weighted_choice(rng: random.Random, items: list, cumulative: list[float]):
+    # cumulative 由 _cumulative_weights 预先计算，避免每次抽样都重新求和。
+    threshold = rng.uniform(0.0, cumulative[-1])
+    index = bisect.bisect_left(cumulative, threshold)
+    return items[min(index, len(items) - 1)]
@@ -1,9 +1,18 @@
+from .compiled import CompiledTopology
+from .paths import PathCache
 from .physical import PhysicalTopology
+from .route import Route, RouteTable
 from .virtual import VirtualTopology, Lightpath
+from .wavelength import WavelengthBitmap
 
 __all__ = [
+    "CompiledTopology",
+    "PathCache",
     "PhysicalTopology",
+    "Route",
+    "RouteTable",
     "VirtualTopology",
-    "Lightpath"
+    "Lightpath",
+    "WavelengthBitmap",
 ]
 
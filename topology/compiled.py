@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import networkx as nx
+import numpy as np
+
+from .paths import file_digest
+
+logger = logging.getLogger(__name__)
+
+# 编译文件格式版本，字段变化时递增，旧文件会被忽略并重新编译。
+COMPILED_FORMAT = 1
+
+
+def resource_digest(resource: dict[str, Any]) -> str:
+    """[topology.resource] 取值的摘要，与拓扑文件摘要一起作为编译文件的键。"""
+    raw = json.dumps(resource, sort_keys=True, default=dict)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class CompiledTopology:
+    """
+    GraphML 物理拓扑的编译结果，以 NumPy 数组保存，可直接写入/读取 .npz 文件。
+
+     - node_ids: 节点编号，按 GraphML 中的顺序
+     - latitude, longitude: 节点坐标，缺失时为 NaN
+     - node_attrs: 坐标以外的其余节点属性
+     - link_src, link_dst: 有向链路端点，下标即链路编号（无向边展开为两个方向）
+     - max_bandwidth, max_key_rate: 每条链路的默认资源
+     - num_wavelengths: 每条链路的波长数
+
+    PhysicalTopology 总是从编译结果构建图，因此解析 GraphML 与读取编译文件得到的拓扑完全相同。
+    """
+    topology_hash: str
+    resource_hash: str
+    node_ids: np.ndarray
+    latitude: np.ndarray
+    longitude: np.ndarray
+    node_attrs: list[dict[str, Any]]
+    link_src: np.ndarray
+    link_dst: np.ndarray
+    max_bandwidth: np.ndarray
+    max_key_rate: np.ndarray
+    num_wavelengths: int
+
+    _ARRAYS = ("node_ids", "latitude", "longitude", "link_src", "link_dst", "max_bandwidth", "max_key_rate")
+
+    @property
+    def num_links(self) -> int:
+        return len(self.link_src)
+
+    @classmethod
+    def from_graphml(cls, path: str | Path, topology_hash: str = "", **kwargs) -> CompiledTopology:
+        raw_graph = nx.read_graphml(path)
+        node_ids, latitude, longitude, node_attrs = [], [], [], []
+        for node_id, attrs in raw_graph.nodes(data=True):
+            attrs = dict(attrs)
+            node_ids.append(int(node_id))
+            latitude.append(float(attrs.pop("Latitude", np.nan)))
+            longitude.append(float(attrs.pop("Longitude", np.nan)))
+            node_attrs.append(attrs)
+
+        link_src, link_dst = [], []
+        for src, dst in raw_graph.edges():
+            directions = [(src, dst)] if raw_graph.is_directed() else [(src, dst), (dst, src)]
+            for directed_src, directed_dst in directions:
+                link_src.append(int(directed_src))
+                link_dst.append(int(directed_dst))
+
+        num_links = len(link_src)
+        return cls(
+            topology_hash=topology_hash,
+            resource_hash=resource_digest(kwargs),
+            node_ids=np.asarray(node_ids, dtype=np.int64),
+            latitude=np.asarray(latitude, dtype=np.float64),
+            longitude=np.asarray(longitude, dtype=np.float64),
+            node_attrs=node_attrs,
+            link_src=np.asarray(link_src, dtype=np.int64),
+            link_dst=np.asarray(link_dst, dtype=np.int64),
+            max_bandwidth=np.full(num_links, int(kwargs.get("max_bandwidth", 0)), dtype=np.int64),
+            max_key_rate=np.full(num_links, int(kwargs.get("attrs", {}).get("max_key_rate", 0)), dtype=np.int64),
+            num_wavelengths=int(kwargs.get("wavelengths", 0)),
+        )
+
+    @classmethod
+    def load_or_build(cls, topology_path: str | Path, cache_dir: str | Path, **kwargs) -> CompiledTopology:
+        """
+        读取拓扑文件对应的编译文件，不存在或已过期时解析 GraphML 并写入缓存。
+
+        文件以拓扑文件摘要和 [topology.resource] 摘要为键，两者任一变化都会重新编译。
+        """
+        topology_hash = file_digest(topology_path)
+        resource_hash = resource_digest(kwargs)
+        cache_path = Path(cache_dir) / f"topology-{topology_hash[:16]}-{resource_hash[:8]}.npz"
+
+        if cache_path.exists():
+            try:
+                compiled = cls.load(cache_path)
+            except (OSError, KeyError, ValueError) as exc:
+                logger.warning("Ignoring unreadable compiled topology %s: %s", cache_path, exc)
+            else:
+                if compiled.topology_hash == topology_hash and compiled.resource_hash == resource_hash:
+                    logger.info("Compiled topology loaded from %s", cache_path)
+                    return compiled
+                logger.warning("Ignoring stale compiled topology %s", cache_path)
+
+        compiled = cls.from_graphml(topology_path, topology_hash=topology_hash, **kwargs)
+        compiled.save(cache_path)
+        logger.info("Topology compiled and saved to %s", cache_path)
+        return compiled
+
+    @classmethod
+    def load(cls, path: str | Path) -> CompiledTopology:
+        with np.load(path, allow_pickle=False) as data:
+            arrays = {name: data[name] for name in data.files}
+        return cls.from_arrays(json.loads(str(arrays.pop("meta"))), arrays)
+
+    def save(self, path: str | Path) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # 与 PathCache 相同：先写临时文件再替换，并发的扫描进程不会读到写了一半的文件。
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        with tmp_path.open("wb") as fh:
+            np.savez(fh, meta=np.array(json.dumps(self.meta())), **self.arrays())
+        tmp_path.replace(path)
+
+    def meta(self) -> dict[str, Any]:
+        """数组以外的字段，可 JSON 序列化。"""
+        return {
+            "format": COMPILED_FORMAT,
+            "topology_hash": self.topology_hash,
+            "resource_hash": self.resource_hash,
+            "num_wavelengths": self.num_wavelengths,
+            "node_attrs": self.node_attrs,
+        }
+
+    def arrays(self) -> dict[str, np.ndarray]:
+        return {name: getattr(self, name) for name in self._ARRAYS}
+
+    @classmethod
+    def from_arrays(cls, meta: dict[str, Any], arrays: dict[str, np.ndarray]) -> CompiledTopology:
+        """由 meta() 和 arrays() 的结果重建；数组不复制，可以是共享内存上的视图。"""
+        if meta["format"] != COMPILED_FORMAT:
+            raise ValueError(f"compiled topology format {meta['format']}, expected {COMPILED_FORMAT}")
+        return cls(
+            topology_hash=meta["topology_hash"],
+            resource_hash=meta["resource_hash"],
+            node_attrs=meta["node_attrs"],
+            num_wavelengths=meta["num_wavelengths"],
+            **{name: arrays[name] for name in cls._ARRAYS},
+        )
@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+from dataclasses import dataclass, field
+from itertools import islice
+from pathlib import Path
+from typing import Any
+
+import networkx as nx
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def file_digest(path: str | Path) -> str:
+    """拓扑文件内容的 SHA-256 摘要，用作各类预计算缓存的键。"""
+    return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+
+
+@dataclass
+class PathCache:
+    """
+    物理拓扑上每个 (src, dst) 节点对的 K 条最短路由（按跳数）。
+
+    物理拓扑在一次仿真中不变，因此路由只需在 SimulationRunner.build 时计算一次；
+    缓存以拓扑文件摘要和 K 为键保存到磁盘，参数扫描的各次运行可直接加载。
+
+    路由表以 CSR 形式保存在整数数组中，既是 .npz 磁盘格式，也可以直接放进共享内存：
+     - pairs: (P, 2) 节点对，按 (src, dst) 排序
+     - pair_ptr: 第 i 个节点对的路由为 path_ptr 下标 [pair_ptr[i], pair_ptr[i+1])
+     - path_ptr: 第 j 条路由的节点为 nodes[path_ptr[j]:path_ptr[j+1]]
+    """
+    k: int
+    topology_hash: str
+    pairs: np.ndarray
+    pair_ptr: np.ndarray
+    path_ptr: np.ndarray
+    nodes: np.ndarray
+    _index: dict[tuple[int, int], int] = field(init=False, repr=False)
+
+    _ARRAYS = ("pairs", "pair_ptr", "path_ptr", "nodes")
+
+    def __post_init__(self):
+        self._index = {(src, dst): i for i, (src, dst) in enumerate(self.pairs.tolist())}
+
+    def get(self, src: int, dst: int) -> list[list[int]]:
+        i = self._index.get((src, dst))
+        if i is None:
+            return []
+        nodes, path_ptr = self.nodes, self.path_ptr
+        return [
+            nodes[path_ptr[j]:path_ptr[j + 1]].tolist()
+            for j in range(self.pair_ptr[i], self.pair_ptr[i + 1])
+        ]
+
+    @classmethod
+    def build(cls, graph: nx.DiGraph, k: int, topology_hash: str) -> PathCache:
+        paths: dict[tuple[int, int], list[list[int]]] = {}
+        for src in graph.nodes:
+            for dst in graph.nodes:
+                if src == dst:
+                    continue
+                try:
+                    paths[(src, dst)] = [list(p) for p in islice(nx.shortest_simple_paths(graph, src, dst), k)]
+                except nx.NetworkXNoPath:
+                    paths[(src, dst)] = []
+        return cls.from_paths(k, topology_hash, paths)
+
+    @classmethod
+    def from_paths(cls, k: int, topology_hash: str, paths: dict[tuple[int, int], list[list[int]]]) -> PathCache:
+        pairs, pair_ptr, path_ptr, nodes = [], [0], [0], []
+        for pair, routes in sorted(paths.items()):
+            pairs.append(pair)
+            for route in routes:
+                nodes.extend(route)
+                path_ptr.append(len(nodes))
+            pair_ptr.append(len(path_ptr) - 1)
+        return cls(
+            k=k,
+            topology_hash=topology_hash,
+            pairs=np.asarray(pairs, dtype=np.int64).reshape(-1, 2),
+            pair_ptr=np.asarray(pair_ptr, dtype=np.int64),
+            path_ptr=np.asarray(path_ptr, dtype=np.int64),
+            nodes=np.asarray(nodes, dtype=np.int64),
+        )
+
+    @classmethod
+    def load_or_build(
+            cls,
+            topology_path: str | Path,
+            graph: nx.DiGraph,
+            k: int,
+            cache_dir: str | Path,
+    ) -> PathCache:
+        topology_hash = file_digest(topology_path)
+        cache_path = Path(cache_dir) / f"paths-{topology_hash[:16]}-k{k}.npz"
+
+        if cache_path.exists():
+            try:
+                cache = cls.load(cache_path)
+            except (OSError, KeyError, ValueError) as exc:
+                logger.warning("Ignoring unreadable K-path cache %s: %s", cache_path, exc)
+            else:
+                if cache.k == k and cache.topology_hash == topology_hash:
+                    logger.info("K-path cache loaded from %s", cache_path)
+                    return cache
+                logger.warning("Ignoring stale K-path cache %s", cache_path)
+
+        cache = cls.build(graph, k, topology_hash)
+        cache.save(cache_path)
+        logger.info("K-path cache built for %d node pairs and saved to %s", len(cache.pairs), cache_path)
+        return cache
+
+    @classmethod
+    def load(cls, path: str | Path) -> PathCache:
+        with np.load(path, allow_pickle=False) as data:
+            arrays = {name: data[name] for name in data.files}
+        return cls.from_arrays(json.loads(str(arrays.pop("meta"))), arrays)
+
+    def save(self, path: str | Path) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # 先写临时文件再替换，避免并发的扫描进程读到写了一半的缓存。
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        with tmp_path.open("wb") as fh:
+            np.savez(fh, meta=np.array(json.dumps(self.meta())), **self.arrays())
+        tmp_path.replace(path)
+
+    def meta(self) -> dict[str, Any]:
+        return {"k": self.k, "topology_hash": self.topology_hash}
+
+    def arrays(self) -> dict[str, np.ndarray]:
+        return {name: getattr(self, name) for name in self._ARRAYS}
+
+    @classmethod
+    def from_arrays(cls, meta: dict[str, Any], arrays: dict[str, np.ndarray]) -> PathCache:
+        """由 meta() 和 arrays() 的结果重建；数组不复制，可以是共享内存上的视图。"""
+        return cls(
+            k=int(meta["k"]),
+            topology_hash=meta["topology_hash"],
+            **{name: arrays[name] for name in cls._ARRAYS},
+        )
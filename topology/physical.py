@@ -1,12 +1,17 @@
 from __future__ import annotations
 
 import logging
+import math
 from dataclasses import dataclass, field
 from pathlib import Path
 
 import networkx as nx
 
 from models.exceptions import ConfigurationError
+from .compiled import CompiledTopology
+from .route import RouteTable
+from .schema import validate_graph
+from .wavelength import WavelengthBitmap
 
 logger = logging.getLogger(__name__)
 
@@ -20,16 +25,23 @@ class PhysicalTopology:
      - layer: {physical, wavelength, lightpath}
     链路属性应包括：
      - layer: {mapping, physical, wavelength, lightpath}
-     - wavelength_used: [index]
-     - wavelength_available: [index]
+     - link: int，链路编号，对应 wavelengths 位图中的下标
      - max_bandwidth: int
      - max_key_rate: int
-     - route: []
+     - route: Route，仅含该链路的单跳路由
+    波长占用状态不放在边属性中，统一保存在 wavelengths 位图里。
+    所有路由都通过 routes 驻留，光路、辅助图边和统计模块共享同一个 Route 对象。
     """
     graph: nx.DiGraph = field(init=False, repr=False)
+    wavelengths: WavelengthBitmap = field(init=False, repr=False)
+    links: list[tuple[int, int]] = field(init=False, repr=False)
+    routes: RouteTable = field(init=False, repr=False)
 
     def __post_init__(self):
         self.graph = nx.DiGraph()
+        self.wavelengths = WavelengthBitmap(num_wavelengths=0)
+        self.links = []
+        self.routes = RouteTable(self.graph)
 
     @property
     def num_nodes(self) -> int:
@@ -39,38 +51,113 @@ class PhysicalTopology:
     def num_edges(self) -> int:
         return len(self.graph.edges)
 
-    def load(self, path: str | Path, **kwargs):
+    def link_id(self, u: int, v: int) -> int:
+        return self.graph.edges[u, v]["link"]
+
+    def take_wavelength(self, u: int, v: int, wavelength: int) -> None:
+        self.wavelengths.take(self.graph.edges[u, v]["link"], wavelength)
+
+    def release_wavelength(self, u: int, v: int, wavelength: int) -> None:
+        self.wavelengths.release(self.graph.edges[u, v]["link"], wavelength)
+
+    def load(self, path: str | Path, cache_dir: str | Path | None = None, **kwargs):
+        """
+        加载 GraphML 物理拓扑，kwargs 为 [topology.resource] 中的资源默认值。
+
+        给出 cache_dir 时先查找已编译的拓扑文件（见 CompiledTopology），命中则不再解析 XML。
+        """
         logger.info(f"{'='*25} Loading Physical Topology {'='*25}")
         topology_path = Path(path)
         if not topology_path.exists():
             raise ConfigurationError(f"topology file does not exist: {topology_path}")
         logger.info(f"Topology file: {topology_path}")
         if topology_path.suffix.lower() == ".graphml":
-            self._load_topology_from_graphml(topology_path, **kwargs)
+            if cache_dir is None:
+                compiled = CompiledTopology.from_graphml(topology_path, **kwargs)
+            else:
+                compiled = CompiledTopology.load_or_build(topology_path, cache_dir, **kwargs)
         else:
             raise ConfigurationError(
                 f"unsupported topology format {topology_path.suffix!r}, use GraphML"
             )
+        self.load_compiled(compiled)
+
+    def load_compiled(self, compiled: CompiledTopology):
+        """由编译结果（可以是共享内存上的数组视图）构建拓扑，数组只被读取。"""
+        self._load_compiled(compiled)
+        # 物理拓扑加载后只读，属性在此校验一次。
+        validate_graph(self.graph)
+
+    def reset(self) -> None:
+        """释放所有波长，图结构和路由驻留表保持不变。"""
+        self.wavelengths.reset()
 
-    def _load_topology_from_graphml(self, path: Path, **kwargs):
-        raw_graph = nx.read_graphml(path)
-        for node_id, attrs in raw_graph.nodes(data=True):
+    def clone(self) -> PhysicalTopology:
+        """
+        复制拓扑，用于在同一进程内反复仿真时跳过 GraphML 解析和属性校验。
+
+        图结构和边属性字典各自独立，属性值（包括不可变的单跳 Route）与原拓扑共享；
+        波长位图和路由驻留表独立，单跳路由按链路编号重新驻留，编号与 load() 一致。
+        """
+        topology = PhysicalTopology()
+        topology.graph = self.graph.copy()
+        topology.wavelengths = WavelengthBitmap(
+            num_wavelengths=self.wavelengths.num_wavelengths, masks=list(self.wavelengths.masks)
+        )
+        topology.links = list(self.links)
+        topology.routes = RouteTable(topology.graph)
+        for u, v in topology.links:
+            topology.graph.edges[u, v]["route"] = topology.routes.get((u, v))
+        return topology
+
+    def fork(self) -> PhysicalTopology:
+        """
+        与原拓扑共享图结构、链路表和路由驻留表，只拥有独立的空闲波长位图。
+
+        图和路由在仿真中只读，网络状态全部在波长位图里，因此同一进程内同步推进的多个
+        控制平面（见 LockstepRunner）可以各持一个分支，无需复制图。
+        """
+        topology = PhysicalTopology()
+        topology.graph = self.graph
+        topology.links = self.links
+        topology.routes = self.routes
+        topology.wavelengths = WavelengthBitmap(num_wavelengths=self.wavelengths.num_wavelengths)
+        for _ in self.links:
+            topology.wavelengths.add_link()
+        return topology
+
+    def _load_compiled(self, compiled: CompiledTopology):
+        self.wavelengths = WavelengthBitmap(num_wavelengths=compiled.num_wavelengths)
+        self.links = []
+        for i, node_id in enumerate(compiled.node_ids.tolist()):
+            coordinates = {}
+            # 坐标缺失时不写入属性，由 validate_graph 报告。
+            if not math.isnan(compiled.latitude[i]):
+                coordinates["Latitude"] = float(compiled.latitude[i])
+            if not math.isnan(compiled.longitude[i]):
+                coordinates["Longitude"] = float(compiled.longitude[i])
             self.graph.add_node(
-                int(node_id),
+                node_id,
                 layer="physical",
-                **attrs
+                **compiled.node_attrs[i],
+                **coordinates
             )
 
-        for src, dst in raw_graph.edges():
-            directions = [(src, dst)] if raw_graph.is_directed() else [(src, dst), (dst, src)]
-            for directed_src, directed_dst in directions:
-                self.graph.add_edge(
-                    int(directed_src), int(directed_dst),
-                    layer="physical",
-                    wavelength_used=[],
-                    wavelength_available=list(range(kwargs.get("wavelengths", 0))),
-                    max_bandwidth=int(kwargs.get("max_bandwidth", 0)),
-                    max_key_rate=int(kwargs.get("attrs", {}).get("max_key_rate", 0)),
-                    route=[]
-                )
+        links = zip(
+            compiled.link_src.tolist(), compiled.link_dst.tolist(),
+            compiled.max_bandwidth.tolist(), compiled.max_key_rate.tolist(),
+        )
+        for src, dst, max_bandwidth, max_key_rate in links:
+            self.links.append((src, dst))
+            self.graph.add_edge(
+                src, dst,
+                layer="physical",
+                link=self.wavelengths.add_link(),
+                max_bandwidth=max_bandwidth,
+                max_key_rate=max_key_rate,
+                route=None
+            )
+        # 单跳路由按链路编号顺序驻留，其 id 与链路编号一致。
+        for u, v in self.links:
+            self.graph.edges[u, v]["route"] = self.routes.get((u, v))
         logger.info(f"GraphML topology loaded: nodes={self.num_nodes} directed_links={self.num_edges}.")
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Iterable
+
+import networkx as nx
+
+
+@dataclass(frozen=True, slots=True, eq=False)
+class Route:
+    """
+    驻留（interned）的物理路由，由 RouteTable 创建，同一节点序列只对应一个对象。
+
+     - id: 路由在 RouteTable 中的编号，按首次出现顺序分配
+     - nodes: 途经的物理节点
+     - links: 途经的物理链路编号，对应波长位图下标
+     - edges: 途经的物理链路 (u, v)
+     - link_mask: 链路编号的位掩码，第 i 位为 1 表示经过链路 i
+
+    路由对象不可变且唯一，因此比较两条路由只需比较对象本身（或 id）。
+    """
+    id: int
+    nodes: tuple[int, ...]
+    links: tuple[int, ...]
+    edges: tuple[tuple[int, int], ...]
+    link_mask: int
+
+    def __repr__(self):
+        return f"Route {self.id} {list(self.nodes)}"
+
+
+class RouteTable:
+    """物理拓扑上的路由驻留表：节点序列 -> Route。"""
+
+    def __init__(self, graph: nx.DiGraph):
+        self._graph = graph
+        self._routes: dict[tuple[int, ...], Route] = {}
+
+    def get(self, nodes: Iterable[int]) -> Route:
+        nodes = tuple(nodes)
+        route = self._routes.get(nodes)
+        if route is None:
+            edges = tuple(zip(nodes[:-1], nodes[1:]))
+            links = tuple(self._graph.edges[u, v]["link"] for u, v in edges)
+            link_mask = 0
+            for link in links:
+                link_mask |= 1 << link
+            route = Route(id=len(self._routes), nodes=nodes, links=links, edges=edges, link_mask=link_mask)
+            self._routes[nodes] = route
+        return route
+
+    def __len__(self) -> int:
+        return len(self._routes)
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import logging
+
+import networkx as nx
+
+from models.exceptions import TopologyError
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_NODE_ATTRS = (
+    "id",
+    "Latitude",
+    "Longitude",
+    "layer"
+)
+
+REQUIRED_EDGE_ATTRS_PHY = (
+    "layer",
+    "link",
+    "max_bandwidth",
+    "max_key_rate",
+    "route",
+)
+
+REQUIRED_EDGE_ATTRS_VIR = (
+    "layer",
+    "wavelength_used",
+    "max_bandwidth",
+    "max_key_rate",
+    "avl_bandwidth",
+    "avl_key_rate",
+    "route",
+    "usage",
+    "dedicate"
+)
+
+
+def validate_graph(graph: nx.DiGraph | nx.MultiDiGraph) -> None:
+    """
+    完整校验物理拓扑（DiGraph）或虚拟拓扑（MultiDiGraph）的节点和边属性，O(V+E)。
+
+    只在加载时调用；运行期间控制平面是唯一写者，只需用 validate_edge 校验它新写入的边。
+    """
+    for node, data in graph.nodes(data=True):
+        for attr in REQUIRED_NODE_ATTRS:
+            if attr not in data:
+                logger.error(f"Node {node} has no attr {attr}.")
+                raise TopologyError(f"node {node} has no attr {attr!r}")
+
+    if graph.is_multigraph():
+        for u, v, key, data in graph.edges(keys=True, data=True):
+            validate_edge(u, v, data, REQUIRED_EDGE_ATTRS_VIR, key=key)
+    else:
+        for u, v, data in graph.edges(data=True):
+            validate_edge(u, v, data, REQUIRED_EDGE_ATTRS_PHY)
+
+
+def validate_edge(u: int, v: int, data: dict, required: tuple[str, ...], key: int | None = None) -> None:
+    for attr in required:
+        if attr not in data:
+            if key is None:
+                logger.error(f"Edge from {u} to {v} has no attr {attr}.")
+                raise TopologyError(f"edge {u} -> {v} has no attr {attr!r}")
+            logger.error(f"Edge {key}th from {u} to {v} has no attr {attr}.")
+            raise TopologyError(f"edge {u} -> {v} (key {key}) has no attr {attr!r}")
@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import logging
+import sys
+from dataclasses import dataclass, field
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 各数组在共享内存块中的起始偏移按此对齐
+ALIGNMENT = 64
+
+
+@dataclass
+class SharedArrays:
+    """
+    打包在一块 multiprocessing.shared_memory 中的一组只读 NumPy 数组。
+
+    发布方用 publish() 复制一次数据，把 handle() 传给其他进程；其他进程用 attach()
+    得到直接指向共享内存的数组视图，不再各自持有副本。视图均为只读。
+
+    共享内存块由发布方负责释放（close + unlink）；附加方只需保持对象存活，
+    在其数组视图仍被引用时不能 close()。
+    """
+    shm: SharedMemory
+    # 数组名 -> (dtype, shape, offset)
+    layout: dict[str, tuple[str, tuple[int, ...], int]]
+    arrays: dict[str, np.ndarray] = field(init=False)
+
+    def __post_init__(self):
+        self.arrays = {}
+        for name, (dtype, shape, offset) in self.layout.items():
+            array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=self.shm.buf, offset=offset)
+            array.flags.writeable = False
+            self.arrays[name] = array
+
+    @classmethod
+    def publish(cls, arrays: dict[str, np.ndarray]) -> SharedArrays:
+        layout: dict[str, tuple[str, tuple[int, ...], int]] = {}
+        size = 0
+        for name, array in arrays.items():
+            size = -(-size // ALIGNMENT) * ALIGNMENT
+            layout[name] = (array.dtype.str, array.shape, size)
+            size += array.nbytes
+        # 长度为 0 的共享内存块不能创建
+        shm = SharedMemory(create=True, size=max(size, 1))
+        for name, array in arrays.items():
+            dtype, shape, offset = layout[name]
+            np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf, offset=offset)[...] = array
+        logger.info("Published %d arrays (%d bytes) in shared memory %s", len(arrays), size, shm.name)
+        return cls(shm=shm, layout=layout)
+
+    @classmethod
+    def attach(cls, handle: tuple[str, dict[str, tuple[str, tuple[int, ...], int]]]) -> SharedArrays:
+        name, layout = handle
+        kwargs: dict[str, Any] = {}
+        if sys.version_info >= (3, 13):
+            # 附加方不登记到 resource_tracker，避免其退出时替发布方删除共享内存块。
+            kwargs["track"] = False
+        return cls(shm=SharedMemory(name=name, **kwargs), layout=layout)
+
+    def handle(self) -> tuple[str, dict[str, tuple[str, tuple[int, ...], int]]]:
+        """可序列化的句柄，传给 attach()。"""
+        return self.shm.name, self.layout
+
+    def close(self) -> None:
+        self.arrays.clear()
+        self.shm.close()
+
+    def unlink(self) -> None:
+        self.shm.unlink()
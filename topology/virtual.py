@@ -3,6 +3,8 @@ from __future__ import annotations
 import logging
 from dataclasses import dataclass, field
 
+from .route import Route
+
 import networkx as nx
 
 logger = logging.getLogger(__name__)
@@ -17,12 +19,14 @@ class Lightpath:
     max_key_rate: int
     avl_bandwidth: int
     avl_key_rate: int
-    route: []
+    route: Route
     usage: str
     kind: str       # new, exist
     dedicate: str
 
     layer: str = "lightpath"
+    # 已有光路在虚拟拓扑多重图中的边键；新建光路为 None
+    key: int | None = None
 
 
 @dataclass
@@ -39,16 +43,29 @@ class VirtualTopology:
      - max_key_rate: int
      - avl_bandwidth: int
      - avl_key_rate: int
-     - route: []
+     - route: Route
      - usage: {data, recip}
      - kind: exist
      - active_flows: {}
      - dedicate: {True, False}
     """
     graph: nx.MultiDiGraph = field(init=False)
+    # (src, dst, usage, wavelength, route.id) -> 多重图边键。同一波长不能在同一链路上复用，因此键唯一。
+    _lightpath_index: dict[tuple, int] = field(init=False, repr=False)
+
+    # 按物理链路编号索引的占用台账，随光路的建立和拆除增量维护：
+    #  - data_lightpaths_per_link / recip_channels_per_link: 经过该链路的数据光路 / 协商信道数
+    #  - data_link_mask: 承载数据光路的链路位掩码
+    data_lightpaths_per_link: list[int] = field(init=False, repr=False)
+    recip_channels_per_link: list[int] = field(init=False, repr=False)
+    data_link_mask: int = field(init=False, repr=False)
 
     def __post_init__(self):
         self.graph = nx.MultiDiGraph()
+        self._lightpath_index = {}
+        self.data_lightpaths_per_link = []
+        self.recip_channels_per_link = []
+        self.data_link_mask = 0
 
     def init(self, phy_graph: nx.DiGraph):
         logger.info(f"{'='*25} Loading Virtual Topology {'='*25}")
@@ -56,3 +73,42 @@ class VirtualTopology:
 
         for node in self.graph.nodes:
             self.graph.nodes[node]["layer"] = "lightpath"
+
+        num_links = phy_graph.number_of_edges()
+        self.data_lightpaths_per_link = [0] * num_links
+        self.recip_channels_per_link = [0] * num_links
+        self.data_link_mask = 0
+
+    def add_lightpath(self, src: int, dst: int, **attrs) -> int:
+        """新增一条光路并登记索引，返回其边键。"""
+        key = self.graph.add_edge(src, dst, **attrs)
+        index_key = (src, dst, attrs["usage"], attrs["wavelength_used"], attrs["route"].id)
+        self._lightpath_index[index_key] = key
+
+        route = attrs["route"]
+        counts = self.data_lightpaths_per_link if attrs["usage"] == "data" else self.recip_channels_per_link
+        for link in route.links:
+            counts[link] += 1
+        if attrs["usage"] == "data":
+            self.data_link_mask |= route.link_mask
+        return key
+
+    def remove_lightpath(self, src: int, dst: int, key: int) -> None:
+        data = self.graph.edges[src, dst, key]
+        del self._lightpath_index[(src, dst, data["usage"], data["wavelength_used"], data["route"].id)]
+
+        counts = self.data_lightpaths_per_link if data["usage"] == "data" else self.recip_channels_per_link
+        for link in data["route"].links:
+            counts[link] -= 1
+            if data["usage"] == "data" and not counts[link]:
+                self.data_link_mask &= ~(1 << link)
+        self.graph.remove_edge(src, dst, key=key)
+
+    def reset(self) -> None:
+        """拆除所有光路，耗时与现存光路数成正比；节点和链路台账的规模保持不变。"""
+        for src, dst, key in list(self.graph.edges(keys=True)):
+            self.remove_lightpath(src, dst, key)
+
+    def find_lightpath(self, src: int, dst: int, usage: str, wavelength: int, route: Route) -> int | None:
+        """按 (src, dst, usage, wavelength, route) 查找已有光路的边键，不存在时返回 None。"""
+        return self._lightpath_index.get((src, dst, usage, wavelength, route.id))
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator
+
+from models.exceptions import ResourceUnavailableError
+
+
+@dataclass
+class WavelengthBitmap:
+    """
+    按物理链路编号保存波长可用性的位图。
+
+    masks[link] 的第 w 位为 1 表示该链路上波长 w 空闲。占用/释放是一次位运算，
+    first-fit 取最低置位，路由上的波长连续性约束是沿途掩码按位与。
+    """
+    num_wavelengths: int
+    masks: list[int] = field(default_factory=list)
+
+    @property
+    def full_mask(self) -> int:
+        return (1 << self.num_wavelengths) - 1
+
+    @property
+    def num_links(self) -> int:
+        return len(self.masks)
+
+    def add_link(self) -> int:
+        """登记一条所有波长均空闲的新链路，返回链路编号。"""
+        self.masks.append(self.full_mask)
+        return len(self.masks) - 1
+
+    def reset(self) -> None:
+        """所有链路的所有波长恢复空闲。"""
+        self.masks[:] = [self.full_mask] * len(self.masks)
+
+    def is_available(self, link: int, wavelength: int) -> bool:
+        return bool(self.masks[link] >> wavelength & 1)
+
+    def take(self, link: int, wavelength: int) -> None:
+        bit = 1 << wavelength
+        if not self.masks[link] & bit:
+            raise ResourceUnavailableError(f"wavelength {wavelength} on link {link} is already in use")
+        self.masks[link] &= ~bit
+
+    def release(self, link: int, wavelength: int) -> None:
+        bit = 1 << wavelength
+        if self.masks[link] & bit or wavelength >= self.num_wavelengths:
+            raise ResourceUnavailableError(f"wavelength {wavelength} on link {link} is not in use")
+        self.masks[link] |= bit
+
+    def route_mask(self, links: Iterable[int]) -> int:
+        """沿路由所有链路的可用波长按位与，即满足波长连续性的波长集合。"""
+        mask = self.full_mask
+        for link in links:
+            mask &= self.masks[link]
+        return mask
+
+    def first_fit(self, link: int) -> int | None:
+        return self.lowest_wavelength(self.masks[link])
+
+    def first_fit_route(self, links: Iterable[int]) -> int | None:
+        return self.lowest_wavelength(self.route_mask(links))
+
+    def available(self, link: int) -> Iterator[int]:
+        """按波长编号升序遍历链路上的空闲波长。"""
+        return self.iter_wavelengths(self.masks[link])
+
+    def used(self, link: int) -> Iterator[int]:
+        return self.iter_wavelengths(~self.masks[link] & self.full_mask)
+
+    @staticmethod
+    def lowest_wavelength(mask: int) -> int | None:
+        if not mask:
+            return None
+        return (mask & -mask).bit_length() - 1
+
+    @staticmethod
+    def iter_wavelengths(mask: int) -> Iterator[int]:
+        while mask:
+            low = mask & -mask
+            yield low.bit_length() - 1
+            mask ^= low